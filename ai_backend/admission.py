@@ -0,0 +1,150 @@
+"""
+Admission control in front of pose inference.
+
+At most `max_concurrent` frames run inference at once and at most
+`max_queue` more wait for a slot. A caller with a deadline is shed instead
+of queued when the queue is full, when the wait it can expect (from the
+running average inference hold time) would already overrun its deadline,
+or when the deadline passes while it waits. Shedding raises Overloaded so
+the caller can answer at once with a rejection or a degraded result.
+
+Frames carrying a key (the session id) are coalesced latest-frame-wins:
+each key has at most one frame waiting, and a newer frame for the key
+replaces the waiting one, which is shed as 'coalesced'. The frame that
+finally runs is told how many frames it replaced. A frame can also carry a
+`stale_at` time after which it is not worth analyzing at all.
+
+Callers without a deadline (e.g. uploaded video analysis) always wait for
+a slot and are never shed or coalesced.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+
+class Overloaded(Exception):
+    """Raised when a frame is shed instead of admitted"""
+
+    def __init__(self, reason):
+        super().__init__(f'Inference overloaded ({reason})')
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ('superseded', 'coalesced')
+
+    def __init__(self, coalesced=0):
+        self.superseded = False
+        # Frames this one replaced
+        self.coalesced = coalesced
+
+
+class AdmissionController:
+    """Bounded queue of frames waiting for an inference slot"""
+
+    # Weight of the newest sample in the running average hold time
+    HOLD_SMOOTHING = 0.1
+
+    def __init__(self, max_concurrent=1, max_queue=8):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.average_hold = 0.0
+        self._waiting_by_key = {}
+        self._condition = threading.Condition()
+
+    def expected_wait(self):
+        """Seconds a frame queued now should expect to wait for a slot"""
+        if self.active < self.max_concurrent:
+            return 0.0
+        return (self.waiting + 1) / self.max_concurrent * self.average_hold
+
+    def acquire(self, deadline=None, key=None, stale_at=None):
+        """Take an inference slot, waiting until `deadline` at most.
+
+        deadline and stale_at are time.perf_counter() values. Returns
+        (acquired, coalesced): the time the slot was taken, for release(),
+        and how many frames for `key` this one replaced.
+        """
+        start = time.perf_counter()
+        if deadline is None:
+            key = stale_at = None
+        if stale_at is not None and start >= stale_at:
+            self._shed('stale')
+
+        reason = None
+        with self._condition:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                metrics.STAGE_QUEUE.observe(0.0)
+                return start, 0
+
+            waiter = _Waiter()
+            previous = self._waiting_by_key.get(key) if key is not None else None
+            # A frame replacing a waiting one for its key takes that place instead of a new one
+            if deadline is not None and previous is None and self.waiting >= self.max_queue:
+                reason = 'queue_full'
+            elif deadline is not None and start + self.expected_wait() > deadline:
+                reason = 'deadline'
+            elif previous is not None:
+                # Latest frame wins
+                previous.superseded = True
+                waiter.coalesced = previous.coalesced + 1
+                self._condition.notify_all()
+
+            if reason is None:
+                limit = deadline if stale_at is None or (deadline is not None and deadline < stale_at) else stale_at
+                self.waiting += 1
+                if key is not None:
+                    self._waiting_by_key[key] = waiter
+                try:
+                    while self.active >= self.max_concurrent and not waiter.superseded:
+                        remaining = None if limit is None else limit - time.perf_counter()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    if waiter.superseded:
+                        reason = 'coalesced'
+                    elif self.active >= self.max_concurrent:
+                        reason = 'stale' if limit is stale_at and stale_at is not None else 'deadline'
+                    else:
+                        self.active += 1
+                finally:
+                    self.waiting -= 1
+                    if key is not None and self._waiting_by_key.get(key) is waiter:
+                        del self._waiting_by_key[key]
+                    if reason is not None:
+                        # Pass on a wakeup this waiter may have consumed
+                        self._condition.notify()
+
+        if reason is not None:
+            self._shed(reason)
+
+        acquired = time.perf_counter()
+        metrics.STAGE_QUEUE.observe(acquired - start)
+        return acquired, waiter.coalesced
+
+    def _shed(self, reason):
+        metrics.SHED.labels(reason).inc()
+        raise Overloaded(reason)
+
+    def release(self, acquired):
+        """Give back a slot taken by acquire(), which returned `acquired`"""
+        hold = time.perf_counter() - acquired
+        with self._condition:
+            self.average_hold += self.HOLD_SMOOTHING * (hold - self.average_hold)
+            self.active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def admit(self, deadline=None, key=None, stale_at=None):
+        """Hold an inference slot for the block; yields the number of frames coalesced into this one"""
+        acquired, coalesced = self.acquire(deadline, key, stale_at)
+        try:
+            yield coalesced
+        finally:
+            self.release(acquired)
@@ -0,0 +1,340 @@
+"""
+Append-only columnar store for per-frame and per-rep analysis records.
+
+Records go to two tables, ``frames`` and ``reps``. Each table is a directory
+of chunks, and each chunk a directory with one raw little-endian file per
+column plus meta.json::
+
+    <root>/<table>/<chunk>/<column>.bin   fixed-width values, one per row
+    <root>/<table>/<chunk>/meta.json      {"version", "rows", "t_min", "t_max",
+                                           "dictionaries": {column: [string, ...]}}
+
+String columns (session, exercise, status) hold codes into the chunk's
+dictionaries. A chunk is only ever appended to by the process that created
+it (its name carries the pid), so writers in several server processes never
+interleave, and it is closed after CHUNK_ROWS rows. meta.json is rewritten
+atomically after every flush and is the chunk's index: rows committed, the
+time range and the sessions it contains, so queries skip whole chunks by
+session or time before touching any column. Rows in a chunk are in append
+order, which is only roughly time order (request threads race to append,
+and batches carry their own timestamps), so time ranges are filtered row
+by row within the chunks that overlap them.
+
+Readers memory-map only the columns a query needs, so aggregations over
+millions of frames are a few vectorized passes over the mapped pages.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from kinematics import ANGLE_NAMES
+
+VERSION = 1
+
+FRAME_COLUMNS = {
+    'time': '<f8',
+    'session': '<u4',
+    'exercise': '<u2',
+    'status': '<u2',
+    'count': '<u4',
+    'calories': '<f4',
+    **{f'angle_{name}': '<f4' for name in ANGLE_NAMES},
+}
+
+REP_COLUMNS = {
+    'time': '<f8',
+    'session': '<u4',
+    'exercise': '<u2',
+    'rep': '<u4',
+    # Seconds since the previous rep (or the session's first frame)
+    'duration': '<f4',
+    # Calories credited for this rep
+    'calories': '<f4',
+}
+
+TABLES = {'frames': FRAME_COLUMNS, 'reps': REP_COLUMNS}
+
+# Columns holding codes into the chunk's string dictionaries
+DICTIONARY_COLUMNS = ('session', 'exercise', 'status')
+
+# Rows per chunk before a new one is started (about 60 MB of frame columns)
+CHUNK_ROWS = 1 << 20
+# Buffered rows are written once there are this many, or after FLUSH_INTERVAL seconds
+FLUSH_ROWS = 512
+FLUSH_INTERVAL = 1.0
+
+_SECONDS_PER_DAY = 86400
+
+
+class _TableWriter:
+    """Buffers rows of one table and appends them to this process's current chunk"""
+
+    def __init__(self, directory, columns, chunk_rows):
+        self.directory = directory
+        self.columns = columns
+        self.chunk_rows = chunk_rows
+        self.pending = []
+        self.pending_rows = 0
+        self.chunk = None
+
+    def _open_chunk(self):
+        name = f'{int(time.time() * 1000):013d}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        path = os.path.join(self.directory, name)
+        os.makedirs(path)
+        self.chunk = {
+            'path': path,
+            'rows': 0,
+            't_min': None,
+            't_max': None,
+            'dictionaries': {column: [] for column in DICTIONARY_COLUMNS if column in self.columns},
+            'codes': {column: {} for column in DICTIONARY_COLUMNS if column in self.columns},
+        }
+
+    def encode(self, column, value):
+        """Code of a string in the current chunk's dictionary for `column`"""
+        if self.chunk is None:
+            self._open_chunk()
+        codes = self.chunk['codes'][column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.chunk['dictionaries'][column].append(value)
+        return code
+
+    def append(self, values, rows):
+        """Buffer `rows` rows given as {column: array or scalar}"""
+        self.pending.append((values, rows))
+        self.pending_rows += rows
+
+    def flush(self):
+        if not self.pending_rows:
+            return
+        if self.chunk is None:
+            self._open_chunk()
+        rows = self.pending_rows
+        path = self.chunk['path']
+        for column, dtype in self.columns.items():
+            data = np.concatenate([np.broadcast_to(np.asarray(values[column], dtype=dtype), (size,))
+                                   for values, size in self.pending])
+            with open(os.path.join(path, column + '.bin'), 'ab') as f:
+                f.write(data.tobytes())
+            if column == 'time':
+                t_min, t_max = float(data.min()), float(data.max())
+
+        chunk = self.chunk
+        chunk['rows'] += rows
+        chunk['t_min'] = t_min if chunk['t_min'] is None else min(chunk['t_min'], t_min)
+        chunk['t_max'] = t_max if chunk['t_max'] is None else max(chunk['t_max'], t_max)
+        meta = {key: chunk[key] for key in ('rows', 't_min', 't_max', 'dictionaries')}
+        temp_path = os.path.join(path, 'meta.json.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(dict(meta, version=VERSION), f)
+        os.replace(temp_path, os.path.join(path, 'meta.json'))
+
+        self.pending = []
+        self.pending_rows = 0
+        if chunk['rows'] >= self.chunk_rows:
+            self.chunk = None
+
+
+class AnalysisStore:
+    """Columnar analysis records under one directory: appends buffered per process, reads memory-mapped"""
+
+    def __init__(self, directory, chunk_rows=CHUNK_ROWS, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._writers = {}
+        for table, columns in TABLES.items():
+            os.makedirs(os.path.join(directory, table), exist_ok=True)
+            self._writers[table] = _TableWriter(os.path.join(directory, table), columns, chunk_rows)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    # Writing
+
+    def _append(self, table, rows, values, strings):
+        writer = self._writers[table]
+        with self._lock:
+            for column, value in strings.items():
+                if isinstance(value, str):
+                    values[column] = writer.encode(column, value)
+                else:
+                    values[column] = np.array([writer.encode(column, item) for item in value])
+            writer.append(values, rows)
+            if (writer.pending_rows >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def append_frames(self, session_id, exercise_type, times, statuses, counts, calories, angles):
+        """Append a batch of frames of one session.
+
+        statuses is a string or one string per frame; angles is an (n, len(ANGLE_NAMES))
+        array with NaN where an angle is missing (e.g. frames without a person).
+        """
+        times = np.asarray(times, dtype='<f8')
+        angles = np.asarray(angles, dtype='<f4').reshape(len(times), len(ANGLE_NAMES))
+        values = {'time': times, 'count': counts, 'calories': calories}
+        for i, name in enumerate(ANGLE_NAMES):
+            values[f'angle_{name}'] = angles[:, i]
+        self._append('frames', len(times), values,
+                     {'session': session_id, 'exercise': exercise_type, 'status': statuses})
+
+    def append_frame(self, session_id, exercise_type, status, count, calories, angles=None, timestamp=None):
+        """Append one frame; angles is a len(ANGLE_NAMES) array or None"""
+        values = {
+            'time': time.time() if timestamp is None else timestamp,
+            'count': count,
+            'calories': calories,
+        }
+        for i, name in enumerate(ANGLE_NAMES):
+            values[f'angle_{name}'] = np.nan if angles is None else angles[i]
+        self._append('frames', 1, values, {'session': session_id, 'exercise': exercise_type, 'status': status})
+
+    def append_rep(self, session_id, exercise_type, rep, duration, calories, timestamp=None):
+        """Append one completed rep"""
+        values = {
+            'time': time.time() if timestamp is None else timestamp,
+            'rep': rep,
+            'duration': duration,
+            'calories': calories,
+        }
+        self._append('reps', 1, values, {'session': session_id, 'exercise': exercise_type})
+
+    def _flush_locked(self):
+        for writer in self._writers.values():
+            writer.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Write out buffered rows"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+    # Reading
+
+    def chunks(self, table):
+        """(path, meta) of the table's chunks with committed rows, oldest first"""
+        root = os.path.join(self.directory, table)
+        found = []
+        for name in sorted(os.listdir(root)):
+            try:
+                with open(os.path.join(root, name, 'meta.json')) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get('version') == VERSION and meta['rows']:
+                found.append((os.path.join(root, name), meta))
+        return found
+
+    def _column(self, table, path, meta, column):
+        dtype = np.dtype(TABLES[table][column])
+        file_path = os.path.join(path, column + '.bin')
+        # A writer may be mid-flush; only map rows its meta.json has committed
+        rows = min(meta['rows'], os.path.getsize(file_path) // dtype.itemsize)
+        if rows == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(file_path, dtype=dtype, mode='r', shape=(rows,))
+
+    def scan(self, table, columns, session=None, exercise=None, start=None, end=None):
+        """Yield (meta, {column: array}) per chunk for the rows matching the filters.
+
+        session and exercise are names; start and end are unix times (end
+        exclusive). Chunks are skipped from their index before any column is mapped.
+        """
+        for path, meta in self.chunks(table):
+            dictionaries = meta['dictionaries']
+            if start is not None and meta['t_max'] < start:
+                continue
+            if end is not None and meta['t_min'] >= end:
+                continue
+            if session is not None and session not in dictionaries['session']:
+                continue
+            if exercise is not None and exercise not in dictionaries['exercise']:
+                continue
+
+            mask = None
+            if start is not None or end is not None:
+                times = self._column(table, path, meta, 'time')
+                if start is not None:
+                    mask = times >= start
+                if end is not None:
+                    mask = times < end if mask is None else mask & (times < end)
+            for column, name in (('session', session), ('exercise', exercise)):
+                if name is not None:
+                    matches = self._column(table, path, meta, column) == dictionaries[column].index(name)
+                    mask = matches if mask is None else mask & matches
+            if mask is not None and not mask.any():
+                continue
+
+            selected = {}
+            for column in columns:
+                values = self._column(table, path, meta, column)
+                selected[column] = values[mask] if mask is not None else values
+            yield meta, selected
+
+    def select(self, table, columns, **filters):
+        """Matching rows as {column: array}; dictionary columns are decoded to strings"""
+        parts = {column: [] for column in columns}
+        for meta, selected in self.scan(table, columns, **filters):
+            for column in columns:
+                values = selected[column]
+                if column in DICTIONARY_COLUMNS:
+                    values = np.array(meta['dictionaries'][column], dtype=object)[values]
+                parts[column].append(np.asarray(values))
+        return {
+            column: np.concatenate(values) if values else
+            np.zeros(0, dtype=object if column in DICTIONARY_COLUMNS else TABLES[table][column])
+            for column, values in parts.items()
+        }
+
+    # Aggregations
+
+    def reps_per_exercise(self, **filters):
+        """{exercise: completed reps}"""
+        totals = {}
+        for meta, selected in self.scan('reps', ('exercise',), **filters):
+            names = meta['dictionaries']['exercise']
+            counts = np.bincount(selected['exercise'], minlength=len(names))
+            for name, count in zip(names, counts.tolist()):
+                if count:
+                    totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def calories_per_day(self, utc_offset=0, **filters):
+        """{ISO date: calories burned in completed reps}, days shifted by utc_offset seconds"""
+        totals = {}
+        for _, selected in self.scan('reps', ('time', 'calories'), **filters):
+            if not len(selected['time']):
+                continue
+            days = ((selected['time'] + utc_offset) // _SECONDS_PER_DAY).astype(np.int64)
+            first = int(days.min())
+            sums = np.bincount(days - first, weights=selected['calories'])
+            for offset in np.flatnonzero(sums).tolist():
+                totals[first + offset] = totals.get(first + offset, 0.0) + float(sums[offset])
+        epoch = datetime.date(1970, 1, 1)
+        return {
+            (epoch + datetime.timedelta(days=day)).isoformat(): round(value, 2)
+            for day, value in sorted(totals.items())
+        }
+
+    def angle_distribution(self, angle, bins=36, value_range=(0.0, 180.0), **filters):
+        """(counts, bin edges) histogram of one joint angle over the matching frames with a person"""
+        column = f'angle_{angle}'
+        if column not in FRAME_COLUMNS:
+            raise ValueError(f'Unknown angle: {angle}')
+        edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        counts = np.zeros(bins, dtype=np.int64)
+        for _, selected in self.scan('frames', (column,), **filters):
+            values = selected[column]
+            counts += np.histogram(values[~np.isnan(values)], bins=edges)[0]
+        return counts, edges
@@ -0,0 +1,116 @@
+"""
+Benchmark: analysis history as per-result JSON dumps vs the columnar analysis store
+
+Writes the same synthetic frames both ways, then times the dashboard queries
+(reps per exercise, calories per day, angle histogram, one session's frames)
+on the store and compares on-disk size with the JSON save_analysis_result
+writes for a sample of the frames.
+
+Run from ai_backend/:  python benchmarks/bench_analysis_store.py --frames 5000000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_store import AnalysisStore
+from kinematics import ANGLE_NAMES
+
+EXERCISES = ('squat', 'push-up', 'pull-up', 'sit-up', 'walk')
+STATUSES = ('up', 'down', 'no_person')
+
+
+def write_store(store, frames, sessions, batch, rng):
+    """Write `frames` synthetic frames in per-session batches; returns the first session id"""
+    start = time.time() - 30 * 86400
+    written = 0
+    session = 0
+    while written < frames:
+        n = min(batch, frames - written)
+        times = start + (written + np.arange(n)) * (30 * 86400 / frames)
+        angles = rng.uniform(0, 180, (n, len(ANGLE_NAMES))).astype(np.float32)
+        statuses = [STATUSES[i] for i in rng.integers(0, len(STATUSES), n)]
+        counts = np.arange(n) // 30
+        store.append_frames(f'session-{session % sessions}', EXERCISES[session % len(EXERCISES)],
+                            times, statuses, counts, counts * 0.32, angles)
+        for rep in range(1, n // 30 + 1):
+            store.append_rep(f'session-{session % sessions}', EXERCISES[session % len(EXERCISES)],
+                             rep, 1.0, 0.32, timestamp=times[rep * 30 - 1])
+        written += n
+        session += 1
+    store.flush()
+    return 'session-0'
+
+
+def json_bytes(frames, rng):
+    """Size of the indented JSON save_analysis_result writes for `frames` frames"""
+    result = {
+        'success': True,
+        'frame_analysis': [{
+            'count': i // 30,
+            'status': STATUSES[i % len(STATUSES)],
+            'feedback': 'Good form! Keep going',
+            'calories': i // 30 * 0.32,
+            'angles': dict(zip(ANGLE_NAMES, rng.uniform(0, 180, len(ANGLE_NAMES)).tolist())),
+            'landmarks': rng.random((33, 4)).tolist()
+        } for i in range(frames)]
+    }
+    return len(json.dumps(result, indent=2))
+
+
+def directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar analysis store benchmark')
+    parser.add_argument('--frames', type=int, default=1000000)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=9000, help='frames per append_frames call (one video)')
+    parser.add_argument('--json-sample', type=int, default=2000, help='frames to size the old JSON dumps from')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp(prefix='analysis_store_bench_')
+    try:
+        store = AnalysisStore(directory)
+        session, seconds = timed(lambda: write_store(store, args.frames, args.sessions, args.batch, rng))
+        print(f'write      {args.frames} frames in {seconds:.2f}s ({args.frames / seconds:,.0f} frames/s)')
+
+        store_size = directory_bytes(directory) / args.frames
+        old_size = json_bytes(args.json_sample, rng) / args.json_sample
+        print(f'size       {store_size:.0f} bytes/frame (JSON dumps: {old_size:.0f} bytes/frame, '
+              f'{old_size / store_size:.0f}x)')
+
+        queries = (
+            ('reps/exercise', lambda: store.reps_per_exercise()),
+            ('calories/day', lambda: store.calories_per_day()),
+            ('angle hist', lambda: store.angle_distribution('left_leg')),
+            ('one session', lambda: store.select('frames', ('time', 'count', 'angle_left_leg'), session=session)),
+        )
+        for name, query in queries:
+            timed(query)
+            _, seconds = timed(query)
+            print(f'{name:<11}{seconds * 1000:>9.1f} ms')
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Microbenchmark: per-frame joint angle cost, BodyPartAngle calls vs the batched kinematics module
+
+Run from ai_backend/:  python benchmarks/bench_kinematics.py
+"""
+
+import argparse
+import enum
+import os
+import sys
+import timeit
+from collections import namedtuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from body_part_angle import BodyPartAngle
+from kinematics import NUM_LANDMARKS, joint_angles, landmarks_to_array, angles_to_dict
+
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+
+class PoseLandmark(enum.Enum):
+    """Same enum lookups analyze_frame used to do through mp_pose.PoseLandmark"""
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_ELBOW = 13
+    RIGHT_ELBOW = 14
+    LEFT_WRIST = 15
+    RIGHT_WRIST = 16
+    LEFT_HIP = 23
+    RIGHT_HIP = 24
+    LEFT_KNEE = 25
+    RIGHT_KNEE = 26
+    LEFT_ANKLE = 27
+    RIGHT_ANKLE = 28
+
+
+def legacy_angles(landmarks, body_part_angle):
+    """The per-joint path analyze_frame used before the kinematics module"""
+    left_shoulder = [landmarks[PoseLandmark.LEFT_SHOULDER.value].x, landmarks[PoseLandmark.LEFT_SHOULDER.value].y]
+    left_elbow = [landmarks[PoseLandmark.LEFT_ELBOW.value].x, landmarks[PoseLandmark.LEFT_ELBOW.value].y]
+    left_wrist = [landmarks[PoseLandmark.LEFT_WRIST.value].x, landmarks[PoseLandmark.LEFT_WRIST.value].y]
+    right_shoulder = [landmarks[PoseLandmark.RIGHT_SHOULDER.value].x, landmarks[PoseLandmark.RIGHT_SHOULDER.value].y]
+    right_elbow = [landmarks[PoseLandmark.RIGHT_ELBOW.value].x, landmarks[PoseLandmark.RIGHT_ELBOW.value].y]
+    right_wrist = [landmarks[PoseLandmark.RIGHT_WRIST.value].x, landmarks[PoseLandmark.RIGHT_WRIST.value].y]
+    left_hip = [landmarks[PoseLandmark.LEFT_HIP.value].x, landmarks[PoseLandmark.LEFT_HIP.value].y]
+    left_knee = [landmarks[PoseLandmark.LEFT_KNEE.value].x, landmarks[PoseLandmark.LEFT_KNEE.value].y]
+    left_ankle = [landmarks[PoseLandmark.LEFT_ANKLE.value].x, landmarks[PoseLandmark.LEFT_ANKLE.value].y]
+    right_hip = [landmarks[PoseLandmark.RIGHT_HIP.value].x, landmarks[PoseLandmark.RIGHT_HIP.value].y]
+    right_knee = [landmarks[PoseLandmark.RIGHT_KNEE.value].x, landmarks[PoseLandmark.RIGHT_KNEE.value].y]
+    right_ankle = [landmarks[PoseLandmark.RIGHT_ANKLE.value].x, landmarks[PoseLandmark.RIGHT_ANKLE.value].y]
+
+    return {
+        'left_arm': body_part_angle.angle_of_the_left_arm(left_shoulder, left_elbow, left_wrist),
+        'right_arm': body_part_angle.angle_of_the_right_arm(right_shoulder, right_elbow, right_wrist),
+        'left_leg': body_part_angle.angle_of_the_left_leg(left_hip, left_knee, left_ankle),
+        'right_leg': body_part_angle.angle_of_the_right_leg(right_hip, right_knee, right_ankle),
+        'left_shoulder': body_part_angle.angle_of_the_abdomen(left_shoulder, left_hip, left_knee),
+        'right_shoulder': body_part_angle.angle_of_the_abdomen(right_shoulder, right_hip, right_knee),
+    }
+
+
+def legacy_calculate_angle(a, b, c):
+    """The NumPy scalar implementation BodyPartAngle.calculate_angle used to have"""
+    a = np.array([a[0], a[1]])
+    b = np.array([b[0], b[1]])
+    c = np.array([c[0], c[1]])
+
+    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
+    angle = np.abs(radians * 180.0 / np.pi)
+
+    if angle > 180.0:
+        angle = 360 - angle
+
+    return angle
+
+
+class LegacyBodyPartAngle(BodyPartAngle):
+    def calculate_angle(self, a, b, c):
+        return legacy_calculate_angle(a, b, c)
+
+
+def vectorized_angles(landmarks):
+    return angles_to_dict(joint_angles(landmarks_to_array(landmarks)))
+
+
+def per_frame_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Joint angle microbenchmark')
+    parser.add_argument('--frames', type=int, default=2000, help='frames in the batched run')
+    parser.add_argument('--number', type=int, default=2000, help='iterations per timing sample')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    stack = rng.random((args.frames, NUM_LANDMARKS, 4))
+    landmarks = [Landmark(*row) for row in stack[0].tolist()]
+
+    # Both paths must agree before timing them
+    expected = legacy_angles(landmarks, LegacyBodyPartAngle())
+    actual = vectorized_angles(landmarks)
+    for name, value in expected.items():
+        assert abs(value - actual[name]) < 1e-9, name
+
+    legacy = per_frame_us(lambda: legacy_angles(landmarks, LegacyBodyPartAngle()), args.number)
+    vectorized = per_frame_us(lambda: vectorized_angles(landmarks), args.number)
+    array_only = per_frame_us(lambda: joint_angles(stack[0]), args.number)
+    batched = min(timeit.repeat(lambda: joint_angles(stack), number=10, repeat=5)) / 10 / args.frames * 1e6
+
+    print(f"legacy BodyPartAngle path     {legacy:8.2f} us/frame")
+    print(f"kinematics (from landmarks)   {vectorized:8.2f} us/frame  ({legacy / vectorized:.1f}x)")
+    print(f"kinematics (from (33,4) array){array_only:8.2f} us/frame  ({legacy / array_only:.1f}x)")
+    print(f"kinematics batched (N={args.frames})  {batched:8.3f} us/frame  ({legacy / batched:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark and regression check: the motion gate on a moving vs a static clip
+
+Runs analyze_frame over two synthetic clips with the server's motion gate
+settings (AI_MOTION_THRESHOLD / AI_MOTION_REFRESH_FRAMES, or --threshold):
+a figure doing reps, and the same figure standing still under sensor noise.
+Reports the skip ratio and time per frame of each, and exits with status 1
+if the moving clip had more than --max-moving-skip of its frames gated,
+since gated frames reuse stale landmarks and change rep counts.
+
+Run from ai_backend/:  python benchmarks/bench_motion_gate.py --threshold 0.01
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import StubPose, synthetic_frame
+
+
+def moving_clip(frames, width=640, height=480, frames_per_rep=30):
+    return [synthetic_frame(width, height, 0.5 - 0.5 * np.cos(2 * np.pi * i / frames_per_rep))
+            for i in range(frames)]
+
+
+def static_clip(frames, width=640, height=480):
+    frame = synthetic_frame(width, height)
+    rng = np.random.default_rng(1)
+    return [np.clip(frame + rng.normal(0, 2, frame.shape), 0, 255).astype(np.uint8) for _ in range(frames)]
+
+
+def run_clip(trainer, frames, session_id):
+    start = time.perf_counter()
+    result = None
+    for index, frame in enumerate(frames):
+        result = trainer.analyze_frame(frame, 'push-up', session_id, timestamp=index / 30.0)
+    return result['skip_ratio'], (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motion gate skip ratio on moving and static clips')
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--threshold', type=float, help='motion threshold (default: AI_MOTION_THRESHOLD)')
+    parser.add_argument('--max-moving-skip', type=float, default=0.05,
+                        help='largest skip ratio allowed on the moving clip')
+    args = parser.parse_args()
+
+    import main as app_main
+
+    threshold = app_main.MOTION_THRESHOLD if args.threshold is None else args.threshold
+    trainer = app_main.AIFitnessTrainer(StubPose(), motion_threshold=threshold,
+                                        motion_refresh=app_main.MOTION_REFRESH_FRAMES)
+    print(f"threshold={threshold} refresh={app_main.MOTION_REFRESH_FRAMES} frames={args.frames}")
+    moving_skip, moving_ms = run_clip(trainer, moving_clip(args.frames), 'bench-moving')
+    static_skip, static_ms = run_clip(trainer, static_clip(args.frames), 'bench-static')
+    print(f"{'clip':<8}{'skip ratio':>12}{'ms/frame':>10}")
+    print(f"{'moving':<8}{moving_skip:>12.3f}{moving_ms:>10.3f}")
+    print(f"{'static':<8}{static_skip:>12.3f}{static_ms:>10.3f}")
+    if moving_skip > args.max_moving_skip:
+        print(f"FAIL: the gate skipped {moving_skip:.1%} of the moving clip (limit {args.max_moving_skip:.1%})")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
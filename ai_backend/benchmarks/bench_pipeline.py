@@ -0,0 +1,223 @@
+"""
+Per-stage benchmark of the analyze_frame pipeline and the two Flask analysis endpoints.
+
+Runs offline on CPU. Frames are synthetic JPEGs at several resolutions (plus
+any JPEGs in --frames-dir). Pose inference uses MediaPipe when it is
+available, or the StubPose fixture with --stub (or when MediaPipe is
+missing) so the non-model stages can be measured on their own.
+
+Run from ai_backend/:
+    python benchmarks/bench_pipeline.py --stub --output results.json
+    python benchmarks/bench_pipeline.py --compare results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import RESOLUTIONS, StubPose, recorded_jpegs, synthetic_jpegs
+from kinematics import angles_to_dict, joint_angles, landmarks_to_array
+from preprocessing import decode_frame, prepare_input
+from types_of_exercise import TypeOfExercise
+
+STAGES = ('decode', 'preprocess', 'inference', 'landmarks', 'kinematics', 'counting',
+          'landmark_dicts', 'serialize', 'total')
+
+
+def load_pose(use_stub):
+    """Return (pose, name): MediaPipe Pose if requested and available, else the stub"""
+    if not use_stub:
+        try:
+            import mediapipe as mp
+            pose = mp.solutions.pose.Pose(
+                static_image_mode=False,
+                model_complexity=0,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+            return pose, 'mediapipe'
+        except (ImportError, AttributeError) as e:
+            print(f'MediaPipe unavailable ({e}); using the pose stub')
+    return StubPose(), 'stub'
+
+
+def summarize(samples_ns):
+    """mean/p50/p99 in microseconds"""
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    return {
+        'mean_us': round(float(samples.mean()), 2),
+        'p50_us': round(float(np.percentile(samples, 50)), 2),
+        'p99_us': round(float(np.percentile(samples, 99)), 2),
+        'samples': int(samples.size),
+    }
+
+
+def bench_stages(jpegs, pose, iterations, app):
+    """Time each analyze_frame stage separately over `iterations` frames"""
+    timings = {stage: [] for stage in STAGES}
+    exercise = TypeOfExercise()
+    previous_points = None
+    clock = time.perf_counter_ns
+
+    for i in range(iterations):
+        data = jpegs[i % len(jpegs)]
+        t0 = clock()
+        frame = decode_frame(data)
+        t1 = clock()
+        image, transform = prepare_input(frame, previous_points)
+        t2 = clock()
+        results = pose.process(image)
+        t3 = clock()
+        if results.pose_landmarks:
+            points = transform.to_frame(landmarks_to_array(results.pose_landmarks))
+        else:
+            points = None
+        previous_points = points
+        t4 = clock()
+        if points is not None:
+            angles = angles_to_dict(joint_angles(points))
+        else:
+            angles = {}
+        t5 = clock()
+        if angles:
+            exercise.push_up(angles['left_arm'], angles['right_arm'],
+                             angles['left_shoulder'], angles['right_shoulder'])
+        t6 = clock()
+        landmarks = [] if points is None else [
+            {'x': x, 'y': y, 'z': z, 'visibility': visibility}
+            for x, y, z, visibility in points.tolist()
+        ]
+        t7 = clock()
+        with app.app_context():
+            jsonify({
+                'success': True,
+                'count': exercise.counter,
+                'calories': exercise.calories,
+                'status': exercise.stage,
+                'feedback': exercise.feedback,
+                'angles': angles,
+                'landmarks': landmarks,
+                'timestamp': datetime.now().isoformat()
+            }).get_data()
+        t8 = clock()
+
+        for stage, start, end in (('decode', t0, t1), ('preprocess', t1, t2), ('inference', t2, t3),
+                                  ('landmarks', t3, t4), ('kinematics', t4, t5), ('counting', t5, t6),
+                                  ('landmark_dicts', t6, t7), ('serialize', t7, t8), ('total', t0, t8)):
+            timings[stage].append(end - start)
+
+    return {stage: summarize(samples) for stage, samples in timings.items()}
+
+
+def bench_endpoints(jpegs, pose, iterations):
+    """Time the Flask endpoints end to end through the test client, or None if main can't load"""
+    try:
+        import main
+    except Exception as e:
+        print(f'Skipping endpoint benchmarks: cannot import main ({e})')
+        return None
+
+    main.ai_trainer.pose = pose
+    client = main.app.test_client()
+    endpoints = {
+        'real_time_analysis': ('/api/real-time-analysis', 'frame', {'exerciseType': 'push-up', 'sessionId': 'bench'}),
+        'analyze_form_image': ('/api/analyze-form', 'media', {'exerciseName': 'push-up', 'sessionId': 'bench-form'}),
+    }
+    results = {}
+    for name, (url, field, form) in endpoints.items():
+        samples = []
+        for i in range(iterations):
+            data = dict(form)
+            data[field] = (io.BytesIO(jpegs[i % len(jpegs)]), 'frame.jpg', 'image/jpeg')
+            start = time.perf_counter_ns()
+            response = client.post(url, data=data, content_type='multipart/form-data')
+            response.get_data()
+            samples.append(time.perf_counter_ns() - start)
+        results[name] = summarize(samples)
+    return results
+
+
+def print_report(report, baseline=None):
+    for label, result in report['resolutions'].items():
+        print(f"\n== {label} ({report['pose']})")
+        sections = [('stage', result['stages'])]
+        if result.get('endpoints'):
+            sections.append(('endpoint', result['endpoints']))
+        for kind, rows in sections:
+            print(f"{kind:<20}{'mean':>10}{'p50':>10}{'p99':>10}{'vs base':>10}")
+            for name, stats in rows.items():
+                delta = ''
+                if baseline:
+                    base = baseline.get('resolutions', {}).get(label, {}).get(
+                        'stages' if kind == 'stage' else 'endpoints', {}) or {}
+                    if name in base and base[name]['mean_us']:
+                        delta = f"{stats['mean_us'] / base[name]['mean_us']:.2f}x"
+                print(f"{name:<20}{stats['mean_us']:>10.1f}{stats['p50_us']:>10.1f}{stats['p99_us']:>10.1f}{delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage analyze_frame benchmark')
+    parser.add_argument('--iterations', type=int, default=200, help='frames per resolution')
+    parser.add_argument('--resolutions', default=','.join(RESOLUTIONS), help='comma-separated labels')
+    parser.add_argument('--frames-dir', help='directory of recorded JPEG frames to include')
+    parser.add_argument('--stub', action='store_true', help='use the pose stub instead of MediaPipe')
+    parser.add_argument('--no-endpoints', action='store_true', help='skip the Flask endpoint runs')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    pose, pose_name = load_pose(args.stub)
+    app = Flask(__name__)
+
+    frame_sets = {}
+    for label in args.resolutions.split(','):
+        width, height = RESOLUTIONS[label]
+        frame_sets[label] = synthetic_jpegs(width, height)
+    if args.frames_dir:
+        frame_sets.update(recorded_jpegs(args.frames_dir))
+
+    report = {
+        'created': datetime.now().isoformat(),
+        'pose': pose_name,
+        'iterations': args.iterations,
+        'platform': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+        },
+        'resolutions': {},
+    }
+    for label, jpegs in frame_sets.items():
+        # One untimed pass so first-call costs don't land in the stats
+        bench_stages(jpegs, pose, len(jpegs), app)
+        result = {'stages': bench_stages(jpegs, pose, args.iterations, app)}
+        if not args.no_endpoints:
+            result['endpoints'] = bench_endpoints(jpegs, pose, args.iterations)
+        report['resolutions'][label] = result
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nSaved results to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
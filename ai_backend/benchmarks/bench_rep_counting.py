@@ -0,0 +1,62 @@
+"""
+Microbenchmark: rep counting over a recorded angle series, per-frame update vs evaluate_series
+
+Run from ai_backend/:  python benchmarks/bench_rep_counting.py
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kinematics import ANGLE_NAMES
+from rep_counting import EXERCISES
+from types_of_exercise import TypeOfExercise
+
+
+def synthetic_series(frames, rng):
+    """Arm and leg angles sweeping between extension and flexion with noise, roughly one rep per 60 frames"""
+    phase = np.linspace(0, frames / 60 * 2 * np.pi, frames)
+    angles = 125 + 60 * np.cos(phase)[:, None] + rng.normal(0, 4, (frames, len(ANGLE_NAMES)))
+    # Keep the body straight so the arm-driven exercises count too
+    for name in ('left_shoulder', 'right_shoulder'):
+        angles[:, ANGLE_NAMES.index(name)] = 170 + rng.normal(0, 4, frames)
+    return angles
+
+
+def per_frame(exercise_type, angles):
+    state = TypeOfExercise()
+    for row in angles.tolist():
+        state.update(exercise_type, dict(zip(ANGLE_NAMES, row)))
+    return state.counter
+
+
+def series(exercise_type, angles):
+    state = TypeOfExercise()
+    state.update_series(exercise_type, angles)
+    return state.counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rep counting microbenchmark')
+    parser.add_argument('--frames', type=int, default=18000, help='frames per series (10 minutes at 30 fps)')
+    args = parser.parse_args()
+
+    angles = synthetic_series(args.frames, np.random.default_rng(0))
+
+    for exercise_type in EXERCISES:
+        # Both paths must agree before timing them
+        assert per_frame(exercise_type, angles) == series(exercise_type, angles), exercise_type
+
+        loop = min(timeit.repeat(lambda: per_frame(exercise_type, angles), number=1, repeat=3))
+        vectorized = min(timeit.repeat(lambda: series(exercise_type, angles), number=1, repeat=5))
+        print(f"{exercise_type:10s} reps={series(exercise_type, angles):4d}  per-frame {loop * 1e3:8.2f} ms  "
+              f"series {vectorized * 1e3:7.2f} ms  ({loop / vectorized:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Serialization benchmark: bytes and microseconds per real-time frame, jsonify vs compact wire formats
+
+Run from ai_backend/:  python benchmarks/bench_serialization.py
+"""
+
+import argparse
+import os
+import sys
+import time
+import timeit
+from datetime import datetime
+
+import numpy as np
+from flask import Flask, jsonify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import wire_format
+from kinematics import NUM_LANDMARKS, joint_angles, angles_to_dict
+
+
+def sample_frame(rng):
+    points = rng.random((NUM_LANDMARKS, 4))
+    return {
+        'count': 12,
+        'calories': 6.0,
+        'status': 'down',
+        'feedback': 'Great depth! Push back up.',
+        'angles': angles_to_dict(joint_angles(points)),
+        'points': points,
+    }
+
+
+def json_path(app, frame):
+    """What /api/real-time-analysis did before: landmark dicts + jsonify"""
+    with app.app_context():
+        landmarks = [
+            {'x': x, 'y': y, 'z': z, 'visibility': visibility}
+            for x, y, z, visibility in frame['points'].tolist()
+        ]
+        return jsonify({
+            'success': True,
+            'exercise_type': 'push-up',
+            'count': frame['count'],
+            'calories': frame['calories'],
+            'status': frame['status'],
+            'feedback': frame['feedback'],
+            'angles': frame['angles'],
+            'landmarks': landmarks,
+            'timestamp': datetime.now().isoformat()
+        }).get_data()
+
+
+def compact_path(fmt, precision, frame):
+    body, _ = wire_format.encode({
+        'exercise_type': 'push-up',
+        'count': frame['count'],
+        'calories': frame['calories'],
+        'status': frame['status'],
+        'feedback': frame['feedback'],
+        'angles': frame['angles'],
+        'landmarks': frame['points'],
+        'timestamp': time.time()
+    }, fmt, precision)
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-frame serialization benchmark')
+    parser.add_argument('--number', type=int, default=2000, help='iterations per timing sample')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    frame = sample_frame(np.random.default_rng(0))
+
+    cases = [('jsonify', lambda: json_path(app, frame))]
+    for fmt in ('binary', 'msgpack'):
+        if fmt == 'msgpack' and wire_format.msgpack is None:
+            print('msgpack not installed, skipping msgpack cases')
+            continue
+        for precision in ('f32', 'f16'):
+            cases.append((f'{fmt}/{precision}', lambda fmt=fmt, precision=precision: compact_path(fmt, precision, frame)))
+
+    baseline = None
+    print(f"{'format':<14}{'bytes/frame':>12}{'us/frame':>10}{'size':>8}{'speed':>8}")
+    for name, func in cases:
+        size = len(func())
+        us = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number * 1e6
+        if baseline is None:
+            baseline = (size, us)
+        print(f"{name:<14}{size:>12}{us:>10.2f}{baseline[0] / size:>7.1f}x{baseline[1] / us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: per-frame round trip over the Unix socket transport vs HTTP multipart
+
+Starts the app in-process on a loopback HTTP port (threaded werkzeug
+server) and on a temporary Unix socket, then sends the same JPEG frames one
+at a time through each: multipart POSTs to /api/real-time-analysis, and
+length-prefixed requests over one Unix socket connection. The same frames
+analyzed by a LiveSession in-process give the floor, so the difference is
+the transport's own cost. Pose inference uses the StubPose fixture and the
+motion gate is off, so every frame runs the same non-model pipeline.
+
+Run from ai_backend/:  python benchmarks/bench_transport.py --frames 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import RESOLUTIONS, StubPose, synthetic_jpegs
+from live_stream import FRAME_HEADER, LiveSession
+from unix_client import UnixClient
+from unix_transport import UnixTransport, bind_unix_socket
+
+
+def summarize(samples):
+    samples = np.asarray(samples) * 1000.0
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p99_ms': float(np.percentile(samples, 99)),
+    }
+
+
+def bench_direct(trainer, jpegs, frames, fmt):
+    session = LiveSession(trainer, 'bench-direct', 'push-up', fmt)
+    samples = []
+    for i in range(frames):
+        message = FRAME_HEADER.pack(i, 0.0) + jpegs[i % len(jpegs)]
+        start = time.perf_counter()
+        session.analyze(message)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_unix(path, jpegs, frames, fmt):
+    samples = []
+    with UnixClient(path, 'bench-unix', 'push-up', fmt) as client:
+        for i in range(frames):
+            start = time.perf_counter()
+            client.analyze(jpegs[i % len(jpegs)], i)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_http(url, jpegs, frames):
+    import requests
+
+    samples = []
+    with requests.Session() as http:
+        for i in range(frames):
+            start = time.perf_counter()
+            response = http.post(
+                url,
+                files={'frame': ('frame.jpg', jpegs[i % len(jpegs)], 'image/jpeg')},
+                data={'exerciseType': 'push-up', 'sessionId': 'bench-http'}
+            )
+            response.raise_for_status()
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Unix socket vs HTTP transport benchmark')
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--resolution', default='480p', choices=list(RESOLUTIONS))
+    parser.add_argument('--format', default='binary', choices=['json', 'binary', 'msgpack'],
+                        help='result format on the Unix socket (HTTP always answers JSON)')
+    args = parser.parse_args()
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    import main as app_main
+
+    trainer = app_main.ai_trainer
+    trainer.pose = StubPose()
+    trainer.motion_threshold = 0
+    jpegs = synthetic_jpegs(*RESOLUTIONS[args.resolution])
+    warmup = min(50, args.frames)
+
+    server = make_server('127.0.0.1', 0, app_main.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/real-time-analysis'
+
+    directory = tempfile.mkdtemp(prefix='bench_transport_')
+    path = os.path.join(directory, 'ai.sock')
+    transport = UnixTransport(trainer, bind_unix_socket(path)).start()
+    try:
+        runs = {
+            'in-process': lambda frames: bench_direct(trainer, jpegs, frames, args.format),
+            'unix socket': lambda frames: bench_unix(path, jpegs, frames, args.format),
+            'http': lambda frames: bench_http(url, jpegs, frames),
+        }
+        for run in runs.values():
+            run(warmup)
+        results = {name: summarize(run(args.frames)) for name, run in runs.items()}
+    finally:
+        transport.close()
+        server.shutdown()
+        os.unlink(path)
+        os.rmdir(directory)
+
+    floor = results['in-process']['mean_ms']
+    print(f"{args.frames} frames at {args.resolution}, stub pose, unix format={args.format}")
+    print(f"{'transport':<14}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'overhead':>10}")
+    for name, stats in results.items():
+        print(f"{name:<14}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['mean_ms'] - floor:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Regression check: record a session's landmarks, then replay the recording
+
+Runs analyze_frame over a synthetic clip with a LandmarkRecorder attached
+(Pose inference uses the StubPose fixture), replays the recording with
+replay.py's replay_recording, and compares frames, reps and calories with
+the live session. It also has several threads record the same new session
+at once and checks the file holds one header and every record whole, and
+that an exercise type cut at the header's 16 bytes still reads back.
+Exits with status 1 on any mismatch.
+
+Run from ai_backend/:  python benchmarks/check_replay.py --frames 300
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import StubPose, synthetic_frame, synthetic_landmarks
+from landmark_recording import LandmarkRecorder, read_recording
+from replay import replay_recording
+
+
+def check_replay(directory, frames, failures):
+    from main import AIFitnessTrainer
+
+    recorder = LandmarkRecorder(directory)
+    trainer = AIFitnessTrainer(StubPose(), recorder=recorder)
+    clip = [synthetic_frame(320, 240, phase) for phase in np.linspace(0.0, 1.0, 8)]
+    result = None
+    for index in range(frames):
+        result = trainer.analyze_frame(clip[index % len(clip)], 'push-up', 'check-replay', timestamp=index / 30.0)
+    replayed = replay_recording(recorder.path_for('check-replay'))
+
+    print(f"{'run':<10}{'frames':>8}{'reps':>6}{'calories':>10}")
+    print(f"{'live':<10}{frames:>8}{result['count']:>6}{result['calories']:>10.2f}")
+    print(f"{'replay':<10}{replayed['frames']:>8}{replayed['total_count']:>6}{replayed['total_calories']:>10.2f}")
+    if replayed['frames'] != frames:
+        failures.append(f"replay saw {replayed['frames']} frames, {frames} were analyzed")
+    if replayed['total_count'] != result['count'] or abs(replayed['total_calories'] - result['calories']) > 1e-6:
+        failures.append('replayed reps or calories differ from the live session')
+
+
+def check_concurrent_writers(directory, threads, frames, failures):
+    recorder = LandmarkRecorder(directory)
+    points = synthetic_landmarks(0.5)
+    exercise_type = 'push-ups-' + 'é' * 8
+
+    def write():
+        for index in range(frames):
+            recorder.record('check-writers', points, index / 30.0, exercise_type)
+
+    workers = [threading.Thread(target=write) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    header, records = read_recording(recorder.path_for('check-writers'))
+    expected = threads * frames
+    print(f"{threads} writers: {len(records)} of {expected} records, exercise type {header['exercise_type']!r}")
+    if len(records) != expected or header['header_size'] + expected * header['record_size'] != os.path.getsize(
+            recorder.path_for('check-writers')):
+        failures.append('concurrent writers left extra headers or partial records')
+    elif not (records['present'] == 1).all() or not np.allclose(records['landmarks'], points):
+        failures.append('concurrent writers interleaved record bytes')
+    if not exercise_type.startswith(header['exercise_type']):
+        failures.append('exercise type did not survive truncation')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record-then-replay check for landmark recordings')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='check_replay_')
+    failures = []
+    try:
+        check_replay(directory, args.frames, failures)
+        check_concurrent_writers(directory, args.threads, args.frames, failures)
+    finally:
+        shutil.rmtree(directory)
+    if failures:
+        print('FAIL: ' + '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Regression check: segment-parallel video analysis against the sequential path
+
+Writes a fixture clip of the stick figure doing reps (or takes --video) and
+analyzes it twice: frame by frame with analyze_video, and split into
+segments across worker processes with analyze_video_segments. Pose
+inference uses the PhasePose fixture, whose landmarks follow the frame
+content, so a segment that seeks to the wrong frame or loses state across
+a boundary shows up as different counts. Exits with status 1 if the runs
+differ in frame count or final rep count, or if more than --max-mismatch of
+the frames report a different count or status.
+
+Run from ai_backend/:  python benchmarks/check_segmented.py --seconds 30 --segment-seconds 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import PhasePose, write_phase_video
+from segmented_analysis import analyze_video_segments, create_executor, plan_segments, video_info
+from video_analysis import AnalysisSummary, analyze_video
+
+
+def run(results):
+    """(count, status) of each frame result, and the seconds taken"""
+    start = time.perf_counter()
+    frames = [(result['count'], result['status']) for result in results]
+    return frames, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segmented vs sequential video analysis')
+    parser.add_argument('--video', help='clip to analyze (default: a generated fixture clip)')
+    parser.add_argument('--seconds', type=float, default=30.0, help='length of the fixture clip')
+    parser.add_argument('--segment-seconds', type=float, default=4.0)
+    parser.add_argument('--overlap', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--exercise', default='push-up')
+    parser.add_argument('--max-mismatch', type=float, default=0.01,
+                        help='largest share of frames allowed to differ in count or status')
+    args = parser.parse_args()
+
+    from main import AIFitnessTrainer
+
+    directory = tempfile.mkdtemp(prefix='check_segmented_')
+    path = args.video
+    if path is None:
+        path = os.path.join(directory, 'fixture.mp4')
+        frames_per_rep = 45
+        write_phase_video(path, [0.5 - 0.5 * np.cos(2 * np.pi * i / frames_per_rep)
+                                 for i in range(int(args.seconds * 30))])
+
+    trainer = AIFitnessTrainer(PhasePose())
+    executor = create_executor(args.workers, {}, PhasePose)
+    try:
+        sequential, sequential_seconds = run(
+            analyze_video(trainer, path, args.exercise, 'check-sequential', AnalysisSummary()))
+        segments = plan_segments(*video_info(path), args.segment_seconds)
+        segmented, segmented_seconds = run(
+            analyze_video_segments(trainer, executor, path, args.exercise, 'check-segmented',
+                                   AnalysisSummary(), segments, args.overlap))
+    finally:
+        executor.shutdown()
+        if args.video is None:
+            os.remove(path)
+        os.rmdir(directory)
+
+    mismatched = sum(a != b for a, b in zip(sequential, segmented)) + abs(len(sequential) - len(segmented))
+    share = mismatched / max(1, len(sequential))
+    print(f"{len(segments)} segments, overlap {args.overlap} frames, {args.workers} workers")
+    print(f"{'run':<12}{'frames':>8}{'reps':>6}{'seconds':>10}")
+    for name, frames, seconds in (('sequential', sequential, sequential_seconds),
+                                  ('segmented', segmented, segmented_seconds)):
+        print(f"{name:<12}{len(frames):>8}{frames[-1][0] if frames else 0:>6}{seconds:>10.2f}")
+    print(f"frames differing in count or status: {mismatched} ({share:.1%})")
+
+    failures = []
+    if len(sequential) != len(segmented):
+        failures.append(f"frame counts differ ({len(sequential)} vs {len(segmented)})")
+    elif sequential and sequential[-1][0] != segmented[-1][0]:
+        failures.append(f"final rep counts differ ({sequential[-1][0]} vs {segmented[-1][0]})")
+    if share > args.max_mismatch:
+        failures.append(f"{share:.1%} of frames differ (limit {args.max_mismatch:.1%})")
+    if failures:
+        print('FAIL: ' + '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
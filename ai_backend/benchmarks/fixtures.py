@@ -0,0 +1,134 @@
+"""
+Offline fixtures for the benchmarks: synthetic frames and a pose stub.
+"""
+
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from inference_pool import PoseResult
+from kinematics import NUM_LANDMARKS
+
+RESOLUTIONS = {
+    '480p': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+# A standing figure in normalized coordinates (x, y) for the landmarks we draw
+_SKELETON = {
+    0: (0.50, 0.18),
+    11: (0.44, 0.30), 12: (0.56, 0.30),
+    13: (0.40, 0.42), 14: (0.60, 0.42),
+    15: (0.38, 0.54), 16: (0.62, 0.54),
+    23: (0.46, 0.56), 24: (0.54, 0.56),
+    25: (0.45, 0.72), 26: (0.55, 0.72),
+    27: (0.45, 0.88), 28: (0.55, 0.88),
+}
+_BONES = [(11, 12), (11, 13), (13, 15), (12, 14), (14, 16), (11, 23), (12, 24),
+          (23, 24), (23, 25), (25, 27), (24, 26), (26, 28)]
+# Background gray level of write_phase_video frames: _PHASE_BLACK + _PHASE_RANGE * phase
+_PHASE_BLACK = 40
+_PHASE_RANGE = 150
+
+
+def synthetic_landmarks(phase=0.0):
+    """(33, 4) landmarks of the standing figure, with the arms bent by `phase` (0..1)"""
+    points = np.zeros((NUM_LANDMARKS, 4), dtype=np.float64)
+    points[:, :2] = 0.5
+    points[:, 3] = 0.2
+    for index, (x, y) in _SKELETON.items():
+        points[index] = (x, y, 0.0, 0.99)
+    # Swing the wrists toward the shoulders to vary the arm angles between frames
+    for wrist, elbow in ((15, 13), (16, 14)):
+        points[wrist, 1] -= 0.15 * phase
+        points[wrist, 0] += (points[elbow, 0] - points[wrist, 0]) * phase
+    return points
+
+
+def synthetic_frame(width, height, phase=0.0, seed=0):
+    """BGR frame with a noisy background and the stick figure drawn on it"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+    points = synthetic_landmarks(phase)
+    thickness = max(2, width // 120)
+    for a, b in _BONES:
+        pa = (int(points[a, 0] * width), int(points[a, 1] * height))
+        pb = (int(points[b, 0] * width), int(points[b, 1] * height))
+        cv2.line(frame, pa, pb, (220, 200, 180), thickness)
+    head = (int(points[0, 0] * width), int(points[0, 1] * height))
+    cv2.circle(frame, head, max(4, width // 40), (220, 200, 180), -1)
+    return frame
+
+
+def synthetic_jpegs(width, height, count=8, quality=85):
+    """JPEG-encoded synthetic frames covering one rep"""
+    jpegs = []
+    for i in range(count):
+        phase = 0.5 - 0.5 * np.cos(2 * np.pi * i / count)
+        ok, buffer = cv2.imencode('.jpg', synthetic_frame(width, height, phase, seed=i),
+                                  [cv2.IMWRITE_JPEG_QUALITY, quality])
+        jpegs.append(buffer.tobytes())
+    return jpegs
+
+
+def recorded_jpegs(directory):
+    """JPEG frames from a directory of recordings, grouped by resolution label"""
+    groups = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.jp*g'))):
+        with open(path, 'rb') as f:
+            data = f.read()
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            continue
+        groups.setdefault(f'recorded-{frame.shape[1]}x{frame.shape[0]}', []).append(data)
+    return groups
+
+
+def write_phase_video(path, phases, width=320, height=240, fps=30.0):
+    """Write an MP4 of the stick figure on a flat background whose gray level encodes each frame's phase"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    try:
+        for phase in phases:
+            frame = synthetic_frame(width, height, phase)
+            background = np.all(frame < 100, axis=2)
+            frame[background] = int(round(_PHASE_BLACK + _PHASE_RANGE * phase))
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+class PhasePose:
+    """Pose stand-in for write_phase_video clips: landmarks follow the phase read off each frame.
+
+    The result depends only on the frame, as a model's would, so runs that
+    see the same frames agree and a run handed the wrong frames does not.
+    """
+
+    def __init__(self, **kwargs):
+        pass
+
+    def process(self, image):
+        phase = (float(np.median(image)) - _PHASE_BLACK) / _PHASE_RANGE
+        return PoseResult(synthetic_landmarks(min(max(phase, 0.0), 1.0)))
+
+    def close(self):
+        pass
+
+
+class StubPose:
+    """Drop-in for mediapipe Pose that returns canned landmarks without running a model"""
+
+    def __init__(self, **kwargs):
+        self._frames = [synthetic_landmarks(phase) for phase in np.linspace(0.0, 1.0, 8)]
+        self._index = 0
+
+    def process(self, image):
+        points = self._frames[self._index % len(self._frames)]
+        self._index += 1
+        return PoseResult(points)
+
+    def close(self):
+        pass
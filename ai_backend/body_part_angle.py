@@ -1,5 +1,4 @@
-import math
-import numpy as np
+from kinematics import calculate_angle
 
 class BodyPartAngle:
     def __init__(self):
@@ -47,14 +46,4 @@ class BodyPartAngle:
     
     def calculate_angle(self, a, b, c):
         """Calculate angle between three points"""
-        a = np.array([a[0], a[1]])
-        b = np.array([b[0], b[1]])
-        c = np.array([c[0], c[1]])
-        
-        radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-        angle = np.abs(radians * 180.0 / np.pi)
-        
-        if angle > 180.0:
-            angle = 360 - angle
-            
-        return angle 
\ No newline at end of file
+        return calculate_angle(a, b, c)
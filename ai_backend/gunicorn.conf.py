@@ -0,0 +1,35 @@
+# Pre-forking production server: gunicorn -c gunicorn.conf.py main:app  (run from ai_backend/)
+#
+# The app is imported once in the master (preload_app) and the workers are
+# forked from it, sharing the imported code, rep counting tables and model
+# files copy-on-write. Each worker then builds and warms up its own Pose model
+# (see model_lifecycle.py) and reports ready on /ready when done.
+import gc
+import os
+
+bind = os.environ.get('AI_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('AI_GUNICORN_WORKERS', '2'))
+worker_class = 'gthread'
+threads = int(os.environ.get('AI_SERVER_THREADS', '16'))
+preload_app = True
+# Long uploads are analyzed in the request
+timeout = 300
+
+
+def on_starting(server):
+    # Fetch and read the model files once, before any worker exists
+    import main
+    from model_lifecycle import preload_assets
+    preload_assets(main.POSE_OPTIONS['model_complexity'])
+    # Bind AI_UNIX_SOCKET here so every worker accepts on the one listener
+    main.listen_unix()
+
+
+def when_ready(server):
+    # Keep the collector from touching (and so copying) every preloaded object in each worker
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import main
+    main.start_worker()
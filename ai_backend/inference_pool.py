@@ -0,0 +1,202 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import Future
+
+import numpy as np
+
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+
+class PoseLandmarks:
+    """Minimal stand-in for MediaPipe's NormalizedLandmarkList"""
+    __slots__ = ('array',)
+
+    def __init__(self, array):
+        self.array = array
+
+    @property
+    def landmark(self):
+        return [Landmark(*row) for row in self.array.tolist()]
+
+
+class PoseResult:
+    """Result of a pooled inference, shaped like MediaPipe's pose output"""
+    __slots__ = ('pose_landmarks',)
+
+    def __init__(self, array):
+        self.pose_landmarks = PoseLandmarks(array) if array is not None else None
+
+
+def _worker_main(worker_id, jobs, results, pose_kwargs):
+    """Worker process: owns one MediaPipe Pose instance and serves jobs from its queue"""
+    import mediapipe as mp
+    from model_lifecycle import warm_up
+
+    pose = mp.solutions.pose.Pose(**pose_kwargs)
+
+    # Warm up the graph before taking real frames so a restarted worker is not cold
+    warm_up(pose)
+    results.put(('ready', worker_id, None, None))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        job_id, image = job
+        try:
+            output = pose.process(image)
+            if output.pose_landmarks:
+                array = np.array(
+                    [(lm.x, lm.y, lm.z, lm.visibility) for lm in output.pose_landmarks.landmark],
+                    dtype=np.float32
+                )
+            else:
+                array = None
+            results.put(('result', worker_id, job_id, array))
+        except Exception as e:
+            results.put(('error', worker_id, job_id, str(e)))
+
+    pose.close()
+
+
+class InferencePool:
+    """Pool of worker processes, each owning its own MediaPipe Pose instance.
+
+    Jobs with the same key (the session id) always go to the same worker, so
+    frames of one session are processed in submission order and keep
+    MediaPipe's tracking state. A worker that dies is replaced by a fresh one
+    which warms up before it is handed any work.
+    """
+
+    def __init__(self, workers=None, pose_kwargs=None, start_method='spawn', ready_timeout=60,
+                 restart_delay=1.0):
+        self.num_workers = workers or os.cpu_count() or 1
+        self.pose_kwargs = pose_kwargs or {}
+        self.ready_timeout = ready_timeout
+        self.restart_delay = restart_delay
+        self._ctx = multiprocessing.get_context(start_method)
+        self._results = self._ctx.Queue()
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = [None] * self.num_workers
+        self._spawned_at = [0.0] * self.num_workers
+        self._queues = [None] * self.num_workers
+        self._pending = [dict() for _ in range(self.num_workers)]
+        self._ready = [threading.Event() for _ in range(self.num_workers)]
+        self._round_robin = itertools.count()
+        self._closed = False
+
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    def _spawn(self, worker_id):
+        """Start (or restart) the worker process for a slot"""
+        self._ready[worker_id].clear()
+        jobs = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, jobs, self._results, self.pose_kwargs),
+            daemon=True
+        )
+        process.start()
+        self._queues[worker_id] = jobs
+        self._workers[worker_id] = process
+        self._spawned_at[worker_id] = time.time()
+
+    def _collect(self):
+        """Route results from the shared result queue back to their futures"""
+        while True:
+            try:
+                kind, worker_id, job_id, payload = self._results.get()
+            except (EOFError, OSError):
+                break
+
+            if kind == 'ready':
+                self._ready[worker_id].set()
+                continue
+            if kind == 'stop':
+                break
+
+            with self._lock:
+                future = self._pending[worker_id].pop(job_id, None)
+            if future is None:
+                continue
+            if kind == 'error':
+                future.set_exception(RuntimeError(payload))
+            else:
+                future.set_result(PoseResult(payload))
+
+    def _supervise(self):
+        """Restart crashed workers and fail the jobs they were holding"""
+        while not self._closed:
+            time.sleep(0.5)
+            for worker_id, process in enumerate(self._workers):
+                if self._closed or process.is_alive():
+                    continue
+                # Don't spin if a worker keeps dying during startup
+                if time.time() - self._spawned_at[worker_id] < self.restart_delay:
+                    continue
+                with self._lock:
+                    orphaned = self._pending[worker_id]
+                    self._pending[worker_id] = {}
+                    self._spawn(worker_id)
+                for future in orphaned.values():
+                    future.set_exception(RuntimeError('Inference worker crashed'))
+
+    def _worker_for(self, key):
+        if key is None:
+            return next(self._round_robin) % self.num_workers
+        return zlib.crc32(str(key).encode('utf-8')) % self.num_workers
+
+    def submit(self, image, key=None):
+        """Queue an RGB frame for inference and return a Future of its PoseResult"""
+        if self._closed:
+            raise RuntimeError('Inference pool is closed')
+
+        worker_id = self._worker_for(key)
+        if not self._ready[worker_id].wait(self.ready_timeout):
+            raise RuntimeError('Inference worker is not ready')
+
+        future = Future()
+        with self._lock:
+            job_id = next(self._job_ids)
+            self._pending[worker_id][job_id] = future
+            self._queues[worker_id].put((job_id, image))
+        return future
+
+    def process(self, image, key=None, timeout=None):
+        """Run inference on an RGB frame and block until the result is back"""
+        return self.submit(image, key).result(timeout)
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has finished warming up"""
+        deadline = None if timeout is None else time.time() + timeout
+        for event in self._ready:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def close(self):
+        """Stop all workers"""
+        if self._closed:
+            return
+        self._closed = True
+        for jobs in self._queues:
+            jobs.put(None)
+        for process in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(('stop', None, None, None))
@@ -0,0 +1,299 @@
+"""
+Background analysis jobs for uploaded videos.
+
+A job is a directory under the jobs root holding the uploaded video, a
+job.json record and, once finished, result.json (the body /api/analyze-form
+would have returned) and optionally annotated.mp4 with the skeleton and rep
+counter drawn in. The directories are the queue: a job waits while its record
+says 'queued', and a runner takes it by creating its claim file with O_EXCL,
+so several server processes can share one jobs root and every job still runs
+once. The runner holding a claim touches it on every poll; a claim left
+untouched for CLAIM_TIMEOUT seconds belongs to a process that died, and its
+job is queued again. Queued jobs likewise survive a restart.
+
+Jobs run in a small pool of worker processes, each with its own Pose
+instance, so neither inference nor video encoding for a job ever runs on a
+request thread or shares the live model.
+"""
+
+import functools
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from kinematics import angles_to_dict, joint_angles
+from segmented_analysis import create_executor, track_frames, video_info, worker_pose
+from types_of_exercise import TypeOfExercise
+from utils import add_text_overlay, create_video_writer, draw_landmarks
+from video_analysis import AnalysisSummary, frame_result, no_person_result
+
+JOB_FILE = 'job.json'
+RESULT_FILE = 'result.json'
+ANNOTATED_FILE = 'annotated.mp4'
+CLAIM_FILE = 'claim'
+
+# Seconds between progress updates written to a running job's record
+PROGRESS_INTERVAL = 1.0
+# Seconds after which an untouched claim is considered abandoned
+CLAIM_TIMEOUT = 60.0
+
+class JobStore:
+    """Job records and files under one directory, one subdirectory per job"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, job_id, name=''):
+        return os.path.join(self.directory, job_id, name)
+
+    def _valid_id(self, job_id):
+        return len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)
+
+    def create(self, source_path, suffix, exercise_type, annotate=False, smoothing=True):
+        """Move an uploaded video into a new queued job and return its record"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.path(job_id))
+        shutil.move(source_path, self.path(job_id, 'input' + suffix))
+        job = {
+            'id': job_id,
+            'state': 'queued',
+            'exercise_type': exercise_type,
+            'annotate': annotate,
+            'smoothing': smoothing,
+            'input': 'input' + suffix,
+            'frames_done': 0,
+            'frames_total': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None
+        }
+        self._write(job_id, job)
+        return job
+
+    def get(self, job_id):
+        """A job's record, or None if there is no such job"""
+        if not self._valid_id(job_id):
+            return None
+        try:
+            with open(self.path(job_id, JOB_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        self._write(job_id, job)
+        return job
+
+    def _write(self, job_id, job):
+        temp_path = self.path(job_id, JOB_FILE + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(temp_path, self.path(job_id, JOB_FILE))
+
+    def claim(self, job_id):
+        """Take a queued job for this process; False if another process already has it"""
+        try:
+            fd = os.open(self.path(job_id, CLAIM_FILE), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except (FileExistsError, FileNotFoundError):
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def touch(self, job_id):
+        """Renew this process's claim on a job"""
+        try:
+            os.utime(self.path(job_id, CLAIM_FILE))
+        except FileNotFoundError:
+            pass
+
+    def release(self, job_id):
+        try:
+            os.remove(self.path(job_id, CLAIM_FILE))
+        except FileNotFoundError:
+            pass
+
+    def jobs(self):
+        """Records of all jobs, oldest first"""
+        records = [self.get(name) for name in os.listdir(self.directory)]
+        return sorted((job for job in records if job is not None), key=lambda job: job['created_at'])
+
+    def queued(self):
+        """Ids of unclaimed queued jobs, oldest first"""
+        return [job['id'] for job in self.jobs()
+                if job['state'] == 'queued' and not os.path.exists(self.path(job['id'], CLAIM_FILE))]
+
+    def recover(self, timeout=CLAIM_TIMEOUT):
+        """Queue again the unfinished jobs whose claim has not been renewed for `timeout` seconds"""
+        cutoff = time.time() - timeout
+        for job in self.jobs():
+            if job['state'] not in ('queued', 'running'):
+                continue
+            try:
+                abandoned = os.path.getmtime(self.path(job['id'], CLAIM_FILE)) < cutoff
+            except FileNotFoundError:
+                continue
+            if abandoned:
+                self.update(job['id'], state='queued', frames_done=0, started_at=None)
+                self.release(job['id'])
+
+    def prune(self, max_age):
+        """Delete finished jobs older than `max_age` seconds"""
+        cutoff = time.time() - max_age
+        for job in self.jobs():
+            if job['state'] in ('done', 'failed') and (job['finished_at'] or 0) < cutoff:
+                shutil.rmtree(self.path(job['id']), ignore_errors=True)
+
+
+def annotate_frame(frame, points, result):
+    """Draw the skeleton, rep counter and feedback onto a BGR frame in place"""
+    if points is not None:
+        draw_landmarks(frame, points)
+    add_text_overlay(frame, f"Reps: {result['count']}", (10, 40), font_scale=1.2, thickness=3)
+    add_text_overlay(frame, result['status'], (10, 80), font_scale=0.8)
+    add_text_overlay(frame, result['feedback'], (10, frame.shape[0] - 20), font_scale=0.6, color=(0, 255, 255))
+    return frame
+
+
+def run_job(directory, job_id):
+    """Analyze (and optionally render) one claimed job; runs in a job worker process"""
+    store = JobStore(directory)
+    job = store.update(job_id, state='running', started_at=time.time())
+    path = store.path(job_id, job['input'])
+    exercise_type = job['exercise_type']
+    frame_count, fps = video_info(path)
+    store.update(job_id, frames_total=frame_count)
+
+    exercise_state = TypeOfExercise()
+    summary = AnalysisSummary()
+    writer = None
+    annotated_path = store.path(job_id, ANNOTATED_FILE + '.tmp.mp4')
+    result_path = store.path(job_id, RESULT_FILE + '.tmp')
+    last_progress = time.monotonic()
+    try:
+        # Frames are written out as they are analyzed, so memory stays flat however long the video is
+        with open(result_path, 'w') as out:
+            out.write('{"frame_analysis": [')
+            for index, _, frame, points in track_frames(worker_pose(), path, smoothing=job['smoothing']):
+                if points is None:
+                    result = no_person_result(exercise_state.counter, exercise_state.calories)
+                else:
+                    angles = angles_to_dict(joint_angles(points))
+                    count, status, feedback, calories = exercise_state.update(exercise_type, angles)
+                    result = frame_result(count, status, feedback, calories, angles, points)
+                summary.update(result)
+                out.write((', ' if index else '') + json.dumps(result))
+
+                if job['annotate']:
+                    if writer is None:
+                        height, width = frame.shape[:2]
+                        writer = create_video_writer(annotated_path, fps, (width, height))
+                    writer.write(annotate_frame(frame, points, result))
+
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    store.update(job_id, frames_done=index + 1)
+                    last_progress = time.monotonic()
+
+            out.write('], ' + json.dumps({
+                'success': True,
+                'exercise_type': exercise_type,
+                **summary.to_dict(),
+                'timestamp': datetime.now().isoformat()
+            })[1:])
+    except Exception as e:
+        store.update(job_id, state='failed', error=f'Analysis failed: {str(e)}', finished_at=time.time())
+        return
+    finally:
+        if writer is not None:
+            writer.release()
+
+    os.replace(result_path, store.path(job_id, RESULT_FILE))
+    if writer is not None:
+        os.replace(annotated_path, store.path(job_id, ANNOTATED_FILE))
+    # The upload is no longer needed once the results are on disk
+    os.remove(path)
+    store.update(job_id, state='done', frames_done=summary.frames, finished_at=time.time())
+
+
+class JobRunner:
+    """Claims queued jobs from a JobStore and runs them on a bounded pool of worker processes"""
+
+    def __init__(self, store, workers=1, pose_kwargs=None, poll_interval=2.0, retention=24 * 3600):
+        self.store = store
+        self.workers = workers
+        self.pose_kwargs = pose_kwargs or {}
+        # Other processes sharing the jobs root are noticed by polling
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._held = set()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    @property
+    def running(self):
+        return len(self._held)
+
+    def start(self):
+        """Start dispatching queued jobs, including ones left over from a previous run"""
+        self._executor = create_executor(self.workers, self.pose_kwargs)
+        threading.Thread(target=self._dispatch, name='job-dispatch', daemon=True).start()
+
+    def notify(self):
+        """Look for queued jobs now rather than at the next poll"""
+        self._wakeup.set()
+
+    def _dispatch(self):
+        next_prune = 0.0
+        while True:
+            if time.monotonic() >= next_prune:
+                self.store.prune(self.retention)
+                next_prune = time.monotonic() + 3600
+            with self._lock:
+                held = list(self._held)
+            for job_id in held:
+                self.store.touch(job_id)
+            self.store.recover()
+
+            for job_id in self.store.queued():
+                with self._lock:
+                    if len(self._held) >= self.workers:
+                        break
+                if not self.store.claim(job_id):
+                    continue
+                with self._lock:
+                    self._held.add(job_id)
+                try:
+                    future = self._executor.submit(run_job, self.store.directory, job_id)
+                except BrokenProcessPool:
+                    # A worker died and took the pool with it
+                    self._executor = create_executor(self.workers, self.pose_kwargs)
+                    future = self._executor.submit(run_job, self.store.directory, job_id)
+                future.add_done_callback(functools.partial(self._finished, job_id))
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _finished(self, job_id, future):
+        error = future.exception()
+        if error is not None:
+            self.store.update(job_id, state='failed', error=f'Job worker failed: {str(error)}',
+                              finished_at=time.time())
+        self.store.release(job_id)
+        with self._lock:
+            self._held.discard(job_id)
+        self._wakeup.set()
+
+    def pending(self):
+        """Jobs waiting to be claimed"""
+        return len(self.store.queued())
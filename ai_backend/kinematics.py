@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+
+NUM_LANDMARKS = 33
+
+# MediaPipe Pose landmark indices used by the angle calculations
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_ELBOW = 13
+RIGHT_ELBOW = 14
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+
+# The landmarks above as (name, index), in index order
+USED_LANDMARKS = (
+    ('left_shoulder', LEFT_SHOULDER), ('right_shoulder', RIGHT_SHOULDER),
+    ('left_elbow', LEFT_ELBOW), ('right_elbow', RIGHT_ELBOW),
+    ('left_wrist', LEFT_WRIST), ('right_wrist', RIGHT_WRIST),
+    ('left_hip', LEFT_HIP), ('right_hip', RIGHT_HIP),
+    ('left_knee', LEFT_KNEE), ('right_knee', RIGHT_KNEE),
+    ('left_ankle', LEFT_ANKLE), ('right_ankle', RIGHT_ANKLE),
+)
+
+# Joint angles as (name, (a, b, c)): the angle at b between b->a and b->c
+JOINT_ANGLES = (
+    ('left_arm', (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST)),
+    ('right_arm', (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST)),
+    ('left_leg', (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)),
+    ('right_leg', (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE)),
+    ('left_shoulder', (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE)),
+    ('right_shoulder', (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE)),
+)
+
+ANGLE_NAMES = tuple(name for name, _ in JOINT_ANGLES)
+
+# Precomputed index arrays: for every joint, the two ray endpoints and the shared vertex
+_TRIPLES = np.array([triple for _, triple in JOINT_ANGLES], dtype=np.intp)
+_ENDPOINTS = np.concatenate([_TRIPLES[:, 2], _TRIPLES[:, 0]])
+_VERTICES = np.concatenate([_TRIPLES[:, 1], _TRIPLES[:, 1]])
+_NUM_JOINTS = len(JOINT_ANGLES)
+
+
+def landmarks_to_array(landmarks):
+    """Convert MediaPipe pose landmarks to a (33, 4) array of x, y, z, visibility"""
+    array = getattr(landmarks, 'array', None)
+    if array is not None:
+        return array
+    if hasattr(landmarks, 'landmark'):
+        landmarks = landmarks.landmark
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float64)
+
+
+def joint_angles(points):
+    """Compute every joint angle in degrees from a (33, 4) or (N, 33, 4) landmark array.
+
+    Returns an array of shape (len(JOINT_ANGLES),) or (N, len(JOINT_ANGLES)),
+    ordered like ANGLE_NAMES. Only the x and y coordinates are used.
+    """
+    points = np.asarray(points)
+    rays = points[..., _ENDPOINTS, :2] - points[..., _VERTICES, :2]
+    theta = np.arctan2(rays[..., 1], rays[..., 0])
+    angles = np.abs(np.degrees(theta[..., :_NUM_JOINTS] - theta[..., _NUM_JOINTS:]))
+    return np.where(angles > 180.0, 360.0 - angles, angles)
+
+
+def angles_to_dict(angles):
+    """Map a single frame's angle vector to {name: angle}"""
+    return dict(zip(ANGLE_NAMES, angles.tolist()))
+
+
+def calculate_angle(a, b, c):
+    """Calculate the angle at b between three (x, y) points"""
+    radians = math.atan2(c[1] - b[1], c[0] - b[0]) - math.atan2(a[1] - b[1], a[0] - b[0])
+    angle = abs(math.degrees(radians))
+
+    if angle > 180.0:
+        angle = 360 - angle
+
+    return angle
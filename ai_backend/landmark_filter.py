@@ -0,0 +1,92 @@
+"""
+Per-session temporal smoothing of pose landmarks.
+
+LandmarkFilter is a One-Euro filter (Casiez et al., CHI 2012) over the
+(33, 4) landmark array: x, y and z are low-pass filtered with a cutoff that
+rises with speed, so a still pose stops jittering while fast reps keep up;
+visibility is passed through. All state is preallocated and every update is
+a handful of in-place array operations over the 33 landmarks.
+
+The filter also keeps a smoothed velocity, which predict() uses to
+extrapolate landmarks for frames that skip inference.
+"""
+
+import math
+
+import numpy as np
+
+from kinematics import NUM_LANDMARKS
+
+
+class LandmarkFilter:
+    """One-Euro filter over one session's landmarks"""
+
+    def __init__(self, min_cutoff=1.5, beta=20.0, d_cutoff=1.0, max_gap=1.0, max_extrapolation=0.25):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        # Longer gaps than this restart the filter instead of smoothing across them
+        self.max_gap = max_gap
+        # predict() refuses to extrapolate further than this past the last update
+        self.max_extrapolation = max_extrapolation
+
+        self.value = np.zeros((NUM_LANDMARKS, 3))
+        self.velocity = np.zeros((NUM_LANDMARKS, 3))
+        self.visibility = np.zeros(NUM_LANDMARKS)
+        self._scratch = np.zeros((NUM_LANDMARKS, 3))
+        self.last_time = None
+
+    def reset(self):
+        """Forget the previous pose, e.g. when the person was lost"""
+        self.last_time = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, points, timestamp):
+        """Filter one frame's (33, 4) landmarks taken at `timestamp` seconds; returns a new array"""
+        dt = None if self.last_time is None else timestamp - self.last_time
+        if dt is None or dt <= 0 or dt > self.max_gap:
+            self.value[:] = points[:, :3]
+            self.velocity[:] = 0.0
+        else:
+            scratch = self._scratch
+            # Smoothed velocity
+            np.subtract(points[:, :3], self.value, out=scratch)
+            scratch /= dt
+            scratch -= self.velocity
+            scratch *= self._alpha(self.d_cutoff, dt)
+            self.velocity += scratch
+
+            # Speed-dependent cutoff per landmark, from the velocity magnitude
+            speed = np.sqrt(np.einsum('ij,ij->i', self.velocity, self.velocity))
+            tau = 1.0 / (2 * math.pi * (self.min_cutoff + self.beta * speed))
+            alpha = 1.0 / (1.0 + tau / dt)
+
+            np.subtract(points[:, :3], self.value, out=scratch)
+            scratch *= alpha[:, None]
+            self.value += scratch
+
+        self.visibility[:] = points[:, 3]
+        self.last_time = timestamp
+        return self._output(self.value)
+
+    def predict(self, timestamp):
+        """Extrapolated (33, 4) landmarks at `timestamp`, or None if there is no recent pose"""
+        if self.last_time is None:
+            return None
+        dt = timestamp - self.last_time
+        if dt < 0 or dt > self.max_extrapolation:
+            return None
+        return self._output(self.value + self.velocity * dt)
+
+    def _output(self, xyz):
+        points = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        points[:, :3] = xyz
+        points[:, 3] = self.visibility
+        return points
+
+    def size_bytes(self):
+        return self.value.nbytes + self.velocity.nbytes + self.visibility.nbytes + self._scratch.nbytes
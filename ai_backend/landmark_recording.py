@@ -0,0 +1,121 @@
+"""
+Append-only landmark recordings.
+
+A recording holds one session's per-frame pose landmarks so it can be
+re-scored later without running the model. Layout, little-endian::
+
+    header  32 bytes: magic b'GBLR', version (u2), header size (u2),
+            record size (u4), landmarks per record (u2), reserved (u2),
+            exercise type (16 bytes, NUL padded)
+    records fixed-width RECORD_DTYPE entries, one per analyzed frame
+
+Frames without a person are recorded with present=0 so the timeline is kept.
+read_recording() maps the records with numpy.memmap.
+
+Several threads or server processes may append to one session's recording.
+The file is created with its header in place (linked from a temporary file,
+which fails if another writer got there first), and each record goes out in
+a single O_APPEND write, so writers never interleave a second header or a
+partial record.
+"""
+
+import os
+import re
+import struct
+import uuid
+
+import numpy as np
+
+from kinematics import NUM_LANDMARKS
+
+MAGIC = b'GBLR'
+VERSION = 1
+FILE_EXTENSION = '.lmr'
+
+_HEADER = struct.Struct('<4sHHIHH16s')
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('present', '<u4'),
+    ('reserved', '<u4'),
+    ('landmarks', '<f4', (NUM_LANDMARKS, 4)),
+])
+
+_EMPTY_LANDMARKS = np.zeros((NUM_LANDMARKS, 4), dtype='<f4')
+
+
+def _encode_header(exercise_type):
+    # Cut on a character boundary so read_header can decode the name
+    exercise = (exercise_type or '').encode('utf-8')[:16].decode('utf-8', 'ignore').encode('utf-8')
+    return _HEADER.pack(MAGIC, VERSION, _HEADER.size, RECORD_DTYPE.itemsize, NUM_LANDMARKS, 0, exercise)
+
+
+def _create(path, exercise_type):
+    """Create a recording holding only its header, unless one already exists at path"""
+    temp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_encode_header(exercise_type))
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temp_path)
+
+
+def append_frame(path, points, timestamp, exercise_type=None):
+    """Append one frame's (33, 4) landmarks (or None for no person) to a recording"""
+    record = np.zeros(1, dtype=RECORD_DTYPE)
+    record['timestamp'] = timestamp
+    if points is not None:
+        record['present'] = 1
+        record['landmarks'] = points
+    else:
+        record['landmarks'] = _EMPTY_LANDMARKS
+
+    if not os.path.exists(path):
+        _create(path, exercise_type)
+    # Unbuffered, so the record is one write() and O_APPEND places it whole at the end
+    with open(path, 'ab', buffering=0) as f:
+        f.write(record.tobytes())
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        data = f.read(_HEADER.size)
+    magic, version, header_size, record_size, num_landmarks, _, exercise = _HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f'Not a landmark recording: {path}')
+    return {
+        'version': version,
+        'header_size': header_size,
+        'record_size': record_size,
+        'num_landmarks': num_landmarks,
+        'exercise_type': exercise.rstrip(b'\0').decode('utf-8') or None,
+    }
+
+
+def read_recording(path):
+    """Return (header, records) with records memory-mapped as a RECORD_DTYPE array"""
+    header = read_header(path)
+    # A writer may be mid-append; only map whole records
+    count = (os.path.getsize(path) - header['header_size']) // header['record_size']
+    if count == 0:
+        return header, np.zeros(0, dtype=RECORD_DTYPE)
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=header['header_size'], shape=(count,))
+    return header, records
+
+
+class LandmarkRecorder:
+    """Writes every session's frames to <directory>/<session_id>.lmr"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, session_id):
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(session_id))[:128] or 'default'
+        return os.path.join(self.directory, safe_id + FILE_EXTENSION)
+
+    def record(self, session_id, points, timestamp, exercise_type=None):
+        append_frame(self.path_for(session_id), points, timestamp, exercise_type)
@@ -0,0 +1,144 @@
+"""
+Reference client for the /ws/live streaming endpoint.
+
+Streams JPEG frames over one WebSocket and reports round-trip latency per
+frame; with --compare-http it also posts the same frames to
+/api/real-time-analysis for a side-by-side measurement.
+
+    python live_client.py --image frame.jpg --frames 200 --compare-http
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import wire_format
+from live_stream import FRAME_HEADER, RESULT_HEADER
+
+
+def load_jpeg(path, width=640, height=480):
+    """Read a JPEG from disk, or encode a synthetic frame when no path is given"""
+    if path:
+        with open(path, 'rb') as f:
+            return f.read()
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    ok, buffer = cv2.imencode('.jpg', frame)
+    return buffer.tobytes()
+
+
+def decode_reply(reply):
+    """Return (seq, payload) for a result message"""
+    if isinstance(reply, str):
+        message = json.loads(reply)
+        return message.get('seq'), message
+    (seq,) = RESULT_HEADER.unpack_from(reply, 0)
+    body = reply[RESULT_HEADER.size:]
+    if body[:4] == wire_format.MAGIC:
+        return seq, wire_format.decode_binary(body)
+    return seq, wire_format.decode_msgpack(body)
+
+
+def run_websocket(url, jpeg, frames, window):
+    """Stream frames with up to `window` in flight; returns (latencies in ms, last result, frames dropped).
+
+    The server coalesces frames that queue up behind the one being analyzed
+    and never answers the frames it replaced, so a result for seq N settles
+    every earlier frame still in flight; only answered frames have a latency.
+    """
+    from simple_websocket import Client
+
+    ws = Client.connect(url)
+    try:
+        ready = json.loads(ws.receive())
+        print(f"connected: session {ready['sessionId']} ({ready['exerciseType']}, {ready['format']})")
+
+        sent_at = {}
+        latencies = []
+        last = None
+        dropped = 0
+        next_seq = 0
+        while next_seq < frames or sent_at:
+            while next_seq < frames and len(sent_at) < window:
+                sent_at[next_seq] = time.perf_counter()
+                ws.send(FRAME_HEADER.pack(next_seq, time.time() * 1000.0) + jpeg)
+                next_seq += 1
+            seq, last = decode_reply(ws.receive())
+            if seq is None:
+                continue
+            for pending in [pending for pending in sent_at if pending < seq]:
+                del sent_at[pending]
+                dropped += 1
+            if seq in sent_at:
+                latencies.append((time.perf_counter() - sent_at.pop(seq)) * 1000)
+        return latencies, last, dropped
+    finally:
+        ws.close()
+
+
+def run_http(url, jpeg, frames, exercise_type, session_id):
+    """Post frames one at a time to /api/real-time-analysis; returns latencies in ms"""
+    import requests
+
+    latencies = []
+    with requests.Session() as http:
+        for _ in range(frames):
+            start = time.perf_counter()
+            response = http.post(
+                url,
+                files={'frame': ('frame.jpg', jpeg, 'image/jpeg')},
+                data={'exerciseType': exercise_type, 'sessionId': session_id}
+            )
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies, elapsed):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:<10} frames={len(latencies)} fps={len(latencies) / elapsed:7.1f} "
+          f"mean={statistics.mean(latencies):7.2f}ms p50={statistics.median(latencies):7.2f}ms p99={p99:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live streaming reference client')
+    parser.add_argument('--host', default='localhost:8000')
+    parser.add_argument('--image', help='JPEG to stream (default: synthetic 640x480 frame)')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--exercise', default='push-up')
+    parser.add_argument('--session', default=None)
+    parser.add_argument('--format', default='binary', choices=['json', 'binary', 'msgpack'])
+    parser.add_argument('--window', type=int, default=1, help='frames in flight on the socket')
+    parser.add_argument('--compare-http', action='store_true')
+    args = parser.parse_args()
+
+    jpeg = load_jpeg(args.image)
+    url = f"ws://{args.host}/ws/live?exerciseType={args.exercise}&format={args.format}"
+    if args.session:
+        url += f"&sessionId={args.session}"
+
+    start = time.perf_counter()
+    latencies, last, dropped = run_websocket(url, jpeg, args.frames, args.window)
+    report('websocket', latencies, time.perf_counter() - start)
+    if dropped:
+        print(f"coalesced by the server: {dropped} frames")
+    if last:
+        print(f"last result: count={last.get('count')} status={last.get('status')}")
+
+    if args.compare_http:
+        start = time.perf_counter()
+        latencies = run_http(f"http://{args.host}/api/real-time-analysis", jpeg, args.frames,
+                             args.exercise, args.session or 'live-client-http')
+        report('http', latencies, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Persistent WebSocket streaming for live sessions.
+
+One connection is one session: exercise type, session id and result format
+are fixed when the socket opens (query parameters ``exerciseType``,
+``sessionId``, ``format``, ``precision``) and can be changed later with a
+JSON text message such as ``{"exerciseType": "squat"}``.
+
+Each binary message from the client is a frame::
+
+    <I  sequence number (little-endian uint32)
+    <d  capture time in unix milliseconds (0 = unknown)
+    ... JPEG bytes
+
+Results come back on the same socket in order. With ``format=json`` they
+are text messages carrying a ``seq`` field; with ``binary``/``msgpack`` they
+are binary messages of the 4-byte sequence number followed by a
+wire_format frame. A known capture time lets the server drop frames that
+are already older than AI_MAX_FRAME_AGE_MS when they would be analyzed.
+
+A client that sends faster than the server analyzes does not build up a
+backlog: a frame that arrives while the previous one is still waiting
+replaces it (latest frame wins), and the next result's ``coalesced`` field
+counts the frames dropped in its favour. Replaced frames get no reply of
+their own: a result for sequence number N settles every earlier frame. Control messages are never dropped
+and keep their order relative to frames. ``coalesce=0`` analyzes every
+frame instead.
+"""
+
+import collections
+import json
+import struct
+import threading
+import time
+import uuid
+
+import metrics
+import wire_format
+from preprocessing import decode_frame
+
+FRAME_HEADER = struct.Struct('<Id')
+RESULT_HEADER = struct.Struct('<I')
+
+
+class _Inbox:
+    """Messages received but not yet handled; a waiting frame is replaced by a newer one"""
+
+    def __init__(self, coalesce=True):
+        self.coalesce = coalesce
+        # [message, frames it replaced] in arrival order
+        self._messages = collections.deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, message):
+        with self._condition:
+            last = self._messages[-1] if self._messages else None
+            if self.coalesce and last is not None and not isinstance(message, str) and not isinstance(last[0], str):
+                last[0] = message
+                last[1] += 1
+            else:
+                self._messages.append([message, 0])
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def get(self):
+        """(message, coalesced) of the oldest message, or (None, 0) once closed and drained"""
+        with self._condition:
+            while not self._messages and not self._closed:
+                self._condition.wait()
+            if not self._messages:
+                return None, 0
+            message, coalesced = self._messages.popleft()
+            return message, coalesced
+
+
+class LiveSession:
+    """Per-connection state for a live streaming session"""
+
+    def __init__(self, trainer, session_id=None, exercise_type='push-up', fmt='json', precision='f16',
+                 deadline_ms=None, coalesce=True):
+        self.trainer = trainer
+        self.coalesce = coalesce
+        # Per-frame time budget for admission control; None waits for inference however long it takes
+        self.deadline_ms = deadline_ms
+        self.session_id = session_id or f"live_{uuid.uuid4().hex}"
+        self.exercise_type = exercise_type
+        self.fmt = fmt
+        self.precision = precision
+
+    def configure(self, message):
+        """Apply a JSON control message and return the acknowledgement"""
+        try:
+            options = json.loads(message)
+        except ValueError:
+            return json.dumps({'type': 'error', 'error': 'Invalid control message'})
+
+        self.exercise_type = options.get('exerciseType', self.exercise_type)
+        if options.get('format') in ('json', 'binary') or (options.get('format') == 'msgpack' and wire_format.msgpack):
+            self.fmt = options['format']
+        if options.get('precision') in ('f16', 'f32'):
+            self.precision = options['precision']
+
+        return json.dumps({
+            'type': 'config',
+            'sessionId': self.session_id,
+            'exerciseType': self.exercise_type,
+            'format': self.fmt,
+            'precision': self.precision
+        })
+
+    def analyze(self, message, coalesced=0):
+        """Analyze one binary frame message (which replaced `coalesced` unanalyzed ones) and return the reply"""
+        if len(message) <= FRAME_HEADER.size:
+            return json.dumps({'type': 'error', 'error': 'Frame message too short'})
+
+        seq, captured_ms = FRAME_HEADER.unpack_from(message, 0)
+        start = time.perf_counter()
+        deadline = None if self.deadline_ms is None else start + self.deadline_ms / 1000.0
+        with metrics.STAGE_DECODE.time():
+            frame = decode_frame(memoryview(message)[FRAME_HEADER.size:])
+        result = self.trainer.analyze_frame(
+            frame, self.exercise_type, self.session_id, raw_landmarks=self.fmt != 'json', deadline=deadline,
+            captured_at=captured_ms / 1000.0 if captured_ms else None
+        )
+
+        if result is None:
+            return json.dumps({'type': 'error', 'seq': seq, 'error': 'Could not analyze frame'})
+        coalesced += result.get('coalesced', 0)
+
+        if self.fmt == 'json':
+            return json.dumps({
+                'type': 'result',
+                'seq': seq,
+                'exercise_type': self.exercise_type,
+                'count': result['count'],
+                'calories': result['calories'],
+                'status': result['status'],
+                'feedback': result['feedback'],
+                'angles': result['angles'],
+                'landmarks': result['landmarks'],
+                'coalesced': coalesced,
+                'motion_gated': result.get('motion_gated', False),
+                'skip_ratio': result.get('skip_ratio', 0.0),
+                'timestamp': time.time()
+            })
+
+        body, _ = wire_format.encode({
+            'exercise_type': self.exercise_type,
+            'count': result['count'],
+            'calories': result['calories'],
+            'status': result['status'],
+            'feedback': result['feedback'],
+            'angles': result['angles'],
+            'landmarks': result['landmarks'],
+            'coalesced': coalesced,
+            'motion_gated': result.get('motion_gated', False),
+            'skip_ratio': result.get('skip_ratio', 0.0),
+            'timestamp': time.time()
+        }, self.fmt, self.precision)
+        return RESULT_HEADER.pack(seq) + body
+
+    def handle(self, message, coalesced=0):
+        if isinstance(message, str):
+            return self.configure(message)
+        return self.analyze(message, coalesced)
+
+    def _receive(self, ws, inbox):
+        try:
+            while True:
+                message = ws.receive()
+                if message is None:
+                    break
+                inbox.put(message)
+        except Exception:
+            # The connection closed under the receive
+            pass
+        finally:
+            inbox.close()
+
+    def serve(self, ws):
+        """Receive frames and send results until the client disconnects"""
+        ws.send(json.dumps({'type': 'ready', 'sessionId': self.session_id,
+                            'exerciseType': self.exercise_type, 'format': self.fmt}))
+        # Receiving runs on its own thread so frames arriving during analysis can be coalesced
+        inbox = _Inbox(self.coalesce)
+        threading.Thread(target=self._receive, args=(ws, inbox), daemon=True).start()
+        while True:
+            message, coalesced = inbox.get()
+            if message is None:
+                break
+            try:
+                reply = self.handle(message, coalesced)
+            except Exception as e:
+                reply = json.dumps({'type': 'error', 'error': f'Real-time analysis failed: {str(e)}'})
+            ws.send(reply)
@@ -1,25 +1,49 @@
-import cv2
-import numpy as np
 import mediapipe as mp
 import math
 import argparse
+import atexit
 import os
 import sys
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
+try:
+    from flask_sock import Sock
+except ImportError:  # WebSocket streaming is optional
+    Sock = None
 import base64
 import io
-from PIL import Image
+import hashlib
 import json
+import tempfile
 import time
+import uuid
+import threading
 from datetime import datetime
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from body_part_angle import BodyPartAngle
-from types_of_exercise import TypeOfExercise
+import rep_counting
+from inference_pool import InferencePool
+from admission import AdmissionController, Overloaded
+from analysis_store import AnalysisStore
+import metrics
+import plans
+import wire_format
+from live_stream import LiveSession
+from jobs import ANNOTATED_FILE, RESULT_FILE, JobRunner, JobStore
+from landmark_recording import LandmarkRecorder
+from model_lifecycle import ModelHandle
+from pose_pool import PosePool
+from preprocessing import decode_frame, motion_fraction, motion_thumbnail, prepare_input
+from result_cache import ResultCache, content_key, stream_digest
+from session_store import MemorySessionStore, create_session_store
+from unix_transport import UnixTransport, bind_unix_socket
+from video_analysis import AnalysisSummary, FrameProjection, analyze_video, no_person_result, spool_upload
+from segmented_analysis import analyze_video_segments, create_executor, plan_segments, video_info
 from utils import *
+from kinematics import landmarks_to_array, joint_angles, angles_to_dict, calculate_angle
 
 app = Flask(__name__)
 CORS(app)
@@ -29,152 +53,232 @@ mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 mp_drawing_styles = mp.solutions.drawing_styles
 
+# Extra exercise definitions (JSON, see rep_counting.py) on top of the built-in ones
+if os.environ.get('AI_EXERCISE_DEFINITIONS'):
+    rep_counting.load_definitions(os.environ['AI_EXERCISE_DEFINITIONS'])
+
+# Exercises analyze_frame knows how to count; anything else is reported as 'other' in metrics
+EXERCISE_TYPES = tuple(rep_counting.EXERCISES)
+
 class AIFitnessTrainer:
-    def __init__(self, mp_model):
+    def __init__(self, mp_model, session_store=None, recorder=None, smoothing=True, inference_stride=1,
+                 admission=None, max_frame_age=None, analysis_store=None, motion_threshold=0.0,
+                 motion_refresh=30):
         self.pose = mp_model
+        # Bounds concurrent inference and sheds frames that would miss their deadline
+        self.admission = admission if admission is not None else AdmissionController()
+        # Live frames captured longer ago than this many seconds are dropped (None = never)
+        self.max_frame_age = max_frame_age
+        # Optional LandmarkRecorder that keeps every frame's landmarks for later replay
+        self.recorder = recorder
+        # Optional AnalysisStore that keeps per-frame and per-rep records for aggregation
+        self.analysis_store = analysis_store
+        # Return One-Euro smoothed landmarks instead of the raw model output
+        self.smoothing = smoothing
+        # Run inference on one frame in `inference_stride`; extrapolate the others
+        self.inference_stride = inference_stride
+        # Frames differing from the session's last inference frame in less than this fraction of
+        # thumbnail pixels reuse its result (0 = always run inference), at most `motion_refresh` in a row
+        self.motion_threshold = motion_threshold
+        self.motion_refresh = motion_refresh
         self.body_part_angle = BodyPartAngle()
-        # Session storage: sessionId -> { 'exercise': TypeOfExercise, 'last_seen': timestamp }
-        self.sessions = {}
-        self.session_timeout = 600 # 10 minutes
+        # Session storage: sessionId -> SessionState (exercise counters, previous landmarks)
+        self.sessions = session_store if session_store is not None else MemorySessionStore()
+
+    def get_session_data(self, session_id):
+        """Retrieve or create the full state for a session"""
+        return self.sessions.get(session_id)
 
     def get_session(self, session_id):
         """Retrieve or create a session-specific exercise state"""
-        now = time.time()
-        
-        # Cleanup old sessions occasionally
-        if len(self.sessions) > 100:
-            self.cleanup_sessions()
-
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                'exercise': TypeOfExercise(),
-                'last_seen': now
-            }
-        else:
-            self.sessions[session_id]['last_seen'] = now
-            
-        return self.sessions[session_id]['exercise']
+        return self.get_session_data(session_id).exercise
 
-    def cleanup_sessions(self):
-        """Remove sessions that haven't been active for a while"""
-        now = time.time()
-        to_delete = [sid for sid, data in self.sessions.items() 
-                     if now - data['last_seen'] > self.session_timeout]
-        for sid in to_delete:
-            del self.sessions[sid]
-        
     def calculate_angle(self, a, b, c):
         """Calculate angle between three points"""
-        a = np.array([a.x, a.y])
-        b = np.array([b.x, b.y])
-        c = np.array([c.x, c.y])
-        
-        radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-        angle = np.abs(radians * 180.0 / np.pi)
-        
-        if angle > 180.0:
-            angle = 360 - angle
+        return calculate_angle((a.x, a.y), (b.x, b.y), (c.x, c.y))
+    
+    def store_analysis(self, session, session_id, exercise_type, status, count, calories, angle_values=None,
+                       previous_count=None, previous_calories=0.0):
+        """Append a frame, and a rep record if it completed one, to the analysis store"""
+        now = time.time()
+        self.analysis_store.append_frame(session_id, exercise_type, status, count, calories, angle_values, now)
+        if session.rep_started is None:
+            session.rep_started = now
+        if previous_count is not None and count > previous_count:
+            self.analysis_store.append_rep(session_id, exercise_type, count, now - session.rep_started,
+                                           calories - previous_calories, now)
+            session.rep_started = now
+
+    def detect(self, image, session_id):
+        """Run pose inference on an RGB image"""
+        # Builds and warms up the model on the first frame unless it was started ahead of time
+        pose = self.pose.get() if isinstance(self.pose, ModelHandle) else self.pose
+        with metrics.STAGE_INFERENCE.time():
+            # Pooled models are keyed by session so tracking state stays per user
+            if isinstance(pose, (InferencePool, PosePool)):
+                return pose.process(image, key=session_id)
+            return pose.process(image)
+
+    def locate(self, frame, session, session_id, timestamp, deadline=None, captured_at=None):
+        """(points, status, coalesced): the frame's (33, 4) landmarks or None, 'ok'/'interpolated'/'no_person'
+        ('static' when the motion gate reused the previous result), and how many queued frames of the
+        session this one replaced.
+
+        Raises Overloaded if admission control sheds the frame.
+        """
+        # Nothing moved since the last inference: the previous landmarks (or absence of a person) still hold
+        thumbnail = None
+        if self.motion_threshold > 0:
+            thumbnail = motion_thumbnail(frame)
+            if (session.thumbnail is not None and session.static_run < self.motion_refresh
+                    and motion_fraction(thumbnail, session.thumbnail) < self.motion_threshold):
+                session.static_run += 1
+                return session.points, 'static', 0
+
+        # Between inference frames, extrapolate from the filter's last pose and velocity
+        if session.skipped < self.inference_stride - 1:
+            points = session.filter.predict(timestamp)
+            if points is not None:
+                session.skipped += 1
+                return points, 'interpolated', 0
+        session.skipped = 0
+
+        stale_at = None
+        if captured_at is not None and self.max_frame_age is not None:
+            # Client capture time is wall clock; admission works in perf_counter time
+            stale_at = time.perf_counter() + (captured_at + self.max_frame_age - time.time())
+
+        with self.admission.admit(deadline, key=session_id, stale_at=stale_at) as coalesced:
+            # Crop around where the person was last frame (or downscale the full frame) and convert to RGB
+            start = time.perf_counter()
+            image, transform = prepare_input(frame, session.points)
+            metrics.STAGE_PREPROCESS.observe(time.perf_counter() - start)
+            results = self.detect(image, session_id)
             
-        return angle
+            # Tracking lost inside the crop: retry once on the full frame
+            if not results.pose_landmarks and transform.is_crop:
+                start = time.perf_counter()
+                image, transform = prepare_input(frame)
+                metrics.STAGE_PREPROCESS.observe(time.perf_counter() - start)
+                results = self.detect(image, session_id)
+
+        session.thumbnail = thumbnail
+        session.static_run = 0
+        if not results.pose_landmarks:
+            session.filter.reset()
+            return None, 'no_person', coalesced
+
+        points = transform.to_frame(landmarks_to_array(results.pose_landmarks))
+        smoothed = session.filter.update(points, timestamp)
+        return (smoothed if self.smoothing else points), 'ok', coalesced
     
-    def analyze_frame(self, frame, exercise_type, session_id="default"):
-        """Analyze a single frame for exercise detection"""
+    def analyze_frame(self, frame, exercise_type, session_id="default", raw_landmarks=False, timestamp=None,
+                      deadline=None, captured_at=None):
+        """Analyze a single frame for exercise detection
+
+        With raw_landmarks=True the 'landmarks' entry is the (33, 4) array
+        instead of a list of dicts, for the compact wire formats. timestamp
+        is the frame time in seconds (video time for uploads), defaulting to now.
+        deadline (a time.perf_counter() value) lets admission control shed the
+        frame under load; the result then has status 'overloaded' and only
+        the count and calories so far. Frames with a deadline are coalesced per
+        session (latest frame wins; 'coalesced' says how many it replaced) and
+        dropped once older than max_frame_age past captured_at (client wall
+        clock, seconds). Frames that barely differ from the session's last
+        inference frame reuse its landmarks without inference; 'motion_gated'
+        marks them and 'skip_ratio' is the session's share of such frames.
+        """
         if frame is None:
             return None
             
-        exercise_state = self.get_session(session_id)
-            
-        # Convert BGR to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-        
-        # Make detection
-        results = self.pose.process(image)
+        session = self.get_session_data(session_id)
+        exercise_state = session.exercise
+        if timestamp is None:
+            timestamp = time.time()
         
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        exercise_label = exercise_type if exercise_type in EXERCISE_TYPES else 'other'
         
-        # Extract landmarks
-        if not results.pose_landmarks:
+        try:
+            points, frame_status, coalesced = self.locate(frame, session, session_id, timestamp, deadline,
+                                                          captured_at)
+        except Overloaded as e:
+            metrics.FRAMES.labels(exercise_label, 'overloaded').inc()
             return {
                 'count': exercise_state.counter,
-                'status': 'no_person',
-                'feedback': 'No person detected in frame',
+                'status': 'overloaded',
+                'feedback': 'Server busy - frame skipped',
                 'calories': exercise_state.calories,
                 'angles': {},
-                'landmarks': []
+                'landmarks': [],
+                'shed_reason': e.reason,
+                'coalesced': 0
             }
+        
+        session.frames += 1
+        motion_gated = frame_status == 'static'
+        if motion_gated:
+            session.gated += 1
+            metrics.MOTION_GATED.inc()
+        skip_ratio = session.gated / session.frames
+
+        # Extract landmarks
+        if points is None:
+            session.points = None
+            if self.analysis_store is not None:
+                self.store_analysis(session, session_id, exercise_type, 'no_person', exercise_state.counter,
+                                    exercise_state.calories)
+            self.sessions.save(session_id, session)
+            if self.recorder is not None:
+                self.recorder.record(session_id, None, timestamp, exercise_type)
+            metrics.FRAMES.labels(exercise_label, 'no_person').inc()
+            return dict(no_person_result(exercise_state.counter, exercise_state.calories),
+                        coalesced=coalesced, motion_gated=motion_gated, skip_ratio=skip_ratio)
 
         try:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Get coordinates
-            left_shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-            left_elbow = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x, landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-            left_wrist = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x, landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-            
-            right_shoulder = [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-            right_elbow = [landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].y]
-            right_wrist = [landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].y]
-            
-            left_hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-            left_knee = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-            left_ankle = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x, landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-            
-            right_hip = [landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].y]
-            right_knee = [landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].y]
-            right_ankle = [landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].y]
-            
-            # Calculate angles
-            left_arm_angle = self.body_part_angle.angle_of_the_left_arm(left_shoulder, left_elbow, left_wrist)
-            right_arm_angle = self.body_part_angle.angle_of_the_right_arm(right_shoulder, right_elbow, right_wrist)
-            left_leg_angle = self.body_part_angle.angle_of_the_left_leg(left_hip, left_knee, left_ankle)
-            right_leg_angle = self.body_part_angle.angle_of_the_right_leg(right_hip, right_knee, right_ankle)
-            left_shoulder_angle = self.body_part_angle.angle_of_the_abdomen(left_shoulder, left_hip, left_knee)
-            right_shoulder_angle = self.body_part_angle.angle_of_the_abdomen(right_shoulder, right_hip, right_knee)
+            # One (33, 4) array of x, y, z, visibility; all joint angles in one batched call
+            start = time.perf_counter()
+            session.points = points
+            angle_values = joint_angles(points)
+            angles = angles_to_dict(angle_values)
+            metrics.STAGE_KINEMATICS.observe(time.perf_counter() - start)
             
             # Exercise detection based on type
-            if exercise_type == "push-up":
-                count, status, feedback, calories = exercise_state.push_up(left_arm_angle, right_arm_angle, left_shoulder_angle, right_shoulder_angle)
-            elif exercise_type == "pull-up":
-                count, status, feedback, calories = exercise_state.pull_up(left_arm_angle, right_arm_angle, left_shoulder_angle, right_shoulder_angle)
-            elif exercise_type == "sit-up":
-                count, status, feedback, calories = exercise_state.sit_up(left_shoulder_angle, right_shoulder_angle)
-            elif exercise_type == "squat":
-                count, status, feedback, calories = exercise_state.squat(left_leg_angle, right_leg_angle)
-            elif exercise_type == "walk":
-                count, status, feedback, calories = exercise_state.walk(left_leg_angle, right_leg_angle)
-            else:
-                count, status, feedback, calories = 0, "unknown", "Exercise type not supported", 0.0
+            start = time.perf_counter()
+            previous_count, previous_calories = exercise_state.counter, exercise_state.calories
+            count, status, feedback, calories = exercise_state.update(exercise_type, angles)
+            metrics.STAGE_COUNTING.observe(time.perf_counter() - start)
+            
+            if self.analysis_store is not None:
+                self.store_analysis(session, session_id, exercise_type, status, count, calories, angle_values,
+                                    previous_count, previous_calories)
+            self.sessions.save(session_id, session)
+            if self.recorder is not None:
+                self.recorder.record(session_id, points, timestamp, exercise_type)
+            metrics.FRAMES.labels(exercise_label, frame_status).inc()
             
             # Extract all 33 raw landmarks for client-side drawing
-            raw_landmarks = []
-            for lm in landmarks:
-                raw_landmarks.append({
-                    'x': lm.x,
-                    'y': lm.y,
-                    'z': lm.z,
-                    'visibility': lm.visibility
-                })
+            if raw_landmarks:
+                landmarks = points
+            else:
+                landmarks = [
+                    {'x': x, 'y': y, 'z': z, 'visibility': visibility}
+                    for x, y, z, visibility in points.tolist()
+                ]
 
             return {
                 'count': count,
                 'status': status,
                 'feedback': feedback,
                 'calories': calories,
-                'angles': {
-                    'left_arm': left_arm_angle,
-                    'right_arm': right_arm_angle,
-                    'left_leg': left_leg_angle,
-                    'right_leg': right_leg_angle,
-                    'left_shoulder': left_shoulder_angle,
-                    'right_shoulder': right_shoulder_angle
-                },
-                'landmarks': raw_landmarks
+                'angles': angles,
+                'landmarks': landmarks,
+                'coalesced': coalesced,
+                'motion_gated': motion_gated,
+                'skip_ratio': skip_ratio
             }
             
         except Exception as e:
+            metrics.FRAMES.labels(exercise_label, 'error').inc()
             return {
                 'count': 0,
                 'status': 'error',
@@ -184,16 +288,218 @@ class AIFitnessTrainer:
                 'landmarks': []
             }
 
-# Shared MediaPipe model to save memory - Complexity 0 is "Lite" (fastest)
-pose_model = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=0,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
+# MediaPipe model settings - Complexity 0 is "Lite" (fastest)
+POSE_OPTIONS = {
+    'static_image_mode': False,
+    'model_complexity': 0,
+    'min_detection_confidence': 0.5,
+    'min_tracking_confidence': 0.5
+}
+
+# Number of inference worker processes; 0 keeps the models in process
+INFERENCE_WORKERS = int(os.environ.get('AI_INFERENCE_WORKERS', '0'))
+# In-process Pose instances, each tracking one of the most recently active sessions
+POSE_INSTANCES = max(1, int(os.environ.get('AI_POSE_INSTANCES', '4')))
+# How long a session's instance must sit unused before another session can take it over
+POSE_MIN_IDLE_MS = float(os.environ.get('AI_POSE_MIN_IDLE_MS', '1000'))
+
+# 'eager' builds and warms up the model when the worker starts (see start_worker), 'lazy' on the first frame
+MODEL_LOAD = os.environ.get('AI_MODEL_LOAD', 'eager')
+
+def create_pose_model():
+    if INFERENCE_WORKERS > 0:
+        # Each worker process owns its own Pose instance
+        return InferencePool(workers=INFERENCE_WORKERS, pose_kwargs=POSE_OPTIONS)
+    return PosePool(lambda: mp_pose.Pose(**POSE_OPTIONS), POSE_INSTANCES, min_idle=POSE_MIN_IDLE_MS / 1000.0)
+
+# Nothing is built at import, so a pre-forking server can import the app before forking
+pose_model = ModelHandle(create_pose_model)
+
+# Worker processes for segment-parallel analysis of long uploads; 0 analyzes them in the request thread
+VIDEO_WORKERS = int(os.environ.get('AI_VIDEO_WORKERS', '0'))
+# Length of each segment; shorter videos are analyzed sequentially
+SEGMENT_SECONDS = float(os.environ.get('AI_SEGMENT_SECONDS', '20'))
+# Frames decoded before each segment to warm up tracking, then discarded
+SEGMENT_OVERLAP_FRAMES = int(os.environ.get('AI_SEGMENT_OVERLAP_FRAMES', '15'))
+
+video_executor = None
+video_executor_lock = threading.Lock()
+
+def get_video_executor():
+    """Start the segment worker processes on first use"""
+    global video_executor
+    with video_executor_lock:
+        if video_executor is None:
+            video_executor = create_executor(VIDEO_WORKERS, POSE_OPTIONS)
+        return video_executor
+
+# Background video jobs (see jobs.py): one directory shared by every server process
+JOBS_DIR = os.environ.get('AI_JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'gymbuddy_jobs')
+# Job worker processes per server process; 0 disables /api/jobs
+JOB_WORKERS = int(os.environ.get('AI_JOB_WORKERS', '1'))
+# Jobs allowed to wait in the queue before new submissions are refused
+MAX_QUEUED_JOBS = int(os.environ.get('AI_MAX_QUEUED_JOBS', '100'))
+# Finished jobs and their files are deleted after this many hours
+JOB_RETENTION_HOURS = float(os.environ.get('AI_JOB_RETENTION_HOURS', '24'))
+
+job_store = JobStore(JOBS_DIR)
+job_runner = None
+job_runner_lock = threading.Lock()
+
+def get_job_runner():
+    """Start dispatching background jobs on first use"""
+    global job_runner
+    with job_runner_lock:
+        if job_runner is None:
+            job_runner = JobRunner(job_store, JOB_WORKERS, POSE_OPTIONS, retention=JOB_RETENTION_HOURS * 3600)
+            job_runner.start()
+        return job_runner
+
+# Session store: 'memory' (per process) or 'sqlite:<path>' (shared between worker processes)
+session_store = create_session_store(
+    os.environ.get('AI_SESSION_STORE', 'memory'),
+    timeout=int(os.environ.get('AI_SESSION_TIMEOUT', '600')),
+    max_sessions=int(os.environ.get('AI_MAX_SESSIONS', '1000')),
+    max_bytes=int(os.environ['AI_SESSION_MAX_BYTES']) if os.environ.get('AI_SESSION_MAX_BYTES') else None
+)
+
+# Directory to record per-session landmarks into for inference-free replay (unset = off)
+RECORDINGS_DIR = os.environ.get('AI_RECORDINGS_DIR')
+# Directory of the columnar per-frame/per-rep analysis store behind /api/analytics (unset = off)
+ANALYSIS_STORE_DIR = os.environ.get('AI_ANALYSIS_STORE')
+analysis_store = AnalysisStore(ANALYSIS_STORE_DIR) if ANALYSIS_STORE_DIR else None
+if analysis_store is not None:
+    atexit.register(analysis_store.close)
+
+# Admission control: frames allowed to run inference at once (default: one per model) and to wait for it
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('AI_MAX_CONCURRENT_INFERENCE', str(INFERENCE_WORKERS or POSE_INSTANCES))),
+    max_queue=int(os.environ.get('AI_MAX_INFERENCE_QUEUE', '8'))
 )
+# Time budget for a live frame, from arrival to the start of inference (X-Deadline-Ms overrides it)
+REQUEST_DEADLINE_MS = float(os.environ.get('AI_REQUEST_DEADLINE_MS', '1000'))
+# 'degrade' answers shed frames with the count/status only; 'reject' answers 503
+SHED_MODE = os.environ.get('AI_SHED_MODE', 'degrade')
+# Live frames captured longer ago than this are dropped unanalyzed (unset = no limit)
+MAX_FRAME_AGE_MS = os.environ.get('AI_MAX_FRAME_AGE_MS')
+# Motion gate: frames with less than this fraction of thumbnail pixels changed since the session's last
+# inference reuse its result (0 = off), for at most AI_MOTION_REFRESH_FRAMES frames in a row. Opt-in: limb
+# movement barely registers on the thumbnail, so gated frames can hide reps (benchmarks/bench_motion_gate.py)
+MOTION_THRESHOLD = float(os.environ.get('AI_MOTION_THRESHOLD', '0'))
+MOTION_REFRESH_FRAMES = int(os.environ.get('AI_MOTION_REFRESH_FRAMES', '30'))
 
 # Initialize the AI trainer
-ai_trainer = AIFitnessTrainer(pose_model)
+ai_trainer = AIFitnessTrainer(
+    pose_model,
+    session_store,
+    recorder=LandmarkRecorder(RECORDINGS_DIR) if RECORDINGS_DIR else None,
+    analysis_store=analysis_store,
+    smoothing=os.environ.get('AI_LANDMARK_SMOOTHING', '1') != '0',
+    inference_stride=max(1, int(os.environ.get('AI_INFERENCE_STRIDE', '1'))),
+    admission=admission,
+    max_frame_age=float(MAX_FRAME_AGE_MS) / 1000.0 if MAX_FRAME_AGE_MS else None,
+    motion_threshold=MOTION_THRESHOLD,
+    motion_refresh=MOTION_REFRESH_FRAMES
+)
+
+# Bump when analysis output changes in a way the settings below don't capture
+ANALYZER_VERSION = 1
+
+# Segment workers run inference on every frame, so uploads stay sequential when the inference stride or
+# the motion gate would skip frames
+SEGMENTED_VIDEO = VIDEO_WORKERS > 0 and ai_trainer.inference_stride == 1 and MOTION_THRESHOLD == 0
+
+def analyzer_key():
+    """Everything besides the media and exercise that an upload's result depends on"""
+    definitions = None
+    if os.environ.get('AI_EXERCISE_DEFINITIONS'):
+        with open(os.environ['AI_EXERCISE_DEFINITIONS'], 'rb') as f:
+            definitions = hashlib.sha256(f.read()).hexdigest()
+    return json.dumps([
+        ANALYZER_VERSION, POSE_OPTIONS, definitions, ai_trainer.smoothing, ai_trainer.inference_stride,
+        MOTION_THRESHOLD, MOTION_REFRESH_FRAMES, SEGMENTED_VIDEO and [SEGMENT_SECONDS, SEGMENT_OVERLAP_FRAMES]
+    ], sort_keys=True)
+
+ANALYZER_KEY = analyzer_key()
+
+# Upload results keyed by media content (see result_cache.py): memory tier MB (0 = off), spill directory
+# (unset = memory only) and its MB
+RESULT_CACHE_MB = float(os.environ.get('AI_RESULT_CACHE_MB', '64'))
+result_cache = ResultCache(
+    int(RESULT_CACHE_MB * (1 << 20)),
+    directory=os.environ.get('AI_RESULT_CACHE_DIR') or None,
+    disk_max_bytes=int(float(os.environ.get('AI_RESULT_CACHE_DISK_MB', '1024')) * (1 << 20))
+) if RESULT_CACHE_MB > 0 else None
+
+metrics.ACTIVE_SESSIONS.set_function(lambda: len(session_store))
+metrics.SESSION_EVICTIONS.set_function(lambda: session_store.evictions)
+metrics.SESSION_EXPIRATIONS.set_function(lambda: session_store.expirations)
+metrics.INFERENCE_QUEUE_DEPTH.set_function(lambda: admission.waiting)
+metrics.INFERENCE_ACTIVE.set_function(lambda: admission.active)
+if result_cache is not None:
+    metrics.RESULT_CACHE_BYTES.set_function(lambda: result_cache.bytes)
+    metrics.RESULT_CACHE_DISK_BYTES.set_function(lambda: result_cache.disk_bytes)
+metrics.MODEL_READY.set_function(lambda: int(pose_model.ready))
+metrics.MODEL_LOAD_SECONDS.set_function(lambda: pose_model.load_seconds or 0.0)
+
+def pose_pool_stat(read):
+    """read(pool) for the in-process PosePool once loaded, else 0"""
+    pose = pose_model.get() if pose_model.ready else None
+    return read(pose) if isinstance(pose, PosePool) else 0
+
+metrics.POSE_BOUND_SESSIONS.set_function(lambda: pose_pool_stat(len))
+metrics.POSE_REBINDS.set_function(lambda: pose_pool_stat(lambda pool: pool.rebinds))
+metrics.POSE_SHARED_FRAMES.set_function(lambda: pose_pool_stat(lambda pool: pool.shared_frames))
+
+# Path of a Unix socket for same-host clients, served alongside HTTP (see unix_transport.py; unset = off)
+UNIX_SOCKET = os.environ.get('AI_UNIX_SOCKET')
+unix_listener = None
+
+def listen_unix():
+    """Bind the Unix socket once; forked workers share the listener bound before the fork"""
+    global unix_listener
+    if UNIX_SOCKET and unix_listener is None:
+        unix_listener = bind_unix_socket(UNIX_SOCKET)
+    return unix_listener
+
+def start_worker():
+    """Per-worker startup: begin building and warming up the model unless it loads lazily"""
+    if MODEL_LOAD != 'lazy':
+        pose_model.start()
+    if JOB_WORKERS > 0:
+        # Resume jobs queued before a restart
+        get_job_runner()
+    if listen_unix() is not None:
+        UnixTransport(ai_trainer, unix_listener, deadline_ms=REQUEST_DEADLINE_MS).start()
+
+def request_deadline():
+    """perf_counter() deadline for the current live request"""
+    budget_ms = request.headers.get('X-Deadline-Ms', type=float) or REQUEST_DEADLINE_MS
+    return g.request_start + budget_ms / 1000.0
+
+def capture_time():
+    """Client capture time of the current live frame in unix seconds, or None"""
+    captured_ms = request.form.get('captureTimestamp', type=float) or \
+        request.headers.get('X-Capture-Timestamp', type=float)
+    return captured_ms / 1000.0 if captured_ms else None
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    metrics.IN_FLIGHT.dec()
+    metrics.REQUEST_SECONDS.labels(request.endpoint or 'unknown').observe(time.perf_counter() - start)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Operational metrics in Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -204,80 +510,131 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 once the pose model is warmed up (or loads lazily), 503 until then"""
+    ready = pose_model.ready or (MODEL_LOAD == 'lazy' and pose_model.state != 'failed')
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'model': pose_model.status(),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
 @app.route('/api/analyze-form', methods=['POST'])
 def analyze_form():
-    """Analyze exercise form from uploaded media"""
+    """Analyze exercise form from uploaded media
+
+    Per-frame output is controlled by the ``frames`` form/query parameter:
+    ``all`` (default) returns ``frame_analysis`` in the JSON body, ``none``
+    returns only the summary, and ``ndjson`` (or ``Accept: application/x-ndjson``)
+    streams one JSON line per frame followed by a summary line.
+
+    ``fields`` (a comma-separated subset of summary, counts, angles,
+    landmarks) projects the response, ``stride`` keeps every Nth frame of the
+    per-frame output, and ``landmarks=used`` returns only the landmarks the
+    angle calculations read; see FrameProjection.
+    """
     try:
         if 'media' not in request.files:
             return jsonify({'error': 'No media file provided'}), 400
             
         file = request.files['media']
         exercise_type = request.form.get('exerciseName', 'push-up')
-        session_id = request.form.get('sessionId', f"upload_{int(time.time())}")
+        session_id = request.form.get('sessionId', f"upload_{uuid.uuid4().hex}")
+        frames_mode = request.values.get('frames', 'all')
+        if request.accept_mimetypes.best == 'application/x-ndjson':
+            frames_mode = 'ndjson'
+        try:
+            stride = int(request.values.get('stride', '1'))
+        except ValueError:
+            return jsonify({'error': 'stride must be an integer'}), 400
+        try:
+            projection = FrameProjection(request.values.get('fields'), stride, request.values.get('landmarks', 'all'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if frames_mode == 'all' and not projection.frames:
+            frames_mode = 'none'
         
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
-            
-        # Read the video/image file
-        file_bytes = file.read()
         
-        # Convert to numpy array
-        nparr = np.frombuffer(file_bytes, np.uint8)
+        # A fresh upload's result depends only on its content, so a repeat is answered from the cache
+        # before anything is decoded; a client-supplied sessionId carries state and bypasses it
+        cache_key = None
+        if result_cache is not None and 'sessionId' not in request.form:
+            # Summary-only requests share the entry of the default projection
+            with_frames = frames_mode != 'none' and projection.frames
+            cache_key = content_key(stream_digest(file.stream), exercise_type, ANALYZER_KEY,
+                                    (projection if with_frames else FrameProjection()).key())
+            cached = cached_analysis(cache_key, with_frames)
+            if cached is not None:
+                return analysis_response(exercise_type, frames_mode, projection, *cached, cache_status='hit')
+        
+        summary = AnalysisSummary()
         
         if file.content_type.startswith('video/'):
-            # Handle video file
-            temp_path = f'temp_{int(time.time())}.mp4'
-            with open(temp_path, 'wb') as f:
-                f.write(file_bytes)
-            
-            cap = cv2.VideoCapture(temp_path)
-            results = []
-            
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                result = ai_trainer.analyze_frame(frame, exercise_type, session_id)
-                if result:
-                    results.append(result)
+            # Spool the upload to a unique temp file in chunks and decode frames on the fly
+            suffix = os.path.splitext(file.filename)[1] or '.mp4'
+            temp_path = spool_upload(file.stream, suffix=suffix)
             
-            cap.release()
-            os.remove(temp_path)
+            if frames_mode == 'ndjson':
+                response = Response(
+                    stream_with_context(stream_video_analysis(temp_path, exercise_type, session_id, summary,
+                                                              projection, cache_key)),
+                    mimetype='application/x-ndjson',
+                    headers={'X-Cache': 'miss'} if cache_key is not None else None
+                )
+                # Runs once the response is closed, even if the client left before the stream started
+                response.call_on_close(lambda: os.remove(temp_path))
+                return response
             
-            # Calculate summary
-            total_count = max([r['count'] for r in results]) if results else 0
-            total_calories = max([r['calories'] for r in results]) if results else 0.0
-            final_status = results[-1]['status'] if results else 'unknown'
-            feedback = results[-1]['feedback'] if results else 'No analysis available'
+            try:
+                frame_results = video_results(temp_path, exercise_type, session_id, summary)
+                if frames_mode == 'none':
+                    for _ in frame_results:
+                        pass
+                    results = None
+                else:
+                    results = projection.results(frame_results)
+            finally:
+                os.remove(temp_path)
             
         else:
             # Handle image file
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            image = decode_frame(file.read())
             result = ai_trainer.analyze_frame(image, exercise_type, session_id)
             
             if result:
-                results = [result]
-                total_count = result['count']
-                total_calories = result['calories']
-                final_status = result['status']
-                feedback = result['feedback']
+                summary.update(result)
+                results = [projection.frame(result)] if projection.frames else []
             else:
+                summary.status = 'error'
+                summary.feedback = 'Could not analyze image'
                 results = []
-                total_count = 0
-                final_status = 'error'
-                feedback = 'Could not analyze image'
+            
+            # Cached results are answered below, in any mode
+            if frames_mode == 'ndjson' and (cache_key is None or not summary.frames):
+                lines = [json.dumps(dict(r, type='frame', index=i)) + '\n' for i, r in enumerate(results)]
+                lines.append(json.dumps(summary_line(exercise_type, summary, projection)) + '\n')
+                return Response(lines, mimetype='application/x-ndjson')
+            if frames_mode == 'none':
+                results = None
         
-        return jsonify({
+        if cache_key is not None and summary.frames:
+            # Serialize the frames once, for the cache entry and the response alike
+            frames_json = None if results is None or not projection.frames else app.json.dumps(results)
+            cache_analysis(cache_key, summary.to_dict(), frames_json)
+            return analysis_response(exercise_type, frames_mode, projection, summary.to_dict(), frames_json, 'miss')
+        
+        response = {
             'success': True,
             'exercise_type': exercise_type,
-            'total_count': total_count,
-            'total_calories': total_calories,
-            'status': final_status,
-            'feedback': feedback,
-            'frame_analysis': results,
+            **(summary.to_dict() if projection.summary else {}),
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        if results is not None:
+            response['frame_analysis'] = results
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({
@@ -285,6 +642,226 @@ def analyze_form():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def cached_analysis(key, with_frames):
+    """(summary dict, per-frame results JSON or None) cached for an upload, or None if it must be analyzed"""
+    entry, tier = result_cache.lookup(key)
+    summary_json, frames_json = entry.decode('utf-8').split('\n', 1) if entry is not None else (None, '')
+    # An entry cached from a frames=none request can't answer one that wants the frames
+    if entry is None or (with_frames and not frames_json):
+        metrics.RESULT_CACHE_LOOKUPS.labels('miss').inc()
+        return None
+    metrics.RESULT_CACHE_LOOKUPS.labels(tier).inc()
+    return json.loads(summary_json), frames_json or None
+
+def cache_analysis(key, summary, frames_json=None):
+    """Cache an upload's summary dict and, if kept, its (projected) per-frame results JSON"""
+    result_cache.put(key, (json.dumps(summary) + '\n' + (frames_json or '')).encode('utf-8'))
+
+def analysis_response(exercise_type, frames_mode, projection, summary, frames_json, cache_status):
+    """/api/analyze-form response from a summary dict and already serialized, projected per-frame results"""
+    head = {
+        'success': True,
+        'exercise_type': exercise_type,
+        **(summary if projection.summary else {}),
+        'timestamp': datetime.now().isoformat()
+    }
+    if frames_mode == 'ndjson':
+        lines = [json.dumps(dict(r, type='frame', index=i * projection.stride)) + '\n'
+                 for i, r in enumerate(json.loads(frames_json or '[]'))]
+        lines.append(json.dumps({'type': 'summary', **head}) + '\n')
+        response = Response(lines, mimetype='application/x-ndjson')
+    else:
+        body = app.json.dumps(head)
+        if frames_mode != 'none' and frames_json is not None:
+            body = body[:-1] + ', "frame_analysis": ' + frames_json + '}'
+        response = Response(body, mimetype='application/json')
+    response.headers['X-Cache'] = cache_status
+    return response
+
+def summary_line(exercise_type, summary, projection=None):
+    """Final NDJSON line of a streamed analysis"""
+    return {
+        'type': 'summary',
+        'success': True,
+        'exercise_type': exercise_type,
+        **(summary.to_dict() if projection is None or projection.summary else {}),
+        'timestamp': datetime.now().isoformat()
+    }
+
+def video_results(temp_path, exercise_type, session_id, summary):
+    """Per-frame results of an uploaded video, split across segment workers when it is long enough"""
+    if SEGMENTED_VIDEO:
+        frame_count, fps = video_info(temp_path)
+        segments = plan_segments(frame_count, fps, SEGMENT_SECONDS)
+        if len(segments) > 1:
+            return analyze_video_segments(ai_trainer, get_video_executor(), temp_path, exercise_type,
+                                          session_id, summary, segments, SEGMENT_OVERLAP_FRAMES)
+    return analyze_video(ai_trainer, temp_path, exercise_type, session_id, summary)
+
+def stream_video_analysis(temp_path, exercise_type, session_id, summary, projection, cache_key=None):
+    """Yield NDJSON lines for each analyzed frame projection keeps, then the summary.
+
+    The caller removes temp_path once the response is closed. With a cache_key the projected results
+    are also kept and cached once the stream completes.
+    """
+    results = [] if cache_key is not None else None
+    try:
+        for index, result in enumerate(video_results(temp_path, exercise_type, session_id, summary)):
+            if not projection.frames or index % projection.stride:
+                continue
+            frame = projection.frame(result)
+            if results is not None:
+                results.append(frame)
+            yield json.dumps(dict(frame, type='frame', index=index)) + '\n'
+        if results is not None and summary.frames:
+            cache_analysis(cache_key, summary.to_dict(), app.json.dumps(results) if projection.frames else None)
+        yield json.dumps(summary_line(exercise_type, summary, projection)) + '\n'
+    except Exception as e:
+        yield json.dumps({
+            'type': 'error',
+            'error': f'Analysis failed: {str(e)}',
+            'timestamp': datetime.now().isoformat()
+        }) + '\n'
+
+def analytics_filters():
+    """Store query filters from the query string: session, exercise, start/end (ISO dates or unix seconds)"""
+    filters = {'session': request.args.get('session'), 'exercise': request.args.get('exercise')}
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value:
+            try:
+                filters[name] = float(value)
+            except ValueError:
+                filters[name] = datetime.fromisoformat(value).timestamp()
+    return filters
+
+@app.route('/api/analytics/summary', methods=['GET'])
+def analytics_summary():
+    """Completed reps per exercise and calories per day from the analysis store"""
+    if analysis_store is None:
+        return jsonify({'error': 'Analysis store is not enabled'}), 404
+    try:
+        filters = analytics_filters()
+        # Make this process's buffered rows visible to the scan
+        analysis_store.flush()
+        return jsonify({
+            'reps_per_exercise': analysis_store.reps_per_exercise(**filters),
+            'calories_per_day': analysis_store.calories_per_day(
+                utc_offset=request.args.get('utcOffset', 0, type=int), **filters),
+            'timestamp': datetime.now().isoformat()
+        })
+    except ValueError as e:
+        return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
+
+@app.route('/api/analytics/angles', methods=['GET'])
+def analytics_angles():
+    """Histogram of one joint angle over the stored frames"""
+    if analysis_store is None:
+        return jsonify({'error': 'Analysis store is not enabled'}), 404
+    try:
+        filters = analytics_filters()
+        analysis_store.flush()
+        counts, edges = analysis_store.angle_distribution(
+            request.args.get('angle', 'left_arm'),
+            bins=min(max(request.args.get('bins', 36, type=int), 1), 360),
+            **filters
+        )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {str(e)}'}), 400
+    return jsonify({
+        'angle': request.args.get('angle', 'left_arm'),
+        'counts': counts.tolist(),
+        'bin_edges': edges.tolist(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+def job_status(job):
+    """Client view of a job record"""
+    job_id = job['id']
+    done = job['state'] == 'done'
+    total = job['frames_total']
+    return {
+        'job_id': job_id,
+        'state': job['state'],
+        'exercise_type': job['exercise_type'],
+        'annotate': job['annotate'],
+        'frames_done': job['frames_done'],
+        'frames_total': total,
+        'progress': 1.0 if done else (min(1.0, job['frames_done'] / total) if total else 0.0),
+        'error': job['error'],
+        'created_at': datetime.fromtimestamp(job['created_at']).isoformat(),
+        'finished_at': datetime.fromtimestamp(job['finished_at']).isoformat() if job['finished_at'] else None,
+        'result_url': f'/api/jobs/{job_id}/result' if done else None,
+        'video_url': f'/api/jobs/{job_id}/video' if done and job['annotate'] else None
+    }
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an uploaded video for background analysis and, with annotate=1, an annotated MP4"""
+    if JOB_WORKERS <= 0:
+        return jsonify({'error': 'Background jobs are disabled'}), 503
+    if 'media' not in request.files:
+        return jsonify({'error': 'No media file provided'}), 400
+
+    file = request.files['media']
+    if file.filename == '' or not file.content_type.startswith('video/'):
+        return jsonify({'error': 'Background jobs take a video upload'}), 400
+
+    runner = get_job_runner()
+    if runner.pending() >= MAX_QUEUED_JOBS:
+        response = jsonify({'error': 'Job queue is full', 'timestamp': datetime.now().isoformat()})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    # Spooled straight into the jobs directory so queuing it is a rename
+    suffix = os.path.splitext(file.filename)[1] or '.mp4'
+    temp_path = spool_upload(file.stream, suffix=suffix, directory=JOBS_DIR)
+    try:
+        job = job_store.create(
+            temp_path, suffix,
+            exercise_type=request.form.get('exerciseName', 'push-up'),
+            annotate=request.form.get('annotate', '0') in ('1', 'true'),
+            smoothing=ai_trainer.smoothing
+        )
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return jsonify({'error': f'Could not queue job: {str(e)}'}), 500
+    runner.notify()
+
+    response = jsonify({'success': True, **job_status(job)})
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """State and progress of a background job"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
+
+def finished_job_file(job_id, name, mimetype):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['state'] != 'done':
+        return jsonify({'error': 'Job is not finished', 'state': job['state']}), 409
+    path = job_store.path(job_id, name)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Job has no such output'}), 404
+    return send_file(path, mimetype=mimetype)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Analysis JSON of a finished job (same body as /api/analyze-form)"""
+    return finished_job_file(job_id, RESULT_FILE, 'application/json')
+
+@app.route('/api/jobs/<job_id>/video', methods=['GET'])
+def get_job_video(job_id):
+    """Annotated MP4 of a finished job submitted with annotate=1"""
+    return finished_job_file(job_id, ANNOTATED_FILE, 'video/mp4')
+
 @app.route('/api/real-time-analysis', methods=['POST'])
 def real_time_analysis():
     """Real-time exercise analysis for live workouts"""
@@ -297,25 +874,57 @@ def real_time_analysis():
         session_id = request.form.get('sessionId', 'default')
         
         # Read the frame
-        file_bytes = file.read()
-        nparr = np.frombuffer(file_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        start = time.perf_counter()
+        # Large JPEGs are decoded directly at a reduced scale
+        frame = decode_frame(file.read())
+        metrics.STAGE_DECODE.observe(time.perf_counter() - start)
         
         # Analyze the frame
-        result = ai_trainer.analyze_frame(frame, exercise_type, session_id)
+        wire, precision = wire_format.negotiate(request)
+        result = ai_trainer.analyze_frame(frame, exercise_type, session_id, raw_landmarks=wire != 'json',
+                                          deadline=request_deadline(), captured_at=capture_time())
         
-        if result:
-            return jsonify({
-                'success': True,
-                'exercise_type': exercise_type,
-                'count': result['count'],
-                'calories': result['calories'],
-                'status': result['status'],
-                'feedback': result['feedback'],
-                'angles': result['angles'],
-                'landmarks': result['landmarks'],
+        if result and result['status'] == 'overloaded' and SHED_MODE == 'reject':
+            response = jsonify({
+                'error': 'Server busy',
+                'reason': result['shed_reason'],
                 'timestamp': datetime.now().isoformat()
             })
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        elif result and wire != 'json':
+            with metrics.STAGE_SERIALIZATION.time():
+                body, mimetype = wire_format.encode({
+                    'exercise_type': exercise_type,
+                    'count': result['count'],
+                    'calories': result['calories'],
+                    'status': result['status'],
+                    'feedback': result['feedback'],
+                    'angles': result['angles'],
+                    'landmarks': result['landmarks'],
+                    'coalesced': result.get('coalesced', 0),
+                    'motion_gated': result.get('motion_gated', False),
+                    'skip_ratio': result.get('skip_ratio', 0.0),
+                    'timestamp': time.time()
+                }, wire, precision)
+            return Response(body, mimetype=mimetype)
+        elif result:
+            with metrics.STAGE_SERIALIZATION.time():
+                response = jsonify({
+                    'success': True,
+                    'exercise_type': exercise_type,
+                    'count': result['count'],
+                    'calories': result['calories'],
+                    'status': result['status'],
+                    'feedback': result['feedback'],
+                    'angles': result['angles'],
+                    'landmarks': result['landmarks'],
+                    'coalesced': result.get('coalesced', 0),
+                    'motion_gated': result.get('motion_gated', False),
+                    'skip_ratio': result.get('skip_ratio', 0.0),
+                    'timestamp': datetime.now().isoformat()
+                })
+            return response
         else:
             return jsonify({
                 'error': 'Could not analyze frame',
@@ -328,6 +937,71 @@ def real_time_analysis():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/ws/live')
+    def live_stream(ws):
+        """Persistent streaming endpoint for live workouts (see live_stream.py)"""
+        wire, precision = wire_format.negotiate(request)
+        session = LiveSession(
+            ai_trainer,
+            session_id=request.args.get('sessionId'),
+            exercise_type=request.args.get('exerciseType', 'push-up'),
+            fmt=wire,
+            precision=precision,
+            deadline_ms=request.args.get('deadlineMs', REQUEST_DEADLINE_MS, type=float),
+            coalesce=request.args.get('coalesce', '1') != '0'
+        )
+        session.serve(ws)
+
+# Largest number of users accepted by one batch plan request
+MAX_BATCH_USERS = int(os.environ.get('AI_MAX_BATCH_USERS', '10000'))
+# Users per streamed chunk of a batch response
+BATCH_CHUNK_USERS = 1000
+
+def plans_etag(*inputs):
+    """ETag for a plan response, derived from the inputs it was computed from"""
+    key = json.dumps([plans.PLANS_VERSION, *inputs], sort_keys=True, default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def conditional_response(etag, build):
+    """304 when the client already holds the response for these inputs, otherwise build() it"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag, weak=True)
+    return response
+
+def batch_users():
+    """Users of a batch request body ({"users": [...]}), or an error response"""
+    data = request.get_json(silent=True)
+    users = data.get('users') if isinstance(data, dict) else None
+    if not isinstance(users, list) or not all(isinstance(user, dict) for user in users):
+        return None, (jsonify({'error': 'Expected a JSON body {"users": [...]}'}), 400)
+    if len(users) > MAX_BATCH_USERS:
+        return None, (jsonify({'error': f'At most {MAX_BATCH_USERS} users per batch'}), 413)
+    return users, None
+
+def stream_batch(endpoint, build_lines):
+    """Stream the NDJSON result lines build_lines() returns in chunks, with an ETag over the raw request body.
+
+    The ETag is checked first, so a 304 computes no plans.
+    """
+    etag = plans_etag(endpoint, hashlib.sha1(request.get_data()).hexdigest())
+
+    def build():
+        lines = build_lines()
+
+        def generate():
+            for start in range(0, len(lines), BATCH_CHUNK_USERS):
+                yield ''.join(json.dumps(line) + '\n' for line in lines[start:start + BATCH_CHUNK_USERS])
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    return conditional_response(etag, build)
+
 @app.route('/api/exercise-suggestions', methods=['GET'])
 def exercise_suggestions():
     """Get AI-powered exercise suggestions"""
@@ -336,43 +1010,13 @@ def exercise_suggestions():
         goals = request.args.get('goals', '').split(',')
         recent_exercises = request.args.get('recentExercises', '').split(',')
         
-        # Simple exercise suggestions based on fitness level and goals
-        suggestions = {
-            'beginner': {
-                'strength': ['push-up', 'sit-up', 'squat'],
-                'cardio': ['walk'],
-                'flexibility': ['stretching']
-            },
-            'intermediate': {
-                'strength': ['push-up', 'pull-up', 'squat'],
-                'cardio': ['walk', 'jogging'],
-                'flexibility': ['stretching', 'yoga']
-            },
-            'advanced': {
-                'strength': ['push-up', 'pull-up', 'squat', 'burpees'],
-                'cardio': ['walk', 'jogging', 'running'],
-                'flexibility': ['stretching', 'yoga', 'pilates']
-            }
-        }
-        
-        level_suggestions = suggestions.get(fitness_level, suggestions['beginner'])
-        
-        # Filter based on goals
-        recommended_exercises = []
-        for goal in goals:
-            if goal in level_suggestions:
-                recommended_exercises.extend(level_suggestions[goal])
-        
-        # Remove duplicates
-        recommended_exercises = list(set(recommended_exercises))
-        
-        return jsonify({
+        return conditional_response(plans_etag('exercise-suggestions', fitness_level, goals), lambda: jsonify({
             'success': True,
             'fitness_level': fitness_level,
             'goals': goals,
-            'recommended_exercises': recommended_exercises,
+            'recommended_exercises': plans.exercise_suggestions(fitness_level, goals),
             'timestamp': datetime.now().isoformat()
-        })
+        }))
         
     except Exception as e:
         return jsonify({
@@ -380,6 +1024,31 @@ def exercise_suggestions():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/exercise-suggestions/batch', methods=['POST'])
+def exercise_suggestions_batch():
+    """Exercise suggestions for many users, streamed as NDJSON"""
+    users, error = batch_users()
+    if error:
+        return error
+
+    def lines():
+        lines = []
+        for index, user in enumerate(users):
+            fitness_level = user.get('fitnessLevel', 'beginner')
+            goals = user.get('goals', [])
+            try:
+                lines.append({
+                    'index': index,
+                    'id': user.get('id'),
+                    'success': True,
+                    'recommended_exercises': plans.exercise_suggestions(fitness_level, goals)
+                })
+            except Exception as e:
+                lines.append({'index': index, 'id': user.get('id'), 'success': False, 'error': str(e)})
+        return lines
+
+    return stream_batch('exercise-suggestions', lines)
+
 @app.route('/api/workout-plan', methods=['POST'])
 def generate_workout_plan():
     """Generate personalized workout plan"""
@@ -390,42 +1059,14 @@ def generate_workout_plan():
         available_time = data.get('availableTime', 30)
         equipment = data.get('equipment', [])
         
-        # Generate workout plan based on parameters
-        workout_plan = {
-            'warm_up': {
-                'duration': 5,
-                'exercises': ['light stretching', 'walking in place']
-            },
-            'main_workout': {
-                'duration': available_time - 10,
-                'exercises': []
-            },
-            'cool_down': {
-                'duration': 5,
-                'exercises': ['stretching', 'deep breathing']
-            }
-        }
-        
-        # Add exercises based on fitness level and goals
-        if 'strength' in goals:
-            if fitness_level == 'beginner':
-                workout_plan['main_workout']['exercises'].extend(['push-up', 'sit-up', 'squat'])
-            elif fitness_level == 'intermediate':
-                workout_plan['main_workout']['exercises'].extend(['push-up', 'pull-up', 'squat'])
-            else:
-                workout_plan['main_workout']['exercises'].extend(['push-up', 'pull-up', 'squat', 'burpees'])
-        
-        if 'cardio' in goals:
-            workout_plan['main_workout']['exercises'].extend(['walk', 'jogging'])
-        
-        return jsonify({
+        return conditional_response(plans_etag('workout-plan', fitness_level, goals, available_time), lambda: jsonify({
             'success': True,
-            'workout_plan': workout_plan,
+            'workout_plan': plans.workout_plan(fitness_level, goals, available_time),
             'fitness_level': fitness_level,
             'goals': goals,
             'available_time': available_time,
             'timestamp': datetime.now().isoformat()
-        })
+        }))
         
     except Exception as e:
         return jsonify({
@@ -433,77 +1074,47 @@ def generate_workout_plan():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/workout-plan/batch', methods=['POST'])
+def generate_workout_plan_batch():
+    """Workout plans for many users, streamed as NDJSON"""
+    users, error = batch_users()
+    if error:
+        return error
+
+    def lines():
+        lines = []
+        for index, user in enumerate(users):
+            try:
+                workout_plan = plans.workout_plan(
+                    user.get('fitnessLevel', 'beginner'), user.get('goals', []), user.get('availableTime', 30)
+                )
+                lines.append({'index': index, 'id': user.get('id'), 'success': True, 'workout_plan': workout_plan})
+            except Exception as e:
+                lines.append({'index': index, 'id': user.get('id'), 'success': False, 'error': str(e)})
+        return lines
+
+    return stream_batch('workout-plan', lines)
+
 @app.route('/api/nutrition-plan', methods=['POST'])
 def generate_nutrition_plan():
     """Generate personalized nutrition plan based on biometrics"""
     try:
         data = request.get_json()
-        weight = data.get('weight') # kg
-        height = data.get('height') # cm
-        age = data.get('age')
-        gender = data.get('gender')
-        activity_level = data.get('activity_level', 'moderate')
-        goals = data.get('goals', [])
+        (nutrition_plan,) = plans.nutrition_plans([data])
         
-        if not all([weight, height, age, gender]):
+        if nutrition_plan is None:
              return jsonify({
                 'success': False,
                 'message': 'Missing biometric data',
                 'nutrition_plan': None
             })
-
-        # Calculate BMR (Mifflin-St Jeor Equation)
-        if gender == 'male':
-            bmr = 10 * weight + 6.25 * height - 5 * age + 5
-        else:
-            bmr = 10 * weight + 6.25 * height - 5 * age - 161
-            
-        # Activity Multipliers
-        multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'active': 1.725,
-            'very_active': 1.9
-        }
-        
-        tdee = bmr * multipliers.get(activity_level, 1.55)
-        
-        # Adjust for goals
-        target_calories = tdee
-        if 'weight_loss' in goals:
-            target_calories -= 500
-        elif 'muscle_gain' in goals:
-            target_calories += 300
-            
-        # Macro split (simplified)
-        macros = {
-            'protein': int(target_calories * 0.3 / 4), # 30% protein
-            'carbs': int(target_calories * 0.4 / 4),   # 40% carbs
-            'fats': int(target_calories * 0.3 / 9)     # 30% fats
-        }
-        
-        nutrition_plan = {
-            'daily_calories': int(target_calories),
-            'bmr': int(bmr),
-            'tdee': int(tdee),
-            'macros': macros,
-            'hydration_target': round(weight * 0.033, 1), # ~33ml per kg
-            'suggestions': []
-        }
-        
-        if 'weight_loss' in goals:
-             nutrition_plan['suggestions'].append("Focus on high-fiber foods and lean proteins.")
-             nutrition_plan['suggestions'].append("Drink water before meals to manage appetite.")
-        if 'muscle_gain' in goals:
-             nutrition_plan['suggestions'].append("Ensure protein intake with every meal.")
-             nutrition_plan['suggestions'].append("Consume complex carbs pre-workout for energy.")
              
-        return jsonify({
+        etag = plans_etag('nutrition-plan', {key: data.get(key) for key in plans.NUTRITION_INPUTS})
+        return conditional_response(etag, lambda: jsonify({
             'success': True,
             'nutrition_plan': nutrition_plan,
             'timestamp': datetime.now().isoformat()
-        })
+        }))
         
     except Exception as e:
         return jsonify({
@@ -511,5 +1122,48 @@ def generate_nutrition_plan():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/nutrition-plan/batch', methods=['POST'])
+def generate_nutrition_plan_batch():
+    """Nutrition plans for many users, computed together and streamed as NDJSON"""
+    users, error = batch_users()
+    if error:
+        return error
+
+    def lines():
+        return [
+            {'index': index, 'id': user.get('id'), 'success': True, 'nutrition_plan': nutrition_plan}
+            if nutrition_plan is not None else
+            {'index': index, 'id': user.get('id'), 'success': False, 'message': 'Missing biometric data',
+             'nutrition_plan': None}
+            for index, (user, nutrition_plan) in enumerate(zip(users, plans.nutrition_plans(users)))
+        ]
+
+    try:
+        return stream_batch('nutrition-plan', lines)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid biometric data: {str(e)}'}), 400
+
+def serve_production(host='0.0.0.0', port=8000):
+    """Serve with waitress (threaded WSGI), falling back to the threaded dev server without debug"""
+    threads = int(os.environ.get('AI_SERVER_THREADS', '16'))
+    try:
+        from waitress import serve
+    except ImportError:
+        print('waitress is not installed; using the threaded Flask server without debug')
+        app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+        return
+    # waitress has no WebSocket upgrade support, so /ws/live needs the dev server
+    serve(app, host=host, port=port, threads=threads, connection_limit=threads * 8)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True) 
\ No newline at end of file
+    # The debug server (reloader, interactive tracebacks) only runs when asked for
+    if os.environ.get('AI_SERVER', 'production') != 'dev' and '--dev' not in sys.argv[1:]:
+        start_worker()
+        serve_production()
+    else:
+        # The reloader would fork a second copy of the inference pool, so keep it off when pooled
+        use_reloader = INFERENCE_WORKERS == 0
+        # With the reloader on, only its serving child (not the file watcher) needs the model
+        if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_worker()
+        app.run(host='0.0.0.0', port=8000, debug=True, threaded=True, use_reloader=use_reloader)
@@ -0,0 +1,304 @@
+"""
+Low-overhead metrics exposed in the Prometheus text format.
+
+Hot-path updates never take a lock: every thread writes into its own
+preallocated shard (a plain list), and a scrape sums the shards. Shards of
+threads that have exited are folded into a retired total whenever a new
+thread takes a shard and at scrape time, so thread-per-request servers keep
+one shard per live thread even when nothing scrapes.
+"""
+
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond angle math to slow inference
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _ShardedValues:
+    """Fixed-size vector of floats, written lock-free through per-thread shards"""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._shards = []  # (weakref to thread, values)
+        self._retired = [0.0] * size
+        self._lock = threading.Lock()
+
+    def shard(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = [0.0] * self.size
+            self._local.values = values
+            with self._lock:
+                self._retire_dead()
+                self._shards.append((weakref.ref(threading.current_thread()), values))
+        return values
+
+    def _retire_dead(self):
+        """Fold the shards of exited threads into the retired total; call with the lock held"""
+        live = []
+        for ref, values in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, values))
+            else:
+                for i, value in enumerate(values):
+                    self._retired[i] += value
+        self._shards = live
+
+    def totals(self):
+        with self._lock:
+            self._retire_dead()
+            totals = list(self._retired)
+            for _, values in self._shards:
+                for i, value in enumerate(values):
+                    totals[i] += value
+        return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('_values',)
+
+    def __init__(self):
+        self._values = _ShardedValues(1)
+
+    def inc(self, amount=1):
+        self._values.shard()[0] += amount
+
+    def value(self):
+        return self._values.totals()[0]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value())}']
+
+
+class Gauge(_Metric):
+    """Gauge that is either incremented/decremented or read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, function=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._function = function
+
+    def set_function(self, function):
+        self._function = function
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().inc(-amount)
+
+    def render(self):
+        if self._function is not None:
+            return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}',
+                    f'{self.name} {_format_value(self._function())}']
+        return super().render()
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value())}']
+
+
+class CounterFunction(Gauge):
+    """Counter whose value is read from a callback, e.g. an eviction count kept elsewhere"""
+    kind = 'counter'
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_values')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        # One slot per bucket, one for +Inf, then the sum
+        self._values = _ShardedValues(len(bounds) + 2)
+
+    def observe(self, value):
+        shard = self._values.shard()
+        shard[bisect.bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        totals = self._values.totals()
+        return totals[:-1], totals[-1]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, values, child):
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+            lines.append(f'{self.name}_bucket{labels} {_format_value(cumulative)}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {_format_value(cumulative)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Metrics shared by the analysis pipeline and the request handlers
+STAGE_SECONDS = Histogram(
+    'gymbuddy_stage_seconds', 'Time spent per analysis stage', ['stage'])
+REQUEST_SECONDS = Histogram(
+    'gymbuddy_request_seconds', 'Request latency per endpoint', ['endpoint'])
+FRAMES = Counter(
+    'gymbuddy_frames_total', 'Analyzed frames by exercise and status', ['exercise', 'status'])
+IN_FLIGHT = Gauge(
+    'gymbuddy_requests_in_flight', 'Requests currently being handled')
+ACTIVE_SESSIONS = Gauge(
+    'gymbuddy_active_sessions', 'Sessions currently held by the session store')
+SESSION_EVICTIONS = CounterFunction(
+    'gymbuddy_session_evictions_total', 'Sessions evicted by the session store caps')
+SESSION_EXPIRATIONS = CounterFunction(
+    'gymbuddy_session_expirations_total', 'Sessions expired after inactivity')
+INFERENCE_QUEUE_DEPTH = Gauge(
+    'gymbuddy_inference_queue_depth', 'Frames waiting for an inference slot')
+INFERENCE_ACTIVE = Gauge(
+    'gymbuddy_inference_active', 'Frames currently holding an inference slot')
+SHED = Counter(
+    'gymbuddy_shed_frames_total', 'Frames rejected by admission control', ['reason'])
+MOTION_GATED = Counter(
+    'gymbuddy_motion_gated_frames_total', 'Frames answered from the previous result because nothing moved')
+RESULT_CACHE_LOOKUPS = Counter(
+    'gymbuddy_result_cache_lookups_total', 'Upload result cache lookups by outcome (memory, disk, miss)',
+    ['result'])
+RESULT_CACHE_BYTES = Gauge(
+    'gymbuddy_result_cache_bytes', 'Bytes of upload results held in the memory tier of the result cache')
+RESULT_CACHE_DISK_BYTES = Gauge(
+    'gymbuddy_result_cache_disk_bytes', 'Bytes of upload results spilled to the result cache directory')
+MODEL_READY = Gauge(
+    'gymbuddy_model_ready', 'Whether the pose model is built and warmed up')
+MODEL_LOAD_SECONDS = Gauge(
+    'gymbuddy_model_load_seconds', 'Time taken to build and warm up the pose model')
+POSE_BOUND_SESSIONS = Gauge(
+    'gymbuddy_pose_bound_sessions', 'Sessions bound to an in-process Pose instance')
+POSE_REBINDS = CounterFunction(
+    'gymbuddy_pose_rebinds_total', 'Pose instances reset and handed over to another session')
+POSE_SHARED_FRAMES = CounterFunction(
+    'gymbuddy_pose_shared_frames_total', 'Frames run on the shared Pose instance because no instance was idle')
+
+# Children resolved once so the hot path is a single list update
+STAGE_DECODE = STAGE_SECONDS.labels('decode')
+STAGE_QUEUE = STAGE_SECONDS.labels('queue')
+STAGE_PREPROCESS = STAGE_SECONDS.labels('preprocess')
+STAGE_INFERENCE = STAGE_SECONDS.labels('inference')
+STAGE_KINEMATICS = STAGE_SECONDS.labels('kinematics')
+STAGE_COUNTING = STAGE_SECONDS.labels('counting')
+STAGE_SERIALIZATION = STAGE_SECONDS.labels('serialization')
+
+
+def render():
+    """All registered metrics in Prometheus text format"""
+    return REGISTRY.render()
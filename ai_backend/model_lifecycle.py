@@ -0,0 +1,184 @@
+"""
+Pose model lifecycle: build on demand or at worker start, warm up, report readiness.
+
+Building a MediaPipe Pose graph and running its first inferences (graph
+initialization, TFLite interpreter allocation, detector and landmark model
+first passes) takes far longer than a steady-state frame. ModelHandle builds
+the model once, either on the first frame or ahead of time with start(), and
+runs a few inferences on a built-in synthetic frame before marking itself
+ready, so no client frame pays that cost and a readiness probe can tell when
+the worker is worth routing to.
+
+For pre-forking servers, preload_assets() fetches and reads the model files
+in the master process so every forked worker finds them local and in the
+page cache. The Pose graph itself is never built before the fork: it owns
+threads and native state that do not survive fork(), so each worker builds
+its own from start().
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from preprocessing import prepare_input
+
+# Inferences run on the synthetic frame before a model counts as ready
+WARMUP_FRAMES = 3
+
+# Landmark model file per MediaPipe model_complexity
+POSE_LANDMARK_MODELS = {
+    0: 'pose_landmark_lite.tflite',
+    1: 'pose_landmark_full.tflite',
+    2: 'pose_landmark_heavy.tflite',
+}
+
+# (start, end) joints of the synthetic figure, in units of a tenth of the frame height
+_FIGURE_LIMBS = (
+    ((0, 3), (0, 6)),                                      # torso
+    ((0, 3), (-1.5, 4.5)), ((-1.5, 4.5), (-2, 6)),         # left arm
+    ((0, 3), (1.5, 4.5)), ((1.5, 4.5), (2, 6)),            # right arm
+    ((0, 6), (-0.8, 7.8)), ((-0.8, 7.8), (-1, 9.5)),       # left leg
+    ((0, 6), (0.8, 7.8)), ((0.8, 7.8), (1, 9.5)),          # right leg
+)
+
+
+def synthetic_frame(height=480, width=640):
+    """BGR frame of a standing stick figure on a gradient, used for warmup inferences"""
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = np.linspace(60, 200, width).astype(np.uint8)[None, :, None]
+    unit = height / 10
+    center = width / 2
+
+    def point(x, y):
+        return int(center + x * unit), int(y * unit)
+
+    thickness = max(2, int(unit / 3))
+    for start, end in _FIGURE_LIMBS:
+        cv2.line(frame, point(*start), point(*end), (40, 40, 40), thickness)
+    cv2.circle(frame, point(0, 2), int(unit * 0.7), (40, 40, 40), -1)
+    return frame
+
+
+def warm_up(pose, frames=WARMUP_FRAMES):
+    """Run inferences on the synthetic frame, prepared exactly like a live frame"""
+    frame = synthetic_frame()
+    # Off the scratch buffers: a lazy load runs inside a frame's analysis, between its prepare_input and inference
+    image, _ = prepare_input(frame, scratch=False)
+    for _ in range(frames):
+        pose.process(image)
+    # End on an empty frame so no tracking state carries over into the first real frame
+    frame[:] = 128
+    image, _ = prepare_input(frame, scratch=False)
+    pose.process(image)
+
+
+def preload_assets(model_complexity=0):
+    """Fetch the pose model files if needed and read them into the page cache; returns bytes read"""
+    import mediapipe as mp
+
+    # Full and heavy landmark models are downloaded on first use; do it once, before any fork
+    download = getattr(mp.solutions.pose, '_download_oss_pose_landmark_model', None)
+    if download is not None:
+        download(model_complexity)
+
+    modules = os.path.join(os.path.dirname(mp.__file__), 'modules')
+    paths = (
+        os.path.join(modules, 'pose_detection', 'pose_detection.tflite'),
+        os.path.join(modules, 'pose_landmark', POSE_LANDMARK_MODELS[model_complexity]),
+    )
+    loaded = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    loaded += len(chunk)
+        except OSError:
+            continue
+    return loaded
+
+
+class ModelHandle:
+    """A pose model built and warmed up once, on first use or when start() is called.
+
+    `factory` returns the model: a MediaPipe Pose, or a PosePool or
+    InferencePool whose instances warm themselves up (the handle then waits
+    for them instead).
+    """
+
+    def __init__(self, factory, warmup_frames=WARMUP_FRAMES, ready_timeout=120):
+        self.factory = factory
+        self.warmup_frames = warmup_frames
+        self.ready_timeout = ready_timeout
+        # cold -> loading -> ready, or failed (retried on the next get())
+        self.state = 'cold'
+        self.error = None
+        self.load_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def get(self):
+        """The warmed-up model, building it first if needed"""
+        if not self._ready.is_set():
+            with self._lock:
+                if not self._ready.is_set():
+                    self._load()
+        return self._model
+
+    def _load(self):
+        self.state = 'loading'
+        start = time.perf_counter()
+        model = None
+        try:
+            model = self.factory()
+            if hasattr(model, 'wait_ready'):
+                if not model.wait_ready(self.ready_timeout):
+                    raise RuntimeError('Inference workers did not become ready')
+            else:
+                warm_up(model, self.warmup_frames)
+        except Exception as e:
+            if model is not None and hasattr(model, 'close'):
+                model.close()
+            self.state = 'failed'
+            self.error = str(e)
+            raise
+
+        self._model = model
+        self.load_seconds = time.perf_counter() - start
+        self.state = 'ready'
+        self.error = None
+        self._ready.set()
+
+    def start(self, background=True):
+        """Build and warm up the model now, on a background thread unless `background` is False"""
+        if not background:
+            self.get()
+            return
+        threading.Thread(target=self._start, name='model-load', daemon=True).start()
+
+    def _start(self):
+        try:
+            self.get()
+        except Exception as e:
+            print(f'Pose model failed to load: {e}')
+
+    def wait_ready(self, timeout=None):
+        """Block until the model is ready; False on timeout"""
+        return self._ready.wait(timeout)
+
+    def status(self):
+        return {'state': self.state, 'load_seconds': self.load_seconds, 'error': self.error}
+
+    def close(self):
+        if self._model is not None and hasattr(self._model, 'close'):
+            self._model.close()
@@ -0,0 +1,169 @@
+import functools
+
+import numpy as np
+
+# Bump when any table or formula below changes, so clients' cached ETags stop matching
+PLANS_VERSION = 1
+
+SUGGESTIONS = {
+    'beginner': {
+        'strength': ('push-up', 'sit-up', 'squat'),
+        'cardio': ('walk',),
+        'flexibility': ('stretching',)
+    },
+    'intermediate': {
+        'strength': ('push-up', 'pull-up', 'squat'),
+        'cardio': ('walk', 'jogging'),
+        'flexibility': ('stretching', 'yoga')
+    },
+    'advanced': {
+        'strength': ('push-up', 'pull-up', 'squat', 'burpees'),
+        'cardio': ('walk', 'jogging', 'running'),
+        'flexibility': ('stretching', 'yoga', 'pilates')
+    }
+}
+
+STRENGTH_WORKOUTS = {
+    'beginner': ('push-up', 'sit-up', 'squat'),
+    'intermediate': ('push-up', 'pull-up', 'squat'),
+}
+ADVANCED_STRENGTH_WORKOUT = ('push-up', 'pull-up', 'squat', 'burpees')
+CARDIO_WORKOUT = ('walk', 'jogging')
+
+# Request fields a nutrition plan depends on
+NUTRITION_INPUTS = ('weight', 'height', 'age', 'gender', 'activity_level', 'goals')
+
+ACTIVITY_LEVELS = ('sedentary', 'light', 'moderate', 'active', 'very_active')
+ACTIVITY_MULTIPLIERS = np.array([1.2, 1.375, 1.55, 1.725, 1.9])
+DEFAULT_ACTIVITY = ACTIVITY_LEVELS.index('moderate')
+_ACTIVITY_INDEX = {level: i for i, level in enumerate(ACTIVITY_LEVELS)}
+
+# Mifflin-St Jeor constant term
+MALE_BMR_OFFSET = 5
+FEMALE_BMR_OFFSET = -161
+
+WEIGHT_LOSS_ADJUSTMENT = -500
+MUSCLE_GAIN_ADJUSTMENT = 300
+
+# Share of calories and calories per gram for each macro
+MACRO_SPLIT = (('protein', 0.3, 4), ('carbs', 0.4, 4), ('fats', 0.3, 9))
+
+# ~33 ml of water per kg of body weight
+HYDRATION_LITERS_PER_KG = 0.033
+
+NUTRITION_SUGGESTIONS = {
+    'weight_loss': ("Focus on high-fiber foods and lean proteins.",
+                    "Drink water before meals to manage appetite."),
+    'muscle_gain': ("Ensure protein intake with every meal.",
+                    "Consume complex carbs pre-workout for energy."),
+}
+
+# Suggestions indexed by weight_loss + 2 * muscle_gain
+_GOAL_SUGGESTIONS = (
+    (),
+    NUTRITION_SUGGESTIONS['weight_loss'],
+    NUTRITION_SUGGESTIONS['muscle_gain'],
+    NUTRITION_SUGGESTIONS['weight_loss'] + NUTRITION_SUGGESTIONS['muscle_gain'],
+)
+
+
+def goals_key(goals):
+    """Goals as a hashable tuple; a single string is one goal"""
+    return (goals,) if isinstance(goals, str) else tuple(goals)
+
+
+# The cached functions return tuples: callers get fresh lists and dicts built from them, never a shared object
+
+@functools.lru_cache(maxsize=1024)
+def _exercise_suggestions(fitness_level, goals):
+    level_suggestions = SUGGESTIONS.get(fitness_level, SUGGESTIONS['beginner'])
+    recommended = []
+    for goal in goals:
+        recommended.extend(level_suggestions.get(goal, ()))
+    # Drop duplicates, keeping first-seen order
+    return tuple(dict.fromkeys(recommended))
+
+
+def exercise_suggestions(fitness_level, goals):
+    """Recommended exercises for a fitness level and a list of goals"""
+    return list(_exercise_suggestions(fitness_level, goals_key(goals)))
+
+
+@functools.lru_cache(maxsize=1024)
+def _workout_exercises(fitness_level, goals):
+    exercises = ()
+    if 'strength' in goals:
+        exercises += STRENGTH_WORKOUTS.get(fitness_level, ADVANCED_STRENGTH_WORKOUT)
+    if 'cardio' in goals:
+        exercises += CARDIO_WORKOUT
+    return exercises
+
+
+def workout_plan(fitness_level, goals, available_time):
+    """Workout plan for a fitness level, a list of goals and the available minutes"""
+    exercises = list(_workout_exercises(fitness_level, goals_key(goals)))
+
+    return {
+        'warm_up': {
+            'duration': 5,
+            'exercises': ['light stretching', 'walking in place']
+        },
+        'main_workout': {
+            'duration': available_time - 10,
+            'exercises': exercises
+        },
+        'cool_down': {
+            'duration': 5,
+            'exercises': ['stretching', 'deep breathing']
+        }
+    }
+
+
+def nutrition_plans(users):
+    """Nutrition plans for a list of biometrics dicts, computed for all users at once.
+
+    Each dict has weight (kg), height (cm), age, gender and optionally
+    activity_level and goals. Users with missing biometrics get None.
+    """
+    count = len(users)
+    valid = [bool(user.get('weight') and user.get('height') and user.get('age') and user.get('gender'))
+             for user in users]
+    rows = [user if ok else {} for user, ok in zip(users, valid)]
+    goals = [user.get('goals') or () for user in rows]
+
+    weight = np.array([user.get('weight', 0) for user in rows], dtype=np.float64).reshape(count)
+    height = np.array([user.get('height', 0) for user in rows], dtype=np.float64).reshape(count)
+    age = np.array([user.get('age', 0) for user in rows], dtype=np.float64).reshape(count)
+    male = np.array([user.get('gender') == 'male' for user in rows], dtype=bool).reshape(count)
+    activity = np.array([_ACTIVITY_INDEX.get(user.get('activity_level', 'moderate'), DEFAULT_ACTIVITY)
+                         for user in rows], dtype=np.intp).reshape(count)
+    weight_loss = np.array(['weight_loss' in user_goals for user_goals in goals], dtype=bool).reshape(count)
+    muscle_gain = np.array(['muscle_gain' in user_goals for user_goals in goals], dtype=bool).reshape(count)
+
+    # Mifflin-St Jeor BMR, activity multiplier, goal adjustment, then macros from the split table
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(male, MALE_BMR_OFFSET, FEMALE_BMR_OFFSET)
+    tdee = bmr * ACTIVITY_MULTIPLIERS[activity]
+    target = tdee + np.where(weight_loss, WEIGHT_LOSS_ADJUSTMENT, np.where(muscle_gain, MUSCLE_GAIN_ADJUSTMENT, 0))
+
+    daily_calories = np.trunc(target).astype(np.int64).tolist()
+    bmr_values = np.trunc(bmr).astype(np.int64).tolist()
+    tdee_values = np.trunc(tdee).astype(np.int64).tolist()
+    macro_names = [name for name, _, _ in MACRO_SPLIT]
+    macro_grams = np.stack([target * share / calories_per_gram for _, share, calories_per_gram in MACRO_SPLIT],
+                           axis=1)
+    macros = np.trunc(macro_grams).astype(np.int64).tolist()
+    # Python's round() so half-way cases match the single-user endpoint exactly
+    hydration = [round(value, 1) for value in (weight * HYDRATION_LITERS_PER_KG).tolist()]
+    suggestions = [_GOAL_SUGGESTIONS[key] for key in (weight_loss + 2 * muscle_gain.astype(np.intp)).tolist()]
+
+    return [
+        {
+            'daily_calories': daily_calories[i],
+            'bmr': bmr_values[i],
+            'tdee': tdee_values[i],
+            'macros': dict(zip(macro_names, macros[i])),
+            'hydration_target': hydration[i],
+            'suggestions': list(suggestions[i])
+        } if valid[i] else None
+        for i in range(count)
+    ]
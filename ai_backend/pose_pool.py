@@ -0,0 +1,134 @@
+"""
+In-process pool of tracking Pose instances, each bound to one session at a time.
+
+With static_image_mode=False a MediaPipe Pose tracks: the landmarks of one
+frame give the region of interest for the next, and the person detector only
+runs again once the track is lost. A single instance fed interleaved frames
+from several sessions loses the track on nearly every frame and falls back to
+full detection, blends one user's landmarks into another's through its
+smoothing filter, and is called from several request threads at once.
+
+PosePool keeps each recently active session on its own instance and lets one
+thread use an instance at a time, so frames of a session are processed in
+order and concurrent sessions run in parallel. When a new session needs an
+instance and all are bound, the least recently used one that has been idle
+for at least min_idle seconds is reset with a blank frame and handed over.
+If none has been idle that long, the frame runs on one extra shared instance
+instead, without a reset, so sessions that are still active keep their
+tracks. Frames on the shared instance track poorly, so the pool size should
+cover the number of sessions expected to be active at once; rebinds and
+shared_frames show when it does not.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from model_lifecycle import WARMUP_FRAMES, warm_up
+
+
+class _Slot:
+    __slots__ = ('pose', 'busy', 'last_used')
+
+    def __init__(self, pose):
+        self.pose = pose
+        self.busy = False
+        self.last_used = 0.0
+
+
+class PosePool:
+    """Fixed set of warmed-up Pose instances handed out per session, least recently used rebound first"""
+
+    def __init__(self, factory, size=4, warmup_frames=WARMUP_FRAMES, min_idle=1.0):
+        self.size = max(1, size)
+        # Seconds an instance must go unused before it can be rebound to another session
+        self.min_idle = min_idle
+        self._slots = []
+        self._shared = None
+        try:
+            # The last instance is the shared one for sessions that found nothing to rebind
+            for _ in range(self.size + 1):
+                pose = factory()
+                self._slots.append(_Slot(pose))
+                warm_up(pose, warmup_frames)
+        except Exception:
+            self.close()
+            raise
+        self._shared = self._slots.pop()
+        # Warmup ends on a blank frame, so unbound instances hold no tracking state
+        self._free = list(self._slots)
+        # key -> slot, least recently used first
+        self._bound = OrderedDict()
+        self._condition = threading.Condition()
+        # Gray RGB frame that clears an instance's track and landmark filter
+        self._blank = np.full((64, 64, 3), 128, dtype=np.uint8)
+        self.rebinds = 0
+        self.shared_frames = 0
+
+    def __len__(self):
+        """Sessions currently bound to an instance"""
+        return len(self._bound)
+
+    @property
+    def busy(self):
+        return sum(slot.busy for slot in self._slots) + self._shared.busy
+
+    def _take(self, key):
+        """Bind an idle instance to `key`; (slot, reset needed), or the shared instance if none can be rebound"""
+        if self._free:
+            slot = self._free.pop()
+            self._bound[key] = slot
+            return slot, False
+        idle_since = time.monotonic() - self.min_idle
+        for bound_key, slot in self._bound.items():
+            if not slot.busy and slot.last_used <= idle_since:
+                del self._bound[bound_key]
+                self._bound[key] = slot
+                self.rebinds += 1
+                return slot, True
+        return self._shared, False
+
+    def _acquire(self, key):
+        with self._condition:
+            while True:
+                slot = self._bound.get(key)
+                if slot is not None:
+                    self._bound.move_to_end(key)
+                    reset = False
+                else:
+                    slot, reset = self._take(key)
+                # Wait for the session's own instance, or for the shared one if nothing could be rebound
+                if not slot.busy:
+                    slot.busy = True
+                    if slot is self._shared:
+                        self.shared_frames += 1
+                    return slot, reset
+                self._condition.wait()
+
+    def _release(self, slot):
+        with self._condition:
+            slot.busy = False
+            slot.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    def process(self, image, key=None):
+        """Run inference on an RGB frame with the instance bound to session `key`"""
+        slot, reset = self._acquire(key)
+        try:
+            if reset:
+                slot.pose.process(self._blank)
+            return slot.pose.process(image)
+        finally:
+            self._release(slot)
+
+    def wait_ready(self, timeout=None):
+        """Instances are warmed up in the constructor"""
+        return True
+
+    def close(self):
+        for slot in self._slots:
+            slot.pose.close()
+        if self._shared is not None:
+            self._shared.pose.close()
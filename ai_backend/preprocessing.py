@@ -0,0 +1,185 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Longest side of the model input when cropping around a tracked person
+ROI_INPUT_SIZE = 256
+# Longest side the full frame is downscaled to when there is nothing to track
+FULL_FRAME_MAX_SIDE = 640
+# Padding added around the landmark bounding box, as a fraction of its size
+ROI_PADDING = 0.35
+# Landmarks below this visibility don't shape the crop
+MIN_VISIBILITY = 0.5
+# Crops smaller than this (in source pixels) mean tracking is unreliable
+MIN_ROI_SIDE = 48
+# (width, height) of the grayscale thumbnail frames are compared on for motion gating
+MOTION_THUMBNAIL_SIZE = (32, 24)
+# Thumbnail pixels changing by at least this many gray levels count as moved
+MOTION_PIXEL_DELTA = 12
+
+# JPEG start-of-frame markers (baseline, extended, progressive, lossless, arithmetic variants)
+_JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+# libjpeg can scale by 1/2, 1/4 and 1/8 while decoding, skipping most of the IDCT work
+_REDUCED_DECODE = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                   (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# Per-thread scratch memory for the resized and RGB model inputs
+_scratch = threading.local()
+
+
+class FrameTransform:
+    """Maps landmarks from model-input coordinates back to the full frame"""
+    __slots__ = ('x0', 'y0', 'width', 'height', 'frame_width', 'frame_height')
+
+    def __init__(self, x0, y0, width, height, frame_width, frame_height):
+        self.x0 = x0
+        self.y0 = y0
+        self.width = width
+        self.height = height
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+
+    @property
+    def is_crop(self):
+        return self.width != self.frame_width or self.height != self.frame_height
+
+    def to_frame(self, points):
+        """Convert (33, 4) landmarks normalized to the input into full-frame normalized coordinates"""
+        if not self.is_crop:
+            return points
+        mapped = np.array(points, dtype=np.float64)
+        mapped[:, 0] = (mapped[:, 0] * self.width + self.x0) / self.frame_width
+        mapped[:, 1] = (mapped[:, 1] * self.height + self.y0) / self.frame_height
+        # MediaPipe scales z like x
+        mapped[:, 2] *= self.width / self.frame_width
+        return mapped
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's frame header, or None if data is not a JPEG"""
+    if data[:2] != b'\xff\xd8':
+        return None
+    offset = 2
+    end = len(data) - 9
+    while offset < end:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = (data[offset + 5] << 8) | data[offset + 6]
+            width = (data[offset + 7] << 8) | data[offset + 8]
+            return width, height
+        offset += 2 + ((data[offset + 2] << 8) | data[offset + 3])
+    return None
+
+
+def decode_frame(data, min_side=FULL_FRAME_MAX_SIDE):
+    """Decode an encoded image to BGR.
+
+    JPEGs larger than the model needs are decoded straight at 1/2, 1/4 or 1/8
+    scale, as long as the longest side stays at least min_side. Landmarks are
+    normalized, so the scale does not change them.
+    """
+    flags = cv2.IMREAD_COLOR
+    size = jpeg_size(data)
+    if size is not None:
+        longest = max(size)
+        for factor, reduced in _REDUCED_DECODE:
+            if longest // factor >= min_side:
+                flags = reduced
+                break
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+
+
+def _scratch_image(name, height, width):
+    """A (height, width, 3) uint8 view of this thread's reusable buffer `name`"""
+    size = height * width * 3
+    buffer = getattr(_scratch, name, None)
+    if buffer is None or buffer.size < size:
+        buffer = np.empty(size, dtype=np.uint8)
+        setattr(_scratch, name, buffer)
+    return buffer[:size].reshape(height, width, 3)
+
+
+def _resize_to(image, max_side, scratch=True):
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1.0:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, dst=_scratch_image('resized', size[1], size[0]) if scratch else None,
+                      interpolation=cv2.INTER_AREA)
+
+
+def roi_from_landmarks(points, frame_width, frame_height, padding=ROI_PADDING):
+    """Padded pixel bounding box (x0, y0, x1, y1) around the visible landmarks, or None"""
+    if points is None:
+        return None
+    visible = points[points[:, 3] >= MIN_VISIBILITY]
+    if len(visible) < 4:
+        return None
+
+    xs = visible[:, 0] * frame_width
+    ys = visible[:, 1] * frame_height
+    x_min, x_max = xs.min(), xs.max()
+    y_min, y_max = ys.min(), ys.max()
+    pad = padding * max(x_max - x_min, y_max - y_min)
+
+    x0 = int(max(0, x_min - pad))
+    y0 = int(max(0, y_min - pad))
+    x1 = int(min(frame_width, x_max + pad))
+    y1 = int(min(frame_height, y_max + pad))
+    if x1 - x0 < MIN_ROI_SIDE or y1 - y0 < MIN_ROI_SIDE:
+        return None
+    return x0, y0, x1, y1
+
+
+def prepare_input(frame, previous_points=None, scratch=True):
+    """Build the RGB model input for a BGR frame.
+
+    With the previous frame's landmarks, the input is a padded crop around the
+    person resized to ROI_INPUT_SIZE; otherwise it is the full frame
+    downscaled to FULL_FRAME_MAX_SIDE. Returns (rgb_image, FrameTransform).
+
+    rgb_image lives in a per-thread buffer and is only valid until the next
+    prepare_input call on the same thread, unless scratch=False gives it
+    its own array.
+    """
+    frame_height, frame_width = frame.shape[:2]
+    roi = roi_from_landmarks(previous_points, frame_width, frame_height)
+
+    if roi is None:
+        source = frame
+        transform = FrameTransform(0, 0, frame_width, frame_height, frame_width, frame_height)
+        max_side = FULL_FRAME_MAX_SIDE
+    else:
+        x0, y0, x1, y1 = roi
+        source = frame[y0:y1, x0:x1]
+        transform = FrameTransform(x0, y0, x1 - x0, y1 - y0, frame_width, frame_height)
+        max_side = ROI_INPUT_SIZE
+
+    # Resize before converting so the colour conversion runs on the small image
+    resized = _resize_to(source, max_side, scratch)
+    image = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB,
+                         dst=_scratch_image('rgb', resized.shape[0], resized.shape[1]) if scratch else None)
+    image.flags.writeable = False
+    return image, transform
+
+
+def motion_thumbnail(frame):
+    """Tiny grayscale thumbnail of a BGR frame, for cheap comparison with earlier frames"""
+    width, height = MOTION_THUMBNAIL_SIZE
+    # Point-sample 4x4 pixels per thumbnail pixel, then average them: flat cost at any resolution
+    sampled = cv2.resize(frame, (width * 4, height * 4), interpolation=cv2.INTER_NEAREST)
+    gray = cv2.cvtColor(sampled, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, MOTION_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def motion_fraction(thumbnail, previous):
+    """Fraction of thumbnail pixels that changed noticeably since `previous`"""
+    changed = cv2.absdiff(thumbnail, previous) >= MOTION_PIXEL_DELTA
+    return np.count_nonzero(changed) / changed.size
@@ -0,0 +1,337 @@
+"""
+Table-driven rep counting.
+
+Each exercise is plain data (JSON-compatible), so new exercises can be added
+without code, either in EXERCISE_DEFINITIONS or through a JSON file loaded
+with load_definitions():
+
+    signals            name -> joint angles (kinematics.ANGLE_NAMES) averaged into it
+    calories_per_rep   calories added per counted rep
+    rules              checked in order; the first rule whose conditions all hold fires
+
+A rule is:
+
+    when               list of [signal, op, threshold] with op one of < <= > >=
+                       (empty = always, i.e. the fallback)
+    stage              stage to enter
+    feedback           feedback to show
+    count_if           optional [op, stage] with op '==' or '!=': the rule is a
+                       rep transition; when the current stage satisfies it a rep
+                       is counted and `stage`/`feedback` apply, otherwise only
+                       `miss_feedback` is shown and the stage is kept
+
+A compiled exercise runs either one frame at a time (step) or over a whole
+(N, angles) time series at once (evaluate_series).
+"""
+
+import json
+import operator
+
+import numpy as np
+
+from kinematics import ANGLE_NAMES
+
+EXERCISE_DEFINITIONS = {
+    'push-up': {
+        'signals': {'arm': ['left_arm', 'right_arm'], 'shoulder': ['left_shoulder', 'right_shoulder']},
+        'calories_per_rep': 0.5,
+        'rules': [
+            {'when': [['arm', '<', 90], ['shoulder', '>', 160]],
+             'stage': 'down', 'feedback': 'Great depth! Push back up.'},
+            {'when': [['arm', '>', 160], ['shoulder', '>', 160]], 'count_if': ['==', 'down'],
+             'stage': 'up', 'feedback': 'Good push-up! Keep your form.',
+             'miss_feedback': 'Start in a plank position.'},
+            {'when': [], 'feedback': 'Maintain proper form - keep your body aligned.'},
+        ],
+    },
+    'pull-up': {
+        'signals': {'arm': ['left_arm', 'right_arm'], 'shoulder': ['left_shoulder', 'right_shoulder']},
+        'calories_per_rep': 1.0,
+        'rules': [
+            {'when': [['arm', '<', 90], ['shoulder', '>', 160]],
+             'stage': 'up', 'feedback': 'Excellent! Chin over the bar.'},
+            {'when': [['arm', '>', 160], ['shoulder', '>', 160]], 'count_if': ['==', 'up'],
+             'stage': 'down', 'feedback': 'Perfect pull-up! Full range of motion.',
+             'miss_feedback': 'Hang freely to start.'},
+            {'when': [], 'feedback': 'Keep your core engaged and body straight.'},
+        ],
+    },
+    'sit-up': {
+        'signals': {'shoulder': ['left_shoulder', 'right_shoulder']},
+        'calories_per_rep': 0.4,
+        'rules': [
+            {'when': [['shoulder', '<', 90]],
+             'stage': 'up', 'feedback': 'Good! Keep your core engaged.'},
+            {'when': [['shoulder', '>', 160]], 'count_if': ['==', 'up'],
+             'stage': 'down', 'feedback': 'Great sit-up! Full range of motion.',
+             'miss_feedback': 'Lower your upper body completely.'},
+            {'when': [], 'feedback': 'Keep your feet flat and avoid using momentum.'},
+        ],
+    },
+    'squat': {
+        'signals': {'leg': ['left_leg', 'right_leg']},
+        'calories_per_rep': 0.6,
+        'rules': [
+            {'when': [['leg', '<', 90]],
+             'stage': 'down', 'feedback': 'Good depth! Keep your knees aligned.'},
+            {'when': [['leg', '>', 160]], 'count_if': ['==', 'down'],
+             'stage': 'up', 'feedback': 'Excellent squat! Full range of motion.',
+             'miss_feedback': 'Stand up completely for a full rep.'},
+            {'when': [], 'feedback': 'Keep your chest up and weight in your heels.'},
+        ],
+    },
+    'walk': {
+        'signals': {'leg': ['left_leg', 'right_leg']},
+        'calories_per_rep': 0.05,
+        'rules': [
+            {'when': [['leg', '<', 120]], 'count_if': ['!=', 'step'],
+             'stage': 'step', 'feedback': 'Good walking form! Keep your posture upright.',
+             'miss_feedback': 'Continue walking with good posture.'},
+            {'when': [], 'stage': 'stand', 'feedback': 'Maintain good posture while walking.'},
+        ],
+    },
+}
+
+_OPS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+_NP_OPS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+
+
+class _Rule:
+    __slots__ = ('conditions', 'stage', 'feedback', 'count_if', 'miss_feedback')
+
+    def __init__(self, definition, signal_index):
+        self.conditions = tuple(
+            (signal_index[signal], op, float(threshold)) for signal, op, threshold in definition.get('when', [])
+        )
+        for _, op, _ in self.conditions:
+            if op not in _OPS:
+                raise ValueError(f'Unknown comparison: {op}')
+        self.stage = definition.get('stage')
+        self.feedback = definition.get('feedback', '')
+        self.count_if = tuple(definition['count_if']) if definition.get('count_if') else None
+        if self.count_if and self.count_if[0] not in ('==', '!='):
+            raise ValueError(f'Unknown stage test: {self.count_if[0]}')
+        if self.count_if and self.stage is None:
+            raise ValueError('A count_if rule needs a stage')
+        self.miss_feedback = definition.get('miss_feedback', self.feedback)
+
+    def matches(self, signals):
+        for index, op, threshold in self.conditions:
+            if not _OPS[op](signals[index], threshold):
+                return False
+        return True
+
+    def passes(self, stage):
+        op, value = self.count_if
+        return (stage == value) if op == '==' else (stage != value)
+
+
+class SeriesResult:
+    """Per-frame output of CompiledExercise.evaluate_series"""
+    __slots__ = ('counts', 'calories', 'stages', 'feedback')
+
+    def __init__(self, counts, calories, stages, feedback):
+        self.counts = counts        # (N,) cumulative rep count after each frame
+        self.calories = calories    # (N,) cumulative calories after each frame
+        self.stages = stages        # list of stage after each frame
+        self.feedback = feedback    # list of feedback after each frame
+
+    def final(self, state):
+        """(count, stage, feedback, calories) after the last frame"""
+        if len(self.counts) == 0:
+            return state.counter, state.stage, state.feedback, state.calories
+        return int(self.counts[-1]), self.stages[-1], self.feedback[-1], float(self.calories[-1])
+
+
+class CompiledExercise:
+    """An exercise definition compiled to index arrays for fast evaluation"""
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.signal_names = tuple(definition['signals'])
+        signal_index = {signal: i for i, signal in enumerate(self.signal_names)}
+        self.signal_angles = tuple(
+            tuple(ANGLE_NAMES.index(angle) for angle in definition['signals'][signal])
+            for signal in self.signal_names
+        )
+        self.angle_names = tuple(
+            tuple(definition['signals'][signal]) for signal in self.signal_names
+        )
+        self.calories_per_rep = float(definition.get('calories_per_rep', 0.0))
+        self.rules = tuple(_Rule(rule, signal_index) for rule in definition['rules'])
+
+    def signals(self, angles):
+        """Signal values for one frame from an {angle name: degrees} dict"""
+        values = []
+        for names in self.angle_names:
+            total = angles[names[0]]
+            for name in names[1:]:
+                total = total + angles[name]
+            values.append(total / len(names))
+        return values
+
+    def step(self, state, angles):
+        """Advance a TypeOfExercise-like state by one frame of angles"""
+        signals = self.signals(angles)
+        for rule in self.rules:
+            if not rule.matches(signals):
+                continue
+            if rule.count_if is None:
+                if rule.stage is not None:
+                    state.stage = rule.stage
+                state.feedback = rule.feedback
+            elif rule.passes(state.stage):
+                state.counter += 1
+                state.calories += self.calories_per_rep
+                state.stage = rule.stage
+                state.feedback = rule.feedback
+            else:
+                state.feedback = rule.miss_feedback
+            break
+        return state.counter, state.stage, state.feedback, state.calories
+
+    def series_signals(self, angles):
+        """(N, signals) array from an (N, len(ANGLE_NAMES)) angle array"""
+        angles = np.asarray(angles, dtype=np.float64)
+        columns = []
+        for indices in self.signal_angles:
+            total = angles[:, indices[0]]
+            for index in indices[1:]:
+                total = total + angles[:, index]
+            columns.append(total / len(indices))
+        return np.stack(columns, axis=1) if columns else np.zeros((len(angles), 0))
+
+    def fired_rules(self, signals):
+        """Index of the first matching rule per frame, -1 when none matches"""
+        n = len(signals)
+        fired = np.full(n, -1, dtype=np.intp)
+        unresolved = np.ones(n, dtype=bool)
+        for i, rule in enumerate(self.rules):
+            match = unresolved.copy()
+            for index, op, threshold in rule.conditions:
+                match &= _NP_OPS[op](signals[:, index], threshold)
+            fired[match] = i
+            unresolved &= ~match
+        return fired
+
+    def evaluate_series(self, angles, state):
+        """Run the whole (N, angles) series from `state` and return a SeriesResult.
+
+        `state` is left untouched; apply result.final(...) to it if needed.
+        """
+        signals = self.series_signals(angles)
+        fired = self.fired_rules(signals)
+        count_rules = [i for i, rule in enumerate(self.rules) if rule.count_if is not None]
+        if len(count_rules) > 1 or any(self.rules[i].passes(self.rules[i].stage) for i in count_rules):
+            return self._evaluate_loop(fired, state)
+
+        n = len(fired)
+        stage_names = [state.stage] + sorted({rule.stage for rule in self.rules if rule.stage is not None}
+                                              - {state.stage}, key=str)
+        stage_code = {stage: code for code, stage in enumerate(stage_names)}
+        frame_index = np.arange(n)
+
+        # Rules that set a stage unconditionally split the series into segments
+        const_stage = np.full(len(self.rules), -1, dtype=np.intp)
+        for i, rule in enumerate(self.rules):
+            if rule.count_if is None and rule.stage is not None:
+                const_stage[i] = stage_code[rule.stage]
+        fired_const = np.where(fired >= 0, const_stage[np.maximum(fired, 0)], -1)
+        is_const = fired_const >= 0
+        last_const = np.maximum.accumulate(np.where(is_const, frame_index, -1)) if n else frame_index
+        segment_stage = np.where(last_const >= 0, fired_const[np.maximum(last_const, 0)], 0)
+
+        # Within a segment the stage is constant until the first rep transition, so only
+        # the first transition frame of each segment can count a rep
+        counted = np.zeros(n, dtype=bool)
+        target = None
+        if count_rules:
+            rule = self.rules[count_rules[0]]
+            target = stage_code[rule.stage]
+            is_count = fired == count_rules[0]
+            count_frames = np.flatnonzero(is_count)
+            segment_of = last_const[count_frames]
+            first = np.ones(len(count_frames), dtype=bool)
+            first[1:] = segment_of[1:] != segment_of[:-1]
+            op, value = rule.count_if
+            value_code = stage_code.get(value, -1)
+            stage_before = segment_stage[count_frames]
+            passes = (stage_before == value_code) if op == '==' else (stage_before != value_code)
+            counted[count_frames[first & passes]] = True
+
+        counts = state.counter + np.cumsum(counted)
+        rep_calories = np.where(counted, self.calories_per_rep, 0.0)
+        rep_calories[:1] += state.calories
+        calories = np.cumsum(rep_calories)
+
+        # Stage after each frame: segment stage, or the rep target once the segment has counted
+        cumulative = np.cumsum(counted)
+        before_segment = np.where(last_const >= 0, cumulative[np.maximum(last_const, 0)], 0)
+        stages_codes = segment_stage
+        if target is not None:
+            stages_codes = np.where(cumulative - before_segment > 0, target, segment_stage)
+        stages = np.array(stage_names, dtype=object)[stages_codes].tolist()
+
+        feedback = self._series_feedback(fired, counted, state.feedback)
+        return SeriesResult(counts, calories, stages, feedback)
+
+    def _series_feedback(self, fired, counted, initial):
+        # Message table: rule feedback, then rule miss feedback, then the initial message
+        table = np.array([rule.feedback for rule in self.rules] +
+                         [rule.miss_feedback for rule in self.rules] + [initial], dtype=object)
+        is_count_rule = np.array([rule.count_if is not None for rule in self.rules] + [False])
+        codes = np.where(is_count_rule[fired] & ~counted, fired + len(self.rules), fired)
+        # Frames where no rule fires keep the previous message
+        frame_index = np.arange(len(fired))
+        last_fired = np.maximum.accumulate(np.where(fired >= 0, frame_index, -1)) if len(fired) else frame_index
+        codes = np.where(last_fired >= 0, codes[np.maximum(last_fired, 0)], len(table) - 1)
+        return table[codes].tolist()
+
+    def _evaluate_loop(self, fired, state):
+        """Frame-by-frame fallback for definitions the segment logic cannot handle"""
+        counter, calories, stage, message = state.counter, state.calories, state.stage, state.feedback
+        counts, calorie_values, stages, feedback = [], [], [], []
+        for rule_index in fired.tolist():
+            if rule_index >= 0:
+                rule = self.rules[rule_index]
+                if rule.count_if is None:
+                    if rule.stage is not None:
+                        stage = rule.stage
+                    message = rule.feedback
+                elif rule.passes(stage):
+                    counter += 1
+                    calories += self.calories_per_rep
+                    stage = rule.stage
+                    message = rule.feedback
+                else:
+                    message = rule.miss_feedback
+            counts.append(counter)
+            calorie_values.append(calories)
+            stages.append(stage)
+            feedback.append(message)
+        return SeriesResult(np.array(counts), np.array(calorie_values), stages, feedback)
+
+
+EXERCISES = {}
+
+
+def register_exercise(name, definition):
+    """Compile and register an exercise definition under `name`"""
+    EXERCISES[name] = CompiledExercise(name, definition)
+    return EXERCISES[name]
+
+
+def load_definitions(path):
+    """Register every exercise in a JSON file of {name: definition}"""
+    with open(path) as f:
+        definitions = json.load(f)
+    for name, definition in definitions.items():
+        register_exercise(name, definition)
+
+
+def get_exercise(name):
+    return EXERCISES.get(name)
+
+
+for _name, _definition in EXERCISE_DEFINITIONS.items():
+    register_exercise(_name, _definition)
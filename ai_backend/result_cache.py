@@ -0,0 +1,188 @@
+"""
+Content-addressed cache of upload analysis results.
+
+Entries are opaque byte strings keyed by a hex digest of what produced them
+(the media bytes, the exercise type and the analyzer settings), so a repeat
+upload of the same clip is answered without decoding a frame. The memory
+tier is an LRU bounded in bytes; entries it evicts spill to the disk tier
+when one is configured. The disk tier is a directory of one file per entry,
+bounded in bytes with the least recently used files (by mtime) deleted
+first, and can be shared by several server processes.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+# Bytes hashed per read when digesting an upload
+DIGEST_CHUNK_SIZE = 1 << 20
+
+
+def stream_digest(stream, chunk_size=DIGEST_CHUNK_SIZE):
+    """SHA-256 hex digest of a seekable stream's contents, leaving it rewound to the start"""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def content_key(*parts):
+    """Cache key for a result computed from `parts` (digests, names, settings)"""
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier LRU cache of byte strings: memory, then an optional spill directory"""
+
+    def __init__(self, max_bytes=64 << 20, directory=None, disk_max_bytes=1 << 30):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        # key -> value, least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_bytes = sum(size for _, size, _ in self._disk_entries())
+        else:
+            self.disk_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def lookup(self, key):
+        """(value, tier): the cached value and 'memory' or 'disk', or (None, None) on a miss"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits['memory'] += 1
+                return value, 'memory'
+        value = self._read(key) if self.directory else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None, None
+            self.hits['disk'] += 1
+        if len(value) <= self.max_bytes:
+            self._store(key, value)
+        return value, 'disk'
+
+    def get(self, key):
+        """The cached value, or None"""
+        return self.lookup(key)[0]
+
+    def put(self, key, value):
+        """Cache a value; values larger than the memory tier go straight to disk"""
+        if len(value) > self.max_bytes:
+            if self.directory:
+                self._write(key, value)
+            return
+        self._store(key, value)
+
+    def _store(self, key, value):
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self._entries[key] = value
+            self.bytes += len(value)
+            while self.bytes > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.bytes -= len(old_value)
+                evicted.append((old_key, old_value))
+        if self.directory:
+            for old_key, old_value in evicted:
+                # Entries promoted from disk are still there
+                if not os.path.exists(self._path(old_key)):
+                    self._write(old_key, old_value)
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                value = f.read()
+        except OSError:
+            return None
+        try:
+            # Mark as recently used for the disk tier's LRU
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return value
+
+    def _write(self, key, value):
+        temp_path = self._path(f'.{key}.{uuid.uuid4().hex[:8]}.tmp')
+        try:
+            # An entry being overwritten stops counting against the budget
+            replaced = os.stat(self._path(key)).st_size
+        except OSError:
+            replaced = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(value)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.disk_bytes += len(value) - replaced
+            over = self.disk_bytes > self.disk_max_bytes
+        if over:
+            self._prune_disk()
+
+    def _disk_entries(self):
+        """(path, size, mtime) of the spilled entries"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _prune_disk(self):
+        """Delete the least recently used spilled entries until the disk tier fits its budget"""
+        # Other processes may share the directory, so measure it rather than trust the running total
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            self.disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'disk_bytes': self.disk_bytes,
+                'hits': dict(self.hits),
+                'misses': self.misses
+            }
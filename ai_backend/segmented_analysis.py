@@ -0,0 +1,197 @@
+"""
+Segment-parallel analysis of long uploaded videos.
+
+The video is split into time segments that worker processes decode and run
+through pose inference in parallel, each worker with its own Pose instance.
+A worker starts `overlap` frames before its segment and discards them: they
+only warm up MediaPipe's tracker, the ROI crop and the landmark filter, so the
+first real frame of a segment starts from a state close to, but not always
+the same as, a sequential run's. Workers seek with CAP_PROP_POS_FRAMES, which
+is not frame-accurate for many codecs, so a segment can start a few frames
+off; benchmarks/check_segmented.py compares both paths on a fixture video.
+
+Workers return landmarks and joint angles, not counts. Rep counting runs in
+the parent over the segments in order, feeding each segment's angle series
+to the session's TypeOfExercise (vectorized, see rep_counting), so the stage
+and a half-finished rep carry across every boundary.
+
+Every frame runs through inference: there is no inference stride or motion
+gate, and workers are bounded by their count rather than admission control.
+"""
+
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import metrics
+from kinematics import NUM_LANDMARKS, ANGLE_NAMES, joint_angles, landmarks_to_array
+from landmark_filter import LandmarkFilter
+from preprocessing import prepare_input
+from rep_counting import EXERCISES
+from video_analysis import frame_result, no_person_result
+
+# Per-process Pose instance of a segment worker
+_pose = None
+
+
+def _init_worker(pose_kwargs, pose_factory=None):
+    global _pose
+    if pose_factory is not None:
+        _pose = pose_factory(**pose_kwargs)
+        return
+    import mediapipe as mp
+    _pose = mp.solutions.pose.Pose(**pose_kwargs)
+
+
+def worker_pose():
+    """The Pose instance of this pool worker process (see create_executor)"""
+    return _pose
+
+
+def video_info(path):
+    """(frame count, fps) of a video file as reported by the container"""
+    cap = cv2.VideoCapture(path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+
+
+def plan_segments(frame_count, fps, segment_seconds):
+    """[(start, end)] frame ranges; the last segment's end is None (read to the end)"""
+    segment_frames = max(1, int(round(segment_seconds * fps)))
+    count = max(1, math.ceil(frame_count / segment_frames))
+    segments = [(i * segment_frames, (i + 1) * segment_frames) for i in range(count)]
+    segments[-1] = (segments[-1][0], None)
+    return segments
+
+
+def track_frames(pose, path, start=0, end=None, overlap=0, smoothing=True):
+    """Decode frames [start, end) of a video and run inference, yielding (index, timestamp, frame, points).
+
+    points is the frame's (33, 4) landmarks, or None without a person. The
+    `overlap` frames before start only warm up tracking and are not yielded.
+    """
+    first = max(0, start - overlap)
+    cap = cv2.VideoCapture(path)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    landmark_filter = LandmarkFilter()
+    previous = None
+    index = first
+    try:
+        while end is None or index < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+            image, transform = prepare_input(frame, previous)
+            results = pose.process(image)
+            if not results.pose_landmarks and transform.is_crop:
+                image, transform = prepare_input(frame)
+                results = pose.process(image)
+
+            if results.pose_landmarks:
+                points = transform.to_frame(landmarks_to_array(results.pose_landmarks))
+                smoothed = landmark_filter.update(points, timestamp)
+                previous = smoothed if smoothing else points
+            else:
+                landmark_filter.reset()
+                previous = None
+
+            if index >= start:
+                yield index, timestamp, frame, previous
+            index += 1
+    finally:
+        cap.release()
+
+
+def analyze_segment(path, start, end, overlap=15, smoothing=True):
+    """Decode frames [start, end) (plus `overlap` warm-up frames before start) and run inference.
+
+    Returns (timestamps, present, points, angles) for the segment's frames.
+    """
+    timestamps, present, frames_points = [], [], []
+    for _, timestamp, _, frame_points in track_frames(_pose, path, start, end, overlap, smoothing):
+        timestamps.append(timestamp)
+        present.append(frame_points is not None)
+        frames_points.append(frame_points if frame_points is not None else np.zeros((NUM_LANDMARKS, 4)))
+
+    points = np.array(frames_points, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+    present = np.array(present, dtype=bool)
+    angles = joint_angles(points[present]) if present.any() else np.zeros((0, len(ANGLE_NAMES)))
+    return np.array(timestamps), present, points, angles
+
+
+def create_executor(workers, pose_kwargs, pose_factory=None):
+    """Process pool whose workers each own a Pose instance (built by the picklable pose_factory if given)"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(pose_kwargs, pose_factory)
+    )
+
+
+def analyze_video_segments(trainer, executor, path, exercise_type, session_id, summary, segments,
+                           overlap=15):
+    """Analyze `segments` of a video in parallel, yielding per-frame results in order like analyze_video"""
+    futures = [
+        executor.submit(analyze_segment, path, start, end, overlap, trainer.smoothing)
+        for start, end in segments
+    ]
+    session = trainer.get_session_data(session_id)
+    exercise_state = session.exercise
+    exercise_label = exercise_type if exercise_type in EXERCISES else 'other'
+
+    try:
+        for future in futures:
+            timestamps, present, points, angles = future.result()
+
+            # Count and calories so far, reported on frames without a person
+            count, calories = exercise_state.counter, exercise_state.calories
+            with metrics.STAGE_COUNTING.time():
+                series = exercise_state.update_series(exercise_type, angles)
+
+            row = 0
+            for i in range(len(present)):
+                if trainer.recorder is not None:
+                    trainer.recorder.record(session_id, points[i] if present[i] else None,
+                                            timestamps[i], exercise_type)
+                if not present[i]:
+                    metrics.FRAMES.labels(exercise_label, 'no_person').inc()
+                    result = no_person_result(count, calories)
+                    if trainer.analysis_store is not None:
+                        trainer.store_analysis(session, session_id, exercise_type, 'no_person', count, calories)
+                    summary.update(result)
+                    yield result
+                    continue
+
+                metrics.FRAMES.labels(exercise_label, 'ok').inc()
+                frame_angles = dict(zip(ANGLE_NAMES, angles[row].tolist()))
+                previous_count, previous_calories = count, calories
+                if series is None:
+                    result = frame_result(0, 'unknown', 'Exercise type not supported', 0.0,
+                                          frame_angles, points[i])
+                else:
+                    count, calories = int(series.counts[row]), float(series.calories[row])
+                    result = frame_result(count, series.stages[row], series.feedback[row], calories,
+                                          frame_angles, points[i])
+                if trainer.analysis_store is not None:
+                    trainer.store_analysis(session, session_id, exercise_type, result['status'], result['count'],
+                                           result['calories'], angles[row], previous_count, previous_calories)
+                row += 1
+                summary.update(result)
+                yield result
+
+            if len(present):
+                session.points = points[-1] if present[-1] else None
+    finally:
+        for future in futures:
+            future.cancel()
+        trainer.sessions.save(session_id, session)
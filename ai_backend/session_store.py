@@ -0,0 +1,271 @@
+"""
+Session stores for per-user analysis state.
+
+A store maps a session id to a SessionState and owns expiry and eviction.
+MemorySessionStore keeps sessions in one process; SqliteSessionStore keeps
+them in a SQLite file so several worker processes can share them.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from landmark_filter import LandmarkFilter
+from types_of_exercise import TypeOfExercise
+
+# Rough fixed footprint of one session (state objects, dict entry, key)
+SESSION_OVERHEAD_BYTES = 1024
+
+
+class SessionState:
+    """Everything the analyzer keeps between frames of one session"""
+    __slots__ = ('exercise', 'points', 'filter', 'skipped', 'rep_started', 'thumbnail', 'static_run', 'frames',
+                 'gated')
+
+    def __init__(self):
+        self.exercise = TypeOfExercise()
+        # Previous frame's (33, 4) landmarks, or None when the person was lost
+        self.points = None
+        # Landmark smoothing/extrapolation state
+        self.filter = LandmarkFilter()
+        # Frames extrapolated since the last inference
+        self.skipped = 0
+        # Wall time the current rep started (the last rep, or the first stored frame), for rep durations
+        self.rep_started = None
+        # Motion thumbnail of the last frame that ran inference, and frames answered without it since
+        self.thumbnail = None
+        self.static_run = 0
+        # Frames analyzed, and how many of them the motion gate answered from the previous result
+        self.frames = 0
+        self.gated = 0
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        # Start from defaults so states pickled by older versions still load
+        self.__init__()
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def size_bytes(self):
+        size = SESSION_OVERHEAD_BYTES + self.filter.size_bytes()
+        if self.points is not None:
+            size += self.points.nbytes
+        if self.thumbnail is not None:
+            size += self.thumbnail.nbytes
+        return size
+
+
+class SessionStore:
+    """Backend interface for session storage"""
+
+    def __init__(self, timeout=600, max_sessions=1000, max_bytes=None):
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id):
+        """Return the session's state, creating it if needed, and mark it as active"""
+        raise NotImplementedError
+
+    def save(self, session_id, state):
+        """Persist changes made to a state returned by get()"""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, session_id):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with O(1) touch and eviction.
+
+    Sessions live in an OrderedDict kept in last-used order, so the least
+    recently used session is always at the head. Expiry pops expired heads a
+    couple at a time on each access, and the count/memory caps evict from
+    the head, so neither ever scans the whole store.
+    """
+
+    # Expired sessions reclaimed per access; keeps the per-request cost constant
+    EXPIRE_BATCH = 2
+
+    def __init__(self, timeout=600, max_sessions=1000, max_bytes=None):
+        super().__init__(timeout, max_sessions, max_bytes)
+        self._sessions = OrderedDict()  # session_id -> [state, last_seen, size]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now, limit):
+        while limit and self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry[1] <= self.timeout:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+            limit -= 1
+
+    def _remove(self, session_id):
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry[2]
+
+    def _enforce_caps(self):
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._sessions)))
+            self.evictions += 1
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            self._expire(now, self.EXPIRE_BATCH)
+            entry = self._sessions.get(session_id)
+            if entry is None or now - entry[1] > self.timeout:
+                state = SessionState()
+                entry = [state, now, state.size_bytes()]
+                if session_id in self._sessions:
+                    self._remove(session_id)
+                self._sessions[session_id] = entry
+                self._bytes += entry[2]
+                self._enforce_caps()
+            else:
+                entry[1] = now
+                self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def save(self, session_id, state):
+        # State objects are shared, so only the memory accounting needs updating
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] is not state:
+                return
+            size = state.size_bytes()
+            self._bytes += size - entry[2]
+            entry[2] = size
+            if self.max_bytes is not None and self._bytes > self.max_bytes:
+                self._enforce_caps()
+
+    def delete(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    @property
+    def memory_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+
+class SqliteSessionStore(SessionStore):
+    """Store backed by a SQLite file, shared by every worker process that opens it.
+
+    States are pickled on save. Expired and over-cap sessions are removed in
+    one indexed DELETE every `sweep_interval` seconds rather than per request.
+    """
+
+    def __init__(self, path, timeout=600, max_sessions=1000, max_bytes=None, sweep_interval=5.0):
+        super().__init__(timeout, max_sessions, max_bytes)
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'session_id TEXT PRIMARY KEY, state BLOB NOT NULL, last_seen REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _sweep(self, conn, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        cur = conn.execute('DELETE FROM sessions WHERE last_seen < ?', (now - self.timeout,))
+        self.expirations += max(cur.rowcount, 0)
+        cur = conn.execute(
+            'DELETE FROM sessions WHERE session_id IN ('
+            'SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)',
+            (self.max_sessions,)
+        )
+        self.evictions += max(cur.rowcount, 0)
+        if self.max_bytes is not None:
+            cur = conn.execute(
+                'DELETE FROM sessions WHERE last_seen <= ('
+                'SELECT last_seen FROM ('
+                'SELECT last_seen, SUM(length(state)) OVER (ORDER BY last_seen DESC) AS total '
+                'FROM sessions) WHERE total > ? ORDER BY last_seen DESC LIMIT 1)',
+                (self.max_bytes,)
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def get(self, session_id):
+        now = time.time()
+        conn = self._connection()
+        self._sweep(conn, now)
+        row = conn.execute(
+            'SELECT state, last_seen FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        if row is not None and now - row[1] <= self.timeout:
+            conn.execute('UPDATE sessions SET last_seen = ? WHERE session_id = ?', (now, session_id))
+            return pickle.loads(row[0])
+
+        state = SessionState()
+        conn.execute(
+            'INSERT OR REPLACE INTO sessions (session_id, state, last_seen) VALUES (?, ?, ?)',
+            (session_id, pickle.dumps(state, pickle.HIGHEST_PROTOCOL), now)
+        )
+        return state
+
+    def save(self, session_id, state):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO sessions (session_id, state, last_seen) VALUES (?, ?, ?)',
+            (session_id, pickle.dumps(state, pickle.HIGHEST_PROTOCOL), time.time())
+        )
+
+    def delete(self, session_id):
+        self._connection().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def __contains__(self, session_id):
+        row = self._connection().execute(
+            'SELECT 1 FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return row is not None
+
+
+def create_session_store(spec='memory', **options):
+    """Build a store from a spec string: 'memory' or 'sqlite:<path>'"""
+    if spec.startswith('sqlite:'):
+        return SqliteSessionStore(spec[len('sqlite:'):], **options)
+    if spec == 'memory':
+        return MemorySessionStore(**options)
+    raise ValueError(f'Unknown session store: {spec}')
@@ -0,0 +1,133 @@
+"""
+Reference client for the Unix socket transport (see unix_transport.py).
+
+Sends JPEG frames to a server started with AI_UNIX_SOCKET and reports
+round-trip latency per frame; with --compare-http it also posts the same
+frames to /api/real-time-analysis for a side-by-side measurement.
+
+    python unix_client.py --socket /tmp/gymbuddy.sock --frames 200 --compare-http
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import wire_format
+from live_client import load_jpeg, report, run_http
+from live_stream import RESULT_HEADER
+from unix_transport import decode_reply, encode_request, read_message
+
+
+class UnixClient:
+    """One connection to the Unix socket transport; requests are answered in order"""
+
+    def __init__(self, path, session_id='', exercise_type='push-up', fmt='binary', precision='f16'):
+        self.session_id = session_id
+        self.exercise_type = exercise_type
+        self.fmt = fmt
+        self.precision = precision
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+
+    def send(self, jpeg, seq=0, captured_at=None):
+        self.sock.sendall(encode_request(jpeg, seq, self.session_id, self.exercise_type, self.fmt,
+                                         self.precision, captured_at))
+
+    def receive(self):
+        """(seq, result) of the next reply; seq is None for errors without one"""
+        message = read_message(self.sock)
+        if message is None:
+            raise ConnectionError('Server closed the connection')
+        reply = decode_reply(message)
+        if isinstance(reply, str):
+            result = json.loads(reply)
+            return result.get('seq'), result
+        (seq,) = RESULT_HEADER.unpack_from(reply, 0)
+        body = reply[RESULT_HEADER.size:]
+        if body[:4] == wire_format.MAGIC:
+            return seq, wire_format.decode_binary(body)
+        return seq, wire_format.decode_msgpack(body)
+
+    def analyze(self, jpeg, seq=0, captured_at=None):
+        """Send one frame and wait for its result"""
+        self.send(jpeg, seq, captured_at)
+        return self.receive()[1]
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_unix(client, jpeg, frames, window):
+    """Send frames with up to `window` in flight; returns (latencies in ms, last result, frames unanswered).
+
+    Replies come back in request order, so a result for seq N settles every
+    earlier frame still in flight, and an error the server could not tie to
+    a sequence number settles the oldest one.
+    """
+    sent_at = {}
+    latencies = []
+    last = None
+    dropped = 0
+    next_seq = 0
+    while next_seq < frames or sent_at:
+        while next_seq < frames and len(sent_at) < window:
+            sent_at[next_seq] = time.perf_counter()
+            client.send(jpeg, next_seq, time.time())
+            next_seq += 1
+        seq, last = client.receive()
+        if seq is None:
+            del sent_at[min(sent_at)]
+            dropped += 1
+            continue
+        for pending in [pending for pending in sent_at if pending < seq]:
+            del sent_at[pending]
+            dropped += 1
+        if seq in sent_at:
+            latencies.append((time.perf_counter() - sent_at.pop(seq)) * 1000)
+    return latencies, last, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Unix socket transport reference client')
+    parser.add_argument('--socket', default=os.environ.get('AI_UNIX_SOCKET', '/tmp/gymbuddy.sock'))
+    parser.add_argument('--host', default='localhost:8000', help='HTTP server for --compare-http')
+    parser.add_argument('--image', help='JPEG to send (default: synthetic 640x480 frame)')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--exercise', default='push-up')
+    parser.add_argument('--session', default='unix-client')
+    parser.add_argument('--format', default='binary', choices=['json', 'binary', 'msgpack'])
+    parser.add_argument('--precision', default='f16', choices=['f16', 'f32'])
+    parser.add_argument('--window', type=int, default=1, help='frames in flight on the connection')
+    parser.add_argument('--compare-http', action='store_true')
+    args = parser.parse_args()
+
+    jpeg = load_jpeg(args.image)
+    with UnixClient(args.socket, args.session, args.exercise, args.format, args.precision) as client:
+        start = time.perf_counter()
+        latencies, last, dropped = run_unix(client, jpeg, args.frames, args.window)
+        report('unix', latencies, time.perf_counter() - start)
+    if dropped:
+        print(f"unanswered: {dropped} frames")
+    if last:
+        print(f"last result: count={last.get('count')} status={last.get('status')}")
+
+    if args.compare_http:
+        start = time.perf_counter()
+        latencies = run_http(f"http://{args.host}/api/real-time-analysis", jpeg, args.frames,
+                             args.exercise, args.session + '-http')
+        report('http', latencies, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
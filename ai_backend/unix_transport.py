@@ -0,0 +1,224 @@
+"""
+Unix domain socket transport for clients on the same host, such as the Node proxy.
+
+Carries /ws/live frames (see live_stream.py) over a local stream socket with
+length-prefixed framing instead of HTTP multipart, so a frame costs no TCP,
+header parsing or form decoding. Every message in either direction starts
+with its length::
+
+    <I  length of the rest of the message (little-endian uint32)
+
+A request names its session and result format, then carries a /ws/live
+binary frame message::
+
+    <BBBBB  version (1), format (0 json, 1 binary, 2 msgpack),
+            precision (0 f16, 1 f32), session id length,
+            exercise type length
+    ...     session id, exercise type (UTF-8; empty = default, push-up)
+    <I      sequence number, echoed in the result
+    <d      capture time in unix milliseconds (0 = unknown)
+    ...     JPEG bytes
+
+A reply is a kind byte and the message /ws/live would send for the frame::
+
+    <B  0 = binary (sequence number + wire_format frame), 1 = JSON text
+    ... body
+
+Requests on one connection are answered in order; a client that wants
+frames analyzed concurrently opens several connections. Each frame gets
+the same deadline as an HTTP live frame, so admission control sheds it the
+same way.
+"""
+
+import atexit
+import json
+import os
+import socket
+import stat
+import struct
+import threading
+import time
+
+import metrics
+import wire_format
+from live_stream import FRAME_HEADER, LiveSession
+
+VERSION = 1
+LENGTH = struct.Struct('<I')
+REQUEST_HEADER = struct.Struct('<BBBBB')
+FORMATS = ('json', 'binary', 'msgpack')
+PRECISIONS = ('f16', 'f32')
+REPLY_BINARY = 0
+REPLY_TEXT = 1
+# A longer message closes the connection rather than being buffered
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+def encode_request(jpeg, seq=0, session_id='', exercise_type='', fmt='binary', precision='f16', captured_at=None):
+    """Length-prefixed request message for one JPEG frame (captured_at in unix seconds)"""
+    session = session_id.encode('utf-8')
+    exercise = exercise_type.encode('utf-8')
+    header = REQUEST_HEADER.pack(VERSION, FORMATS.index(fmt), PRECISIONS.index(precision), len(session),
+                                 len(exercise))
+    frame_header = FRAME_HEADER.pack(seq, captured_at * 1000.0 if captured_at else 0.0)
+    size = len(header) + len(session) + len(exercise) + len(frame_header) + len(jpeg)
+    return b''.join((LENGTH.pack(size), header, session, exercise, frame_header, jpeg))
+
+
+def decode_request(message):
+    """(session id, exercise type, format, precision, frame message) of a request"""
+    version, fmt, precision, session_length, exercise_length = REQUEST_HEADER.unpack_from(message, 0)
+    if version != VERSION:
+        raise ValueError(f'Unsupported protocol version {version}')
+    if fmt >= len(FORMATS) or precision >= len(PRECISIONS):
+        raise ValueError('Unknown format or precision')
+    offset = REQUEST_HEADER.size
+    session_id = bytes(message[offset:offset + session_length]).decode('utf-8')
+    offset += session_length
+    exercise_type = bytes(message[offset:offset + exercise_length]).decode('utf-8')
+    offset += exercise_length
+    return session_id, exercise_type, FORMATS[fmt], PRECISIONS[precision], memoryview(message)[offset:]
+
+
+def request_seq(message):
+    """Sequence number of a request whose headers are intact, or None"""
+    try:
+        _, _, _, session_length, exercise_length = REQUEST_HEADER.unpack_from(message, 0)
+        seq, _ = FRAME_HEADER.unpack_from(message, REQUEST_HEADER.size + session_length + exercise_length)
+    except struct.error:
+        return None
+    return seq
+
+
+def read_message(sock):
+    """Next length-prefixed message as a bytearray, or None once the peer has closed"""
+    prefix = _read_exact(sock, LENGTH.size)
+    if prefix is None:
+        return None
+    (size,) = LENGTH.unpack(prefix)
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f'Message of {size} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit')
+    return _read_exact(sock, size)
+
+
+def _read_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return buffer
+
+
+def encode_reply(reply):
+    """Length-prefixed reply message for the str or bytes /ws/live would send"""
+    if isinstance(reply, str):
+        kind, body = REPLY_TEXT, reply.encode('utf-8')
+    else:
+        kind, body = REPLY_BINARY, reply
+    return LENGTH.pack(len(body) + 1) + bytes((kind,)) + body
+
+
+def decode_reply(message):
+    """The str or bytes carried by a reply message"""
+    body = bytes(memoryview(message)[1:])
+    return body.decode('utf-8') if message[0] == REPLY_TEXT else body
+
+
+def bind_unix_socket(path, backlog=128):
+    """Listening socket at `path`, replacing a socket file left by an earlier run"""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(f'{path} exists and is not a socket')
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(backlog)
+    owner = os.getpid()
+
+    def remove():
+        # Forked workers inherit the registration; only the process that bound the path removes it
+        if os.getpid() == owner:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    atexit.register(remove)
+    return listener
+
+
+def _error(seq, error):
+    """JSON error reply, echoing the request's sequence number when it could be read"""
+    if seq is None:
+        return json.dumps({'type': 'error', 'error': error})
+    return json.dumps({'type': 'error', 'seq': seq, 'error': error})
+
+
+class UnixTransport:
+    """Serves analysis requests on a listening Unix socket, one thread per connection"""
+
+    def __init__(self, trainer, listener, deadline_ms=None):
+        self.trainer = trainer
+        self.listener = listener
+        # Per-frame time budget for admission control, as for /ws/live
+        self.deadline_ms = deadline_ms
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._accept, name='unix-transport', daemon=True)
+            self._thread.start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                # The listener was closed
+                break
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                while True:
+                    message = read_message(conn)
+                    if message is None:
+                        break
+                    start = time.perf_counter()
+                    metrics.IN_FLIGHT.inc()
+                    try:
+                        reply = self.handle(message)
+                    finally:
+                        metrics.IN_FLIGHT.dec()
+                        metrics.REQUEST_SECONDS.labels('unix_socket').observe(time.perf_counter() - start)
+                    conn.sendall(encode_reply(reply))
+            except (OSError, ValueError):
+                # The client went away or broke framing
+                pass
+
+    def handle(self, message):
+        """Analyze one request message and return the reply as /ws/live would send it"""
+        seq = request_seq(message)
+        try:
+            session_id, exercise_type, fmt, precision, frame = decode_request(message)
+        except (struct.error, ValueError) as e:
+            return _error(seq, f'Invalid request: {str(e)}')
+        if fmt == 'msgpack' and wire_format.msgpack is None:
+            fmt = 'binary'
+        session = LiveSession(self.trainer, session_id or 'default', exercise_type or 'push-up', fmt, precision,
+                              self.deadline_ms)
+        try:
+            return session.analyze(frame)
+        except Exception as e:
+            return _error(seq, f'Real-time analysis failed: {str(e)}')
+
+    def close(self):
+        self.listener.close()
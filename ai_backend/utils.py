@@ -4,13 +4,27 @@ import mediapipe as mp
 from datetime import datetime
 import json
 import os
+import threading
+
+import kinematics
+
+# AnalysisStore per store_analysis_result directory, shared so saves append to the same chunks
+_analysis_stores = {}
+_analysis_stores_lock = threading.Lock()
 
 def draw_landmarks(image, landmarks):
-    """Draw pose landmarks on the image"""
+    """Draw pose landmarks (a MediaPipe landmark list or a (33, 4) array) on the image"""
     mp_pose = mp.solutions.pose
     mp_drawing = mp.solutions.drawing_utils
     mp_drawing_styles = mp.solutions.drawing_styles
     
+    if isinstance(landmarks, np.ndarray):
+        from mediapipe.framework.formats import landmark_pb2
+        landmarks = landmark_pb2.NormalizedLandmarkList(landmark=[
+            landmark_pb2.NormalizedLandmark(x=x, y=y, z=z, visibility=visibility)
+            for x, y, z, visibility in landmarks.tolist()
+        ])
+    
     mp_drawing.draw_landmarks(
         image,
         landmarks,
@@ -27,17 +41,7 @@ def add_text_overlay(image, text, position=(10, 30), font_scale=1, color=(255, 2
 
 def calculate_angle(a, b, c):
     """Calculate angle between three points"""
-    a = np.array([a[0], a[1]])
-    b = np.array([b[0], b[1]])
-    c = np.array([c[0], c[1]])
-    
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    
-    if angle > 180.0:
-        angle = 360 - angle
-        
-    return angle
+    return kinematics.calculate_angle(a, b, c)
 
 def get_landmark_coordinates(landmarks, landmark_idx):
     """Get coordinates of a specific landmark"""
@@ -63,6 +67,28 @@ def save_analysis_result(result, filename=None):
     
     return filepath
 
+def store_analysis_result(result, session_id=None, directory="output"):
+    """Append an analysis result's frames (its frame_analysis, or the result itself) to the analysis store"""
+    from analysis_store import AnalysisStore
+    
+    frames = result.get('frame_analysis') or [result]
+    with _analysis_stores_lock:
+        store = _analysis_stores.get(directory)
+        if store is None:
+            store = _analysis_stores[directory] = AnalysisStore(directory)
+    store.append_frames(
+        session_id or f"saved_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        result.get('exercise_type', 'unknown'),
+        np.full(len(frames), datetime.now().timestamp()),
+        [frame.get('status', 'unknown') for frame in frames],
+        [frame.get('count', 0) for frame in frames],
+        [frame.get('calories', 0.0) for frame in frames],
+        [[frame.get('angles', {}).get(name, np.nan) for name in kinematics.ANGLE_NAMES] for frame in frames]
+    )
+    store.flush()
+    
+    return directory
+
 def create_video_writer(filename, fps=30, frame_size=(640, 480)):
     """Create video writer for saving processed video"""
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+
+import cv2
+
+from kinematics import USED_LANDMARKS
+
+# Copy uploads to disk in 1 MiB chunks so the whole file is never held in memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Per-frame result keys selected by each name in an analyze-form `fields` list
+FRAME_FIELDS = {
+    'counts': ('count', 'status', 'feedback', 'calories', 'motion_gated'),
+    'angles': ('angles',),
+    'landmarks': ('landmarks',),
+}
+FIELDS = ('summary',) + tuple(FRAME_FIELDS)
+
+
+def spool_upload(stream, suffix='.mp4', chunk_size=UPLOAD_CHUNK_SIZE, directory=None):
+    """Copy an upload stream to a uniquely named temp file (in `directory`, default the temp dir) and return its path"""
+    fd, path = tempfile.mkstemp(prefix='upload_', suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f, chunk_size)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def iter_video_frames(path):
+    """Decode a video file one frame at a time, yielding (timestamp in seconds, frame)"""
+    cap = cv2.VideoCapture(path)
+    try:
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+    finally:
+        cap.release()
+
+
+def frame_result(count, status, feedback, calories, angles, points):
+    """Per-frame analysis result for a frame with a person, landmarks as dicts"""
+    return {
+        'count': count,
+        'status': status,
+        'feedback': feedback,
+        'calories': calories,
+        'angles': angles,
+        'landmarks': [
+            {'x': x, 'y': y, 'z': z, 'visibility': visibility}
+            for x, y, z, visibility in points.tolist()
+        ]
+    }
+
+
+def no_person_result(count, calories):
+    """Per-frame analysis result for a frame without a person, carrying the count and calories so far"""
+    return {
+        'count': count,
+        'status': 'no_person',
+        'feedback': 'No person detected in frame',
+        'calories': calories,
+        'angles': {},
+        'landmarks': []
+    }
+
+
+class FrameProjection:
+    """The parts of an upload's analysis a caller asked for.
+
+    `fields` is a comma-separated subset of FIELDS (None: the summary and
+    whole per-frame results), `stride` keeps every stride-th frame of the
+    per-frame output, and landmarks='used' keeps only the landmarks the
+    angle calculations read, keyed by name.
+    """
+    __slots__ = ('summary', 'keys', 'stride', 'used_landmarks')
+
+    def __init__(self, fields=None, stride=1, landmarks='all'):
+        names = FIELDS if fields is None else [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = set(names) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        if stride < 1:
+            raise ValueError('stride must be at least 1')
+        if landmarks not in ('all', 'used'):
+            raise ValueError("landmarks must be 'all' or 'used'")
+        self.summary = 'summary' in names
+        # None keeps results whole, as analyzed
+        self.keys = None if fields is None else tuple(
+            key for name in FRAME_FIELDS if name in names for key in FRAME_FIELDS[name])
+        self.stride = stride
+        self.used_landmarks = landmarks == 'used'
+
+    @property
+    def frames(self):
+        """Whether any per-frame output was asked for"""
+        return self.keys is None or bool(self.keys)
+
+    def key(self):
+        """Canonical form, for cache keys"""
+        keys = '*' if self.keys is None else ','.join(self.keys)
+        return f"{keys}|{self.stride}|{'used' if self.used_landmarks else 'all'}"
+
+    def frame(self, result):
+        if self.keys is None and not self.used_landmarks:
+            return result
+        frame = dict(result) if self.keys is None else {key: result[key] for key in self.keys if key in result}
+        if self.used_landmarks and 'landmarks' in frame:
+            landmarks = frame['landmarks']
+            frame['landmarks'] = {name: landmarks[index] for name, index in USED_LANDMARKS} if len(landmarks) else {}
+        return frame
+
+    def results(self, results):
+        """Projected results of every stride-th frame; consumes all of `results`"""
+        return [self.frame(result) for index, result in enumerate(results) if index % self.stride == 0]
+
+
+class AnalysisSummary:
+    """Running summary of per-frame results, updated one frame at a time"""
+    __slots__ = ('frames', 'gated', 'total_count', 'total_calories', 'status', 'feedback')
+
+    def __init__(self):
+        self.frames = 0
+        # Frames the motion gate answered without inference
+        self.gated = 0
+        self.total_count = 0
+        self.total_calories = 0.0
+        self.status = 'unknown'
+        self.feedback = 'No analysis available'
+
+    def update(self, result):
+        self.frames += 1
+        if result.get('motion_gated'):
+            self.gated += 1
+        self.total_count = max(self.total_count, result['count'])
+        self.total_calories = max(self.total_calories, result['calories'])
+        self.status = result['status']
+        self.feedback = result['feedback']
+
+    def to_dict(self):
+        return {
+            'total_count': self.total_count,
+            'total_calories': self.total_calories,
+            'status': self.status,
+            'feedback': self.feedback,
+            'frames_analyzed': self.frames,
+            'skip_ratio': self.gated / self.frames if self.frames else 0.0
+        }
+
+
+def analyze_video(trainer, path, exercise_type, session_id, summary):
+    """Analyze a video file frame by frame, yielding each result and updating summary"""
+    for timestamp, frame in iter_video_frames(path):
+        result = trainer.analyze_frame(frame, exercise_type, session_id, timestamp=timestamp)
+        if result:
+            summary.update(result)
+            yield result
@@ -0,0 +1,205 @@
+"""
+Compact wire formats for per-frame analysis results.
+
+JSON stays the default. Clients can opt into a compact encoding with the
+``format`` query parameter (``msgpack`` or ``binary``) or the Accept header
+(``application/x-msgpack`` or ``application/octet-stream``); ``precision``
+picks ``f16`` (default) or ``f32`` landmarks.
+
+Binary layout, schema version 2, all little-endian::
+
+    header    <4sBBBBIfd   magic b'GBF1', version, dtype (1=f16, 2=f32),
+                           landmark count, angle count, rep count,
+                           calories (f32), unix timestamp (f64)
+    angles    angle count x f32, in kinematics.ANGLE_NAMES order (NaN = missing)
+    landmarks landmark count x 4 x dtype (x, y, z, visibility)
+    strings   exercise_type, status, feedback: u16 byte length + UTF-8
+              (length 0xFFFF encodes None)
+    coalesced <H frames of the session this one replaced
+    motion    <Bf 1 if the motion gate reused the previous result without
+                  inference, and the session's share of such frames
+
+Version 1 frames end after the strings; they still decode, with coalesced,
+motion_gated and skip_ratio read as 0, False and 0.0.
+
+The msgpack form is a map with the same fields and ``v`` set to the schema
+version; ``angles`` and ``landmarks`` are the same packed little-endian
+byte strings.
+"""
+
+import struct
+
+import numpy as np
+
+from kinematics import ANGLE_NAMES
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; the raw binary format needs nothing extra
+    msgpack = None
+
+SCHEMA_VERSION = 2
+# Versions decode_binary and decode_msgpack still read
+_DECODABLE_VERSIONS = (1, 2)
+MAGIC = b'GBF1'
+
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+BINARY_MIMETYPE = 'application/octet-stream'
+JSON_MIMETYPE = 'application/json'
+
+_HEADER = struct.Struct('<4sBBBBIfd')
+_STRING_LENGTH = struct.Struct('<H')
+_NONE_LENGTH = 0xFFFF
+_COALESCED = struct.Struct('<H')
+_MOTION = struct.Struct('<Bf')
+
+_DTYPES = {
+    'f16': (1, np.dtype('<f2')),
+    'f32': (2, np.dtype('<f4')),
+}
+_DTYPE_BY_CODE = {code: dtype for code, dtype in _DTYPES.values()}
+_ANGLE_DTYPE = np.dtype('<f4')
+
+
+def negotiate(request):
+    """Pick (format, precision) from the query string or Accept header"""
+    fmt = request.args.get('format')
+    if fmt is None:
+        best = request.accept_mimetypes.best_match(
+            [JSON_MIMETYPE, MSGPACK_MIMETYPE, 'application/msgpack', BINARY_MIMETYPE],
+            default=JSON_MIMETYPE
+        )
+        if best in (MSGPACK_MIMETYPE, 'application/msgpack'):
+            fmt = 'msgpack'
+        elif best == BINARY_MIMETYPE:
+            fmt = 'binary'
+        else:
+            fmt = 'json'
+
+    if fmt not in ('json', 'msgpack', 'binary') or (fmt == 'msgpack' and msgpack is None):
+        fmt = 'json'
+
+    precision = request.args.get('precision', 'f16')
+    if precision not in _DTYPES:
+        precision = 'f16'
+    return fmt, precision
+
+
+def _pack_angles(angles):
+    return np.array([angles.get(name, np.nan) for name in ANGLE_NAMES], dtype=_ANGLE_DTYPE).tobytes()
+
+
+def _pack_landmarks(landmarks, precision):
+    return np.ascontiguousarray(landmarks, dtype=_DTYPES[precision][1]).tobytes()
+
+
+def _pack_string(value):
+    if value is None:
+        return _STRING_LENGTH.pack(_NONE_LENGTH)
+    data = value.encode('utf-8')[:_NONE_LENGTH - 1]
+    return _STRING_LENGTH.pack(len(data)) + data
+
+
+def encode_binary(payload, precision='f16'):
+    """Encode a frame payload in the fixed binary layout"""
+    landmarks = payload['landmarks']
+    code = _DTYPES[precision][0]
+    header = _HEADER.pack(
+        MAGIC, SCHEMA_VERSION, code, len(landmarks), len(ANGLE_NAMES),
+        payload['count'], payload['calories'], payload['timestamp']
+    )
+    return b''.join((
+        header,
+        _pack_angles(payload['angles']),
+        _pack_landmarks(landmarks, precision),
+        _pack_string(payload['exercise_type']),
+        _pack_string(payload['status']),
+        _pack_string(payload['feedback']),
+        _COALESCED.pack(min(payload.get('coalesced', 0), 0xFFFF)),
+        _MOTION.pack(bool(payload.get('motion_gated', False)), payload.get('skip_ratio', 0.0)),
+    ))
+
+
+def decode_binary(data):
+    """Decode a binary frame back into a payload dict (landmarks as a float32 array)"""
+    magic, version, code, n_landmarks, n_angles, count, calories, timestamp = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version not in _DECODABLE_VERSIONS:
+        raise ValueError('Unsupported frame encoding')
+
+    offset = _HEADER.size
+    angle_values = np.frombuffer(data, _ANGLE_DTYPE, n_angles, offset)
+    offset += angle_values.nbytes
+    dtype = _DTYPE_BY_CODE[code]
+    landmarks = np.frombuffer(data, dtype, n_landmarks * 4, offset).reshape(n_landmarks, 4)
+    offset += landmarks.nbytes
+
+    strings = []
+    for _ in range(3):
+        (length,) = _STRING_LENGTH.unpack_from(data, offset)
+        offset += _STRING_LENGTH.size
+        if length == _NONE_LENGTH:
+            strings.append(None)
+        else:
+            strings.append(bytes(data[offset:offset + length]).decode('utf-8'))
+            offset += length
+
+    exercise_type, status, feedback = strings
+    if version == 1:
+        coalesced, motion_gated, skip_ratio = 0, 0, 0.0
+    else:
+        (coalesced,) = _COALESCED.unpack_from(data, offset)
+        offset += _COALESCED.size
+        motion_gated, skip_ratio = _MOTION.unpack_from(data, offset)
+    return {
+        'exercise_type': exercise_type,
+        'count': count,
+        'calories': calories,
+        'status': status,
+        'feedback': feedback,
+        'angles': {name: value for name, value in zip(ANGLE_NAMES, angle_values.tolist()) if value == value},
+        'landmarks': landmarks.astype(np.float32),
+        'coalesced': coalesced,
+        'motion_gated': bool(motion_gated),
+        'skip_ratio': skip_ratio,
+        'timestamp': timestamp,
+    }
+
+
+def encode_msgpack(payload, precision='f16'):
+    """Encode a frame payload as a msgpack map with packed numeric fields"""
+    return msgpack.packb({
+        'v': SCHEMA_VERSION,
+        'exercise_type': payload['exercise_type'],
+        'count': payload['count'],
+        'calories': payload['calories'],
+        'status': payload['status'],
+        'feedback': payload['feedback'],
+        'dtype': precision,
+        'angles': _pack_angles(payload['angles']),
+        'landmarks': _pack_landmarks(payload['landmarks'], precision),
+        'coalesced': payload.get('coalesced', 0),
+        'motion_gated': payload.get('motion_gated', False),
+        'skip_ratio': payload.get('skip_ratio', 0.0),
+        'timestamp': payload['timestamp'],
+    }, use_bin_type=True)
+
+
+def decode_msgpack(data):
+    """Decode a msgpack frame back into a payload dict"""
+    message = msgpack.unpackb(data, raw=False)
+    if message.get('v') not in _DECODABLE_VERSIONS:
+        raise ValueError('Unsupported frame encoding')
+    angle_values = np.frombuffer(message['angles'], _ANGLE_DTYPE)
+    message['angles'] = {name: value for name, value in zip(ANGLE_NAMES, angle_values.tolist()) if value == value}
+    dtype = _DTYPES[message.pop('dtype')][1]
+    message['landmarks'] = np.frombuffer(message['landmarks'], dtype).reshape(-1, 4).astype(np.float32)
+    if message.pop('v') == 1:
+        message.update(coalesced=0, motion_gated=False, skip_ratio=0.0)
+    return message
+
+
+def encode(payload, fmt, precision='f16'):
+    """Encode a compact frame payload; returns (body, mimetype)"""
+    if fmt == 'msgpack':
+        return encode_msgpack(payload, precision), MSGPACK_MIMETYPE
+    return encode_binary(payload, precision), BINARY_MIMETYPE
@@ -48,6 +48,12 @@ router.post('/analyze-form', [
     formData.append('exerciseName', exerciseName || '');
     formData.append('exerciseType', exerciseType || exerciseName || 'push-up');
     formData.append('userId', req.user.userId.toString());
+    // Optional response projection: per-frame output, fields, frame stride, landmark subset
+    ['frames', 'fields', 'stride', 'landmarks'].forEach((name) => {
+      if (req.body[name]) {
+        formData.append(name, req.body[name]);
+      }
+    });
 
     // Call Python AI backend
     const pythonBackendUrl = process.env.PYTHON_BACKEND_URL || 'http://localhost:8000';
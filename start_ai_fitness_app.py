@@ -10,6 +10,8 @@ import subprocess
 import time
 import signal
 import threading
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 class AIFitnessApp:
@@ -98,6 +100,20 @@ class AIFitnessApp:
             print(f"❌ Failed to start AI backend: {e}")
             return None
     
+    def wait_for_ai_backend(self, url="http://localhost:8000/ready", timeout=120):
+        """Poll the AI backend readiness probe until its pose model is warmed up"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                with urllib.request.urlopen(url, timeout=2) as response:
+                    if response.status == 200:
+                        return True
+            except (urllib.error.URLError, OSError):
+                # Not listening yet, or 503 while the model loads
+                pass
+            time.sleep(0.5)
+        return False
+    
     def start_server(self):
         """Start the MERN server"""
         print("🚀 Starting MERN server...")
@@ -234,12 +250,15 @@ REACT_APP_AI_BACKEND_URL=http://localhost:8000"""
         print("🤖 AI Backend: http://localhost:8000")
         print("\n⏳ Waiting for services to be ready...")
         
-        # Wait for services to be ready
-        time.sleep(10)
+        # Wait for the AI backend to report ready instead of guessing how long it takes
+        if self.wait_for_ai_backend():
+            print("✅ AI backend is ready")
+        else:
+            print("⚠️ AI backend is not ready yet; check http://localhost:8000/ready")
         
         print("\n✅ All services are running!")
         print("🌐 Open http://localhost:3000 in your browser")
-        print("📊 AI Health Check: http://localhost:8000/health")
+        print("📊 AI Health Check: http://localhost:8000/health (readiness: /ready)")
         print("\nPress Ctrl+C to stop all services")
         
         return True